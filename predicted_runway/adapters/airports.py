@@ -36,10 +36,13 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 __author__ = "EUROCONTROL (SWIM)"
 
 import json
+import time
 from functools import lru_cache
+from pathlib import Path
 from typing import Iterable
 
-from predicted_runway.config import ICAO_AIRPORTS_CATALOG_PATH, DESTINATION_ICAOS
+import predicted_runway.config as cfg
+from predicted_runway.config import ICAO_AIRPORTS_CATALOG_PATH, CURRENT_MODEL
 from predicted_runway.domain.factory import AirportFactory
 from predicted_runway.domain.models import Airport
 
@@ -66,5 +69,44 @@ def get_airport_by_icao(icao: str) -> Airport | None:
         return AirportFactory.create_from_data(data)
 
 
+def discover_destination_icaos() -> list[str]:
+    """
+    Returns the airports of the catalog having a model, either as {airport_icao}.pkl or as a
+    {airport_icao}/ directory of versions, in one of the models directories.
+    """
+    icaos = set()
+
+    for models_dir in (cfg.ARRIVALS_RUNWAY_MODELS_DIR, cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR):
+        models_dir_path = Path(models_dir)
+        if not models_dir_path.is_dir():
+            continue
+
+        for path in models_dir_path.iterdir():
+            if path.suffix == '.pkl' or path.joinpath(CURRENT_MODEL).exists():
+                icaos.add(path.stem)
+
+    airport_data = get_airport_data()
+
+    return sorted(icao for icao in icaos if icao in airport_data)
+
+
+_discovered_destinations: tuple[float, list[str]] | None = None
+
+
+def get_destination_icaos() -> list[str]:
+    global _discovered_destinations
+
+    if cfg.DESTINATION_ICAOS:
+        return cfg.DESTINATION_ICAOS
+
+    now = time.monotonic()
+    if _discovered_destinations is None \
+            or now - _discovered_destinations[0] >= cfg.DESTINATIONS_DISCOVERY_INTERVAL:
+        _discovered_destinations = (now, discover_destination_icaos())
+
+    return _discovered_destinations[1]
+
+
 def get_destination_airports() -> list[Airport]:
-    return [AirportFactory.create_from_data(get_airport_data()[icao]) for icao in DESTINATION_ICAOS]
+    return [AirportFactory.create_from_data(get_airport_data()[icao])
+            for icao in get_destination_icaos()]
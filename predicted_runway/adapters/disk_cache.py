@@ -0,0 +1,203 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+
+class SQLiteCacheTier:
+    """
+    Persistent cache tier in a SQLite database in WAL mode, meant to survive restarts and deploys.
+
+    Reads are plain point lookups. Writes are queued and applied in batches by a background
+    thread so that the request path never waits on the disk, and entries are dropped (first the
+    expired ones, then the ones expiring first) whenever the database grows beyond `max_bytes`.
+    Entries carry a scope, e.g. the hash of the model that computed them, so that they can be
+    dropped together. The database records the `version` of the format of the values and every
+    entry is dropped at startup when it does not match, e.g. after a deploy that changed it.
+    """
+    _INCREMENTAL_VACUUM = 2
+
+    def __init__(self,
+                 path: Path,
+                 max_bytes: int,
+                 version: int = 0,
+                 batch_size: int = 256,
+                 flush_interval: float = 1.,
+                 max_pending: int = 10000):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.version = version
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._create_schema()
+
+        self._writer = threading.Thread(target=self._write_behind, name='sqlite-cache-writer',
+                                        daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        # only takes effect before the database is written to, which switching to WAL does
+        connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        return connection
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # sqlite connections may not be shared between threads
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = self._connect()
+
+        return self._local.connection
+
+    def _create_schema(self) -> None:
+        connection = self._get_connection()
+        if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != self._INCREMENTAL_VACUUM:
+            # databases created without it are rebuilt once, otherwise they never shrink
+            connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            connection.execute('VACUUM')
+
+        connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                           'key TEXT PRIMARY KEY, '
+                           'scope TEXT NOT NULL, '
+                           'expires_at REAL NOT NULL, '
+                           'value BLOB NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)')
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_scope ON entries (scope)')
+
+        stored_version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if stored_version != self.version:
+            _logger.info(f"Dropping the persistent cache entries of version {stored_version}.")
+            connection.execute('DELETE FROM entries')
+            connection.executescript('PRAGMA incremental_vacuum')
+            # pragmas do not take parameters
+            connection.execute(f'PRAGMA user_version = {int(self.version)}')
+
+    def get(self, key: str) -> bytes | None:
+        row = self._get_connection().execute(
+            'SELECT value FROM entries WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, key: str, value: bytes, expires_at: float, scope: str = '') -> None:
+        try:
+            self._pending.put_nowait(('put', (key, scope, expires_at, value)))
+        except queue.Full:
+            _logger.warning('The persistent cache is falling behind, dropping write.')
+
+    def drop_scope(self, scope: str) -> None:
+        self._pending.put(('drop_scope', (scope,)))
+
+    def flush(self) -> None:
+        """
+        Blocks until every write queued so far has been applied.
+        """
+        self._pending.join()
+
+    def _write_behind(self) -> None:
+        while True:
+            operations = [self._pending.get()]
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(operations) < self.batch_size:
+                try:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    operations.append(self._pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._apply(operations)
+                self._compact()
+            except Exception as e:
+                _logger.exception(f"Failed to write to the persistent cache: {e}")
+            finally:
+                for _ in operations:
+                    self._pending.task_done()
+
+    def _apply(self, operations: list[tuple[str, tuple]]) -> None:
+        connection = self._get_connection()
+
+        with connection:
+            connection.execute('BEGIN')
+
+            for operation, args in operations:
+                if operation == 'put':
+                    connection.execute('INSERT OR REPLACE INTO entries (key, scope, expires_at, '
+                                       'value) VALUES (?, ?, ?, ?)', args)
+                else:
+                    connection.execute('DELETE FROM entries WHERE scope = ?', args)
+
+    def get_size(self) -> int:
+        connection = self._get_connection()
+        page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = connection.execute('PRAGMA freelist_count').fetchone()[0]
+        page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+
+        return (page_count - freelist_count) * page_size
+
+    def _compact(self) -> None:
+        if self.get_size() <= self.max_bytes:
+            return
+
+        connection = self._get_connection()
+        connection.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+
+        while self.get_size() > self.max_bytes:
+            count = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            if not count:
+                break
+
+            connection.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries '
+                               'ORDER BY expires_at LIMIT ?)', (max(count // 10, 1),))
+
+        # execute() steps the pragma once, which frees a single page
+        connection.executescript('PRAGMA incremental_vacuum')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
@@ -0,0 +1,172 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import queue
+import socket
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from predicted_runway.inference_server import DESCRIBE, PREDICT, OK, FrameReader, read_frame, \
+    write_frame, pack_uint8, pack_str, pack_matrix
+
+
+class InferenceServerError(Exception):
+    pass
+
+
+class InferenceClient:
+    """
+    Talks to the inference server listening on `socket_path`. Connections are kept open and reused
+    by the following requests, at most `pool_size` of them are kept idle.
+    """
+
+    def __init__(self, socket_path: Path, pool_size: int, timeout: float):
+        self.socket_path = Path(socket_path)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle_connections = queue.LifoQueue()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(str(self.socket_path))
+
+        return sock
+
+    def _take_idle_connection(self) -> socket.socket | None:
+        try:
+            return self._idle_connections.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _release_connection(self, sock: socket.socket) -> None:
+        if self._idle_connections.qsize() < self.pool_size:
+            self._idle_connections.put(sock)
+        else:
+            sock.close()
+
+    def _exchange(self, sock: socket.socket, body: bytes) -> bytes | None:
+        try:
+            write_frame(sock, body)
+            response = read_frame(sock)
+        except BaseException:
+            # the connection may be left in the middle of a frame
+            sock.close()
+            raise
+
+        if response is None:
+            sock.close()
+        else:
+            self._release_connection(sock)
+
+        return response
+
+    def _request(self, body: bytes) -> FrameReader:
+        response = None
+
+        sock = self._take_idle_connection()
+        if sock is not None:
+            try:
+                response = self._exchange(sock, body)
+            except ConnectionError:
+                # the server may have closed the connection while it was idle
+                pass
+
+        if response is None:
+            response = self._exchange(self._connect(), body)
+
+        if response is None:
+            raise InferenceServerError('The inference server closed the connection')
+
+        reader = FrameReader(response)
+        if reader.read_uint8() != OK:
+            raise InferenceServerError(reader.read_rest().decode('utf-8'))
+
+        return reader
+
+    def describe(self, model_path: Path) -> 'RemoteModel':
+        reader = self._request(pack_uint8(DESCRIBE) + pack_str(str(model_path)))
+
+        return RemoteModel(client=self,
+                           model_path=model_path,
+                           model_id=reader.read_str(),
+                           feature_names_in_=np.array(reader.read_str_list(), dtype=object),
+                           classes_=np.array(reader.read_str_list(), dtype=object))
+
+    def predict_proba(self, model_path: Path, rows: np.ndarray) -> tuple[str, np.ndarray]:
+        reader = self._request(pack_uint8(PREDICT) + pack_str(str(model_path)) + pack_matrix(rows))
+
+        return reader.read_str(), reader.read_matrix()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle_connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class RemoteModel:
+    """
+    Stands for a trained model held by the inference server, with the attributes and the
+    `predict_proba` of the model used by the predictor.
+    """
+
+    def __init__(self,
+                 client: InferenceClient,
+                 model_path: Path,
+                 model_id: str,
+                 feature_names_in_: np.ndarray,
+                 classes_: np.ndarray):
+        self.client = client
+        self.model_path = model_path
+        self.model_id = model_id
+        self.feature_names_in_ = feature_names_in_
+        self.classes_ = classes_
+
+    def predict_proba(self, model_input: pd.DataFrame) -> np.ndarray:
+        model_id, probas = self.client.predict_proba(self.model_path,
+                                                     np.asarray(model_input, dtype=np.float64))
+
+        # the columns follow the classes of the described model only
+        if model_id != self.model_id:
+            raise InferenceServerError(f"The inference server predicted with model {model_id} "
+                                       f"instead of {self.model_id}")
+
+        return probas
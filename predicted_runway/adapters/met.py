@@ -0,0 +1,808 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import csv
+import json
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Protocol, Iterable, Callable, Any
+
+import numpy as np
+from met_update_db import repo as met_repo
+
+try:
+    # bounds every MongoDB operation run by the current thread within the context
+    from pymongo import timeout as _mongo_timeout
+except ImportError:
+    # pymongo < 4.2 only has timeouts for the whole client
+    def _mongo_timeout(_: float):
+        return nullcontext()
+
+import predicted_runway.config as cfg
+from predicted_runway.cache import create_cache
+from predicted_runway.domain.models import WindInputSource
+from predicted_runway.singleflight import SingleFlight
+
+_logger = logging.getLogger(__name__)
+
+_NOT_AVAILABLE = 'NOT_AVAILABLE'
+
+
+@dataclass(frozen=True)
+class WindData:
+    direction: float
+    speed: float
+    source: WindInputSource
+
+
+def wind_input_source_from_wind_data_source(wind_data_source: met_repo.WindDataSource) \
+        -> WindInputSource:
+
+    return WindInputSource(wind_data_source.value)
+
+
+@dataclass(frozen=True)
+class WindSeries:
+    """
+    The wind of consecutive `step` seconds long steps starting at `start`. Steps without MET
+    information have NaN direction and speed and an empty source.
+    """
+    start: int
+    step: int
+    direction: np.ndarray
+    speed: np.ndarray
+    source: np.ndarray
+
+    def __len__(self):
+        return len(self.source)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.start + self.step * np.arange(len(self), dtype=np.int64)
+
+    def get_wind_data(self, timestamp: int) -> WindData | None:
+        index = (timestamp - self.start) // self.step
+
+        if 0 <= index < len(self) and self.source[index]:
+            return WindData(direction=float(self.direction[index]),
+                            speed=float(self.speed[index]),
+                            source=WindInputSource(self.source[index]))
+
+
+def _get_series_timestamps(from_timestamp: int, to_timestamp: int, step: int) -> np.ndarray:
+    return np.arange(from_timestamp, to_timestamp, step, dtype=np.int64)
+
+
+def _empty_wind_series_arrays(size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return np.full(size, np.nan), np.full(size, np.nan), np.full(size, '', dtype='<U5')
+
+
+class WindProvider(Protocol):
+
+    def get_wind_data(self, airport_icao: str, before_timestamp: int) -> WindData:
+        ...
+
+    def get_wind_series(self,
+                        airport_icao: str,
+                        from_timestamp: int,
+                        to_timestamp: int,
+                        step: int) -> WindSeries:
+        ...
+
+    def get_last_taf_end_time(self, airport_icao: str) -> datetime:
+        ...
+
+
+class MongoWindProvider:
+
+    def get_wind_data(self, airport_icao: str, before_timestamp: int) -> WindData:
+        wind_data, wind_data_source = met_repo.get_wind_data(airport_icao=airport_icao,
+                                                             before_timestamp=before_timestamp)
+
+        return WindData(direction=wind_data.direction,
+                        speed=wind_data.speed,
+                        source=wind_input_source_from_wind_data_source(wind_data_source))
+
+    def get_wind_series(self,
+                        airport_icao: str,
+                        from_timestamp: int,
+                        to_timestamp: int,
+                        step: int) -> WindSeries:
+        """
+        Reads the METAR/TAF records of the window in a single range query of met_update_db
+        (`get_met_records`, which returns them with the fields of the records of the
+        FileWindProvider) and resolves every step from them in memory. The window starts
+        METAR_VALIDITY_SECONDS earlier so that the METARs still valid at its start are read too.
+        """
+        records = [_record_from_row(row) for row in met_repo.get_met_records(
+            airport_icao=airport_icao,
+            from_timestamp=from_timestamp - cfg.METAR_VALIDITY_SECONDS,
+            to_timestamp=to_timestamp
+        )]
+
+        return InMemoryWindProvider(
+            metars=[record for record in records if isinstance(record, METARRecord)],
+            tafs=[record for record in records if isinstance(record, TAFRecord)]
+        ).get_wind_series(airport_icao, from_timestamp, to_timestamp, step)
+
+    def get_last_taf_end_time(self, airport_icao: str) -> datetime:
+        return met_repo.get_last_taf_end_time(airport_icao=airport_icao)
+
+
+@dataclass(frozen=True)
+class METARRecord:
+    airport_icao: str
+    time: int
+    wind_direction: float
+    wind_speed: float
+
+
+@dataclass(frozen=True)
+class TAFRecord:
+    airport_icao: str
+    start_time: int
+    end_time: int
+    wind_direction: float
+    wind_speed: float
+
+
+class InMemoryWindProvider:
+    """
+    Resolves the wind from METAR/TAF records held in memory: the latest METAR observed at most
+    `metar_validity` seconds before the timestamp takes precedence, otherwise the most recent TAF
+    whose validity period covers the timestamp is used.
+    """
+
+    def __init__(self,
+                 metars: Iterable[METARRecord] = (),
+                 tafs: Iterable[TAFRecord] = (),
+                 metar_validity: int = cfg.METAR_VALIDITY_SECONDS):
+        self.metar_validity = metar_validity
+        self._metars: dict[str, list[METARRecord]] = defaultdict(list)
+        self._metar_times: dict[str, list[int]] = defaultdict(list)
+        self._tafs: dict[str, list[TAFRecord]] = defaultdict(list)
+
+        for metar in metars:
+            self.add_metar(metar)
+
+        for taf in tafs:
+            self.add_taf(taf)
+
+    def add_metar(self, metar: METARRecord) -> None:
+        metars = self._metars[metar.airport_icao]
+        metars.append(metar)
+        metars.sort(key=lambda m: m.time)
+        self._metar_times[metar.airport_icao] = [m.time for m in metars]
+
+    def add_taf(self, taf: TAFRecord) -> None:
+        tafs = self._tafs[taf.airport_icao]
+        tafs.append(taf)
+        tafs.sort(key=lambda t: t.start_time)
+
+    def _get_metar(self, airport_icao: str, before_timestamp: int) -> METARRecord | None:
+        metars = self._metars.get(airport_icao, [])
+        index = bisect_right(self._metar_times.get(airport_icao, []), before_timestamp)
+
+        if index:
+            metar = metars[index - 1]
+            if before_timestamp - metar.time <= self.metar_validity:
+                return metar
+
+    def _get_taf(self, airport_icao: str, timestamp: int) -> TAFRecord | None:
+        for taf in reversed(self._tafs.get(airport_icao, [])):
+            if taf.start_time <= timestamp < taf.end_time:
+                return taf
+
+    def get_wind_data(self, airport_icao: str, before_timestamp: int) -> WindData:
+        if metar := self._get_metar(airport_icao, before_timestamp):
+            return WindData(direction=metar.wind_direction,
+                            speed=metar.wind_speed,
+                            source=WindInputSource.METAR)
+
+        if taf := self._get_taf(airport_icao, before_timestamp):
+            return WindData(direction=taf.wind_direction,
+                            speed=taf.wind_speed,
+                            source=WindInputSource.TAF)
+
+        raise met_repo.METNotAvailable()
+
+    def get_wind_series(self,
+                        airport_icao: str,
+                        from_timestamp: int,
+                        to_timestamp: int,
+                        step: int) -> WindSeries:
+        timestamps = _get_series_timestamps(from_timestamp, to_timestamp, step)
+        direction, speed, source = _empty_wind_series_arrays(len(timestamps))
+
+        # later TAFs override earlier ones, METARs override TAFs
+        for taf in self._tafs.get(airport_icao, []):
+            covered = (taf.start_time <= timestamps) & (timestamps < taf.end_time)
+            direction[covered] = taf.wind_direction
+            speed[covered] = taf.wind_speed
+            source[covered] = WindInputSource.TAF.value
+
+        metars = self._metars.get(airport_icao, [])
+        if metars:
+            metar_times = np.array(self._metar_times[airport_icao], dtype=np.int64)
+            indexes = np.searchsorted(metar_times, timestamps, side='right') - 1
+            valid = (indexes >= 0) & \
+                    (timestamps - metar_times[np.maximum(indexes, 0)] <= self.metar_validity)
+
+            metar_directions = np.array([metar.wind_direction for metar in metars])
+            metar_speeds = np.array([metar.wind_speed for metar in metars])
+
+            direction[valid] = metar_directions[indexes[valid]]
+            speed[valid] = metar_speeds[indexes[valid]]
+            source[valid] = WindInputSource.METAR.value
+
+        return WindSeries(start=from_timestamp, step=step, direction=direction, speed=speed,
+                          source=source)
+
+    def get_last_taf_end_time(self, airport_icao: str) -> datetime:
+        tafs = self._tafs.get(airport_icao)
+
+        if not tafs:
+            raise met_repo.METNotAvailable()
+
+        return datetime.fromtimestamp(max(taf.end_time for taf in tafs), tz=timezone.utc)
+
+
+def _record_from_row(row: dict) -> METARRecord | TAFRecord:
+    if row["type"] == WindInputSource.METAR.value:
+        return METARRecord(airport_icao=row["airport_icao"],
+                           time=int(row["start_time"]),
+                           wind_direction=float(row["wind_direction"]),
+                           wind_speed=float(row["wind_speed"]))
+
+    if row["type"] == WindInputSource.TAF.value:
+        return TAFRecord(airport_icao=row["airport_icao"],
+                         start_time=int(row["start_time"]),
+                         end_time=int(row["end_time"]),
+                         wind_direction=float(row["wind_direction"]),
+                         wind_speed=float(row["wind_speed"]))
+
+    raise ValueError(f"Invalid MET record type: {row['type']}")
+
+
+class FileWindProvider(InMemoryWindProvider):
+    """
+    Replays METAR/TAF records from a local JSON (list of objects) or CSV file. Every record has
+    the fields type (METAR or TAF), airport_icao, start_time, end_time (TAF only), wind_direction
+    and wind_speed, with times in seconds since UNIX epoch.
+    """
+
+    def __init__(self, path: Path, metar_validity: int = cfg.METAR_VALIDITY_SECONDS):
+        super().__init__(metar_validity=metar_validity)
+
+        for record in self._read_records(Path(path)):
+            if isinstance(record, METARRecord):
+                self.add_metar(record)
+            else:
+                self.add_taf(record)
+
+    @staticmethod
+    def _read_records(path: Path) -> list[METARRecord | TAFRecord]:
+        with open(path, 'r') as f:
+            if path.suffix == '.csv':
+                rows = list(csv.DictReader(f))
+            else:
+                rows = json.load(f)
+
+        return [_record_from_row(row) for row in rows]
+
+
+def create_wind_provider(name: str) -> WindProvider:
+    if name == 'mongo':
+        return MongoWindProvider()
+    if name == 'memory':
+        return InMemoryWindProvider()
+    if name == 'file':
+        return FileWindProvider(path=Path(cfg.MET_DATA_PATH))
+
+    raise ValueError(f"Invalid MET provider: {name}")
+
+
+_wind_provider: WindProvider | None = None
+
+
+def get_wind_provider() -> WindProvider:
+    global _wind_provider
+
+    if _wind_provider is None:
+        _wind_provider = create_wind_provider(cfg.MET_PROVIDER)
+
+    return _wind_provider
+
+
+def set_wind_provider(provider: WindProvider | None) -> None:
+    global _wind_provider
+
+    _wind_provider = provider
+    clear_wind_cache()
+
+
+class _WindDataCodec:
+    """Serialises the cached wind, or _NOT_AVAILABLE, as JSON for the shared cache backends."""
+
+    def dumps(self, value: WindData | str) -> bytes:
+        if value == _NOT_AVAILABLE:
+            return json.dumps(value).encode()
+
+        return json.dumps([value.direction, value.speed, value.source.value]).encode()
+
+    def loads(self, data: bytes) -> WindData | str:
+        value = json.loads(data)
+        if value == _NOT_AVAILABLE:
+            return value
+
+        direction, speed, source = value
+
+        return WindData(direction=direction, speed=speed, source=WindInputSource(source))
+
+
+_wind_cache = create_cache(namespace='wind', maxsize=cfg.WIND_CACHE_MAXSIZE,
+                           codec=_WindDataCodec())
+_negative_hits = 0
+_wind_flights = SingleFlight()
+
+
+def _get_bucket(timestamp: int) -> int:
+    return timestamp // cfg.WIND_CACHE_BUCKET_SECONDS
+
+
+def _get_ttl(bucket: int, now: float, source: WindInputSource) -> float:
+    """
+    Aligns the lifetime of a cached wind to the moment new MET information could change it: past
+    buckets are stable, the current bucket changes with the next METAR and future buckets with
+    the next TAF. A future bucket answered from a METAR (no TAF covers it yet) lives at most
+    until the bucket starts, when newer information applies to it.
+    """
+    bucket_start = bucket * cfg.WIND_CACHE_BUCKET_SECONDS
+    bucket_end = bucket_start + cfg.WIND_CACHE_BUCKET_SECONDS
+
+    if bucket_end <= now:
+        return cfg.WIND_CACHE_PAST_TTL
+
+    if bucket_start <= now:
+        return bucket_end - now
+
+    next_taf_ttl = cfg.TAF_ISSUE_INTERVAL_SECONDS - now % cfg.TAF_ISSUE_INTERVAL_SECONDS
+
+    return next_taf_ttl if source == WindInputSource.TAF else min(next_taf_ttl, bucket_start - now)
+
+
+@dataclass(frozen=True)
+class METSnapshot:
+    """
+    The MET information of an airport as prefetched at `refreshed_at`: the wind series from the
+    start of the wind cache bucket of `refreshed_at` up to the end of the latest TAF, and the end
+    time of that TAF.
+    """
+    airport_icao: str
+    refreshed_at: int
+    wind_series: WindSeries
+    taf_end_time: datetime | None
+
+    def is_fresh(self, now: float) -> bool:
+        return now - self.refreshed_at <= cfg.MET_PREFETCH_MAX_AGE
+
+    def get_wind_data(self, timestamp: int) -> WindData | None:
+        return self.wind_series.get_wind_data(timestamp)
+
+
+_snapshots: dict[str, METSnapshot] = {}
+_snapshot_listeners: list[Callable[[METSnapshot], None]] = []
+
+
+def add_snapshot_listener(listener: Callable[[METSnapshot], None]) -> None:
+    """
+    Registers a function to be called with every snapshot refreshed by the prefetcher.
+    """
+    _snapshot_listeners.append(listener)
+
+
+def _get_fresh_snapshot(airport_icao: str) -> METSnapshot | None:
+    snapshot = _snapshots.get(airport_icao)
+
+    if snapshot is not None and snapshot.is_fresh(now=time.time()):
+        return snapshot
+
+
+def build_met_snapshot(provider: WindProvider, airport_icao: str, now: int) -> METSnapshot:
+    try:
+        taf_end_time = provider.get_last_taf_end_time(airport_icao)
+    except met_repo.METNotAvailable:
+        taf_end_time = None
+
+    to_timestamp = max(int(taf_end_time.timestamp()) if taf_end_time else now, now + 1)
+
+    # the steps of the series are the buckets of the wind cache
+    step = cfg.WIND_CACHE_BUCKET_SECONDS
+    wind_series = provider.get_wind_series(airport_icao,
+                                           from_timestamp=now - now % step,
+                                           to_timestamp=to_timestamp,
+                                           step=step)
+
+    return METSnapshot(airport_icao=airport_icao,
+                       refreshed_at=now,
+                       wind_series=wind_series,
+                       taf_end_time=taf_end_time)
+
+
+class METPrefetcher(threading.Thread):
+    """
+    Keeps the MET snapshots of the airports returned by `get_airport_icaos` up to date by
+    rebuilding them every `interval` seconds. The airports are read again on every refresh, so
+    that destinations discovered meanwhile are prefetched and the snapshots of the removed ones
+    dropped. Snapshots are swapped in as a whole so that readers never see a partial update.
+    """
+
+    def __init__(self, get_airport_icaos: Callable[[], list[str]], interval: float):
+        super().__init__(name='met-prefetcher', daemon=True)
+        self.get_airport_icaos = get_airport_icaos
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def refresh(self) -> None:
+        provider = get_wind_provider()
+        airport_icaos = self.get_airport_icaos()
+
+        for airport_icao in set(_snapshots) - set(airport_icaos):
+            _snapshots.pop(airport_icao, None)
+
+        for airport_icao in airport_icaos:
+            try:
+                snapshot = build_met_snapshot(provider, airport_icao, now=int(time.time()))
+            except Exception as e:
+                _logger.exception(f"Failed to prefetch MET data of {airport_icao}: {e}")
+                continue
+
+            _snapshots[airport_icao] = snapshot
+
+            for listener in _snapshot_listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    _logger.exception(f"Failed to notify the MET snapshot of {airport_icao}: {e}")
+
+    def run(self) -> None:
+        while True:
+            self.refresh()
+
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+_prefetcher: METPrefetcher | None = None
+
+
+def start_prefetcher(get_airport_icaos: Callable[[], list[str]]) -> METPrefetcher:
+    global _prefetcher
+
+    if _prefetcher is None or not _prefetcher.is_alive():
+        _prefetcher = METPrefetcher(get_airport_icaos=get_airport_icaos,
+                                    interval=cfg.MET_PREFETCH_INTERVAL)
+        _prefetcher.start()
+
+    return _prefetcher
+
+
+class METLookupFailed(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency: after `failure_threshold` consecutive failures the
+    breaker opens and rejects calls for `reset_timeout` seconds, then lets a single trial call
+    through (half open) which either closes it again or re-opens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 failure_threshold: int,
+                 reset_timeout: float,
+                 timer: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._timer = timer
+        self._failures = 0
+        self._opened_at = 0.
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and self._timer() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._timer()
+
+
+_circuit_breaker = CircuitBreaker(failure_threshold=cfg.MET_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                                  reset_timeout=cfg.MET_CIRCUIT_BREAKER_RESET_TIMEOUT)
+
+_lookup_executor = ThreadPoolExecutor(max_workers=cfg.MET_LOOKUP_WORKERS,
+                                      thread_name_prefix='met-lookup')
+
+_last_known_winds: dict[str, tuple[float, WindData]] = {}
+
+_fallbacks = 0
+
+
+def _call_with_timeout(function: Callable, *args) -> Any:
+    """
+    Runs the function in a lookup worker and waits for it MET_LOOKUP_TIMEOUT seconds from the
+    moment it is submitted, the wait for a worker included. The MongoDB operations it runs are
+    bounded by what is left of the budget.
+    """
+    deadline = time.monotonic() + cfg.MET_LOOKUP_TIMEOUT
+
+    def call():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("No MET lookup worker became available in time.")
+
+        with _mongo_timeout(remaining):
+            return function(*args)
+
+    future = _lookup_executor.submit(call)
+
+    try:
+        return future.result(timeout=cfg.MET_LOOKUP_TIMEOUT)
+    except FuturesTimeoutError:
+        future.cancel()
+        raise TimeoutError("The MET lookup did not complete in time.")
+
+
+def _call_provider(function: Callable, *args) -> Any:
+    """
+    Calls the provider within the MET_LOOKUP_TIMEOUT time budget and through the circuit
+    breaker. METNotAvailable is a valid answer of the provider and is propagated as is, any other
+    failure is raised as METLookupFailed.
+    """
+    if not _circuit_breaker.allow_request():
+        raise METLookupFailed("The MET circuit breaker is open.")
+
+    try:
+        if cfg.MET_LOOKUP_TIMEOUT > 0:
+            result = _call_with_timeout(function, *args)
+        else:
+            result = function(*args)
+    except met_repo.METNotAvailable:
+        _circuit_breaker.record_success()
+        raise
+    except Exception as e:
+        _circuit_breaker.record_failure()
+        _logger.warning(f"MET lookup failed: {e!r}")
+        raise METLookupFailed(str(e)) from e
+
+    _circuit_breaker.record_success()
+
+    return result
+
+
+def _remember_last_known_wind(airport_icao: str, before_timestamp: int, wind_data: WindData):
+    now = time.time()
+
+    # only winds of the present are a sensible stand-in for any other timestamp
+    if abs(before_timestamp - now) <= cfg.WIND_CACHE_BUCKET_SECONDS:
+        _last_known_winds[airport_icao] = (now, wind_data)
+
+
+def _get_fallback_wind_data(airport_icao: str, before_timestamp: int) -> WindData:
+    global _fallbacks
+
+    now = time.time()
+    wind_data = None
+
+    snapshot = _snapshots.get(airport_icao)
+    if snapshot is not None and now - snapshot.refreshed_at <= cfg.MET_FALLBACK_MAX_STALENESS:
+        wind_data = snapshot.get_wind_data(before_timestamp)
+
+    if wind_data is None and airport_icao in _last_known_winds:
+        stored_at, last_known_wind_data = _last_known_winds[airport_icao]
+
+        if now - stored_at <= cfg.MET_FALLBACK_MAX_STALENESS:
+            wind_data = last_known_wind_data
+
+    if wind_data is None:
+        raise met_repo.METNotAvailable()
+
+    _fallbacks += 1
+
+    return WindData(direction=wind_data.direction,
+                    speed=wind_data.speed,
+                    source=WindInputSource.LAST_KNOWN)
+
+
+def get_wind_data(airport_icao: str, before_timestamp: int) -> WindData:
+    global _negative_hits
+
+    snapshot = _get_fresh_snapshot(airport_icao)
+    if snapshot is not None and (wind_data := snapshot.get_wind_data(before_timestamp)):
+        return wind_data
+
+    provider = get_wind_provider()
+
+    bucket = _get_bucket(before_timestamp)
+    key = (airport_icao, bucket)
+
+    if cfg.WIND_CACHE_ENABLED:
+        cached = _wind_cache.get(key)
+        if cached == _NOT_AVAILABLE:
+            _negative_hits += 1
+            raise met_repo.METNotAvailable()
+        if cached is not None:
+            return cached
+    else:
+        # without the cache the lookups of a bucket are not interchangeable
+        key = (airport_icao, before_timestamp)
+
+    return _wind_flights.do(
+        key, lambda: _lookup_wind_data(provider, airport_icao, before_timestamp, bucket)
+    )
+
+
+def _lookup_wind_data(provider: WindProvider,
+                      airport_icao: str,
+                      before_timestamp: int,
+                      bucket: int) -> WindData:
+    key = (airport_icao, bucket)
+
+    try:
+        wind_data = _call_provider(provider.get_wind_data, airport_icao, before_timestamp)
+    except met_repo.METNotAvailable:
+        if cfg.WIND_CACHE_ENABLED:
+            _wind_cache.set(key, _NOT_AVAILABLE, ttl=cfg.WIND_CACHE_NEGATIVE_TTL)
+        raise
+    except METLookupFailed:
+        return _get_fallback_wind_data(airport_icao, before_timestamp)
+
+    _remember_last_known_wind(airport_icao, before_timestamp, wind_data)
+
+    if cfg.WIND_CACHE_ENABLED:
+        _wind_cache.set(key, wind_data,
+                        ttl=_get_ttl(bucket, now=time.time(), source=wind_data.source))
+
+    return wind_data
+
+
+def get_wind_series(airport_icao: str,
+                    from_timestamp: int,
+                    to_timestamp: int,
+                    step: int) -> WindSeries:
+    """
+    Resolves the wind of every `step` seconds from `from_timestamp` (included) to `to_timestamp`
+    (excluded) with the same METAR over TAF precedence as `get_wind_data`. The prefetched
+    snapshot is used when it covers the requested steps, otherwise the provider is called within
+    the MET lookup budget and through the circuit breaker (see `_call_provider`).
+    """
+    snapshot = _get_fresh_snapshot(airport_icao)
+    if snapshot is not None:
+        series = snapshot.wind_series
+        timestamps = _get_series_timestamps(from_timestamp, to_timestamp, step)
+        indexes = (timestamps - series.start) // series.step
+
+        if len(timestamps) and indexes[0] >= 0 and indexes[-1] < len(series):
+            return WindSeries(start=from_timestamp,
+                              step=step,
+                              direction=series.direction[indexes],
+                              speed=series.speed[indexes],
+                              source=series.source[indexes])
+
+    return _call_provider(get_wind_provider().get_wind_series,
+                          airport_icao, from_timestamp, to_timestamp, step)
+
+
+def get_last_taf_end_time(airport_icao: str) -> datetime:
+    snapshot = _get_fresh_snapshot(airport_icao)
+    if snapshot is not None and snapshot.taf_end_time is not None:
+        return snapshot.taf_end_time
+
+    try:
+        return _call_provider(get_wind_provider().get_last_taf_end_time, airport_icao)
+    except METLookupFailed:
+        snapshot = _snapshots.get(airport_icao)
+
+        if snapshot is not None and snapshot.taf_end_time is not None \
+                and time.time() - snapshot.refreshed_at <= cfg.MET_FALLBACK_MAX_STALENESS:
+            return snapshot.taf_end_time
+
+        raise met_repo.METNotAvailable()
+
+
+def get_wind_cache_stats() -> dict:
+    return {
+        **_wind_cache.stats.to_dict(),
+        "negative_hits": _negative_hits
+    }
+
+
+def get_met_lookup_stats() -> dict:
+    return {
+        "coalesced": _wind_flights.stats.coalesced,
+        "circuit_breaker": _circuit_breaker.state,
+        "fallbacks": _fallbacks
+    }
+
+
+def get_met_snapshots_stats() -> dict:
+    return {
+        airport_icao: {
+            "refreshed_at": snapshot.refreshed_at,
+            "wind_series_steps": len(snapshot.wind_series)
+        }
+        for airport_icao, snapshot in _snapshots.items()
+    }
+
+
+def clear_wind_cache() -> None:
+    global _negative_hits
+
+    _wind_cache.clear()
+    _negative_hits = 0
@@ -36,10 +36,14 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 __author__ = "EUROCONTROL (SWIM)"
 
 import json
+import os
 from pathlib import Path
 
+from predicted_runway.cache import create_cache
 from predicted_runway.config import ARRIVALS_RUNWAY_MODEL_STATS_DIR, \
-    ARRIVALS_RUNWAY_CONFIG_MODEL_STATS_DIR
+    ARRIVALS_RUNWAY_CONFIG_MODEL_STATS_DIR, STATS_CACHE_TTL
+
+_stats_cache = create_cache(namespace='stats', maxsize=256)
 
 
 def _preprocess_content(content: str) -> str:
@@ -48,7 +52,7 @@ def _preprocess_content(content: str) -> str:
     return content
 
 
-def _get_stats(path: Path) -> dict:
+def _read_stats(path: Path) -> dict:
     with open(path, 'r') as f:
         content = f.read()
 
@@ -57,6 +61,18 @@ def _get_stats(path: Path) -> dict:
     return json.loads(content)
 
 
+def _get_stats(path: Path) -> dict:
+    # the modification time is part of the key so that updated stats are picked up right away
+    key = (str(path), os.stat(path).st_mtime_ns)
+
+    stats = _stats_cache.get(key)
+    if stats is None:
+        stats = _read_stats(path)
+        _stats_cache.set(key, stats, ttl=STATS_CACHE_TTL)
+
+    return stats
+
+
 def get_arrivals_runway_airport_stats(destination_icao: str) -> dict:
     return _get_stats(
         path=Path(ARRIVALS_RUNWAY_MODEL_STATS_DIR).joinpath(f"{destination_icao}.json"))
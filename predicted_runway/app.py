@@ -46,7 +46,9 @@ import yaml
 from mongoengine import connect
 from flask_cors import CORS
 
-from predicted_runway import config as cfg
+from predicted_runway import config as cfg, compression, serialization
+from predicted_runway.adapters import airports, met
+from predicted_runway.domain import precompute, predictor
 
 
 def _configure_logging():
@@ -57,6 +59,15 @@ def _configure_mongo():
     connect(**cfg.MONGO)
 
 
+def _configure_json(app):
+    # used by jsonify and by connexion to serialise what the handlers return
+    app.json_encoder = serialization.JSONEncoder
+
+
+def _configure_compression(app):
+    app.after_request(compression.compress_response)
+
+
 def get_openapi_spec(openapi_path: Path) -> dict:
     """
     Evaluates the x-hidden attribute of the paths and prevents them from showing up in the OpenAPi
@@ -97,9 +108,26 @@ def create_app():
 
     app.secret_key = getenv('SECRET_KEY')
 
+    _configure_json(app)
+
     _configure_logging()
 
-    _configure_mongo()
+    if cfg.MET_PROVIDER == 'mongo':
+        _configure_mongo()
+
+    if cfg.PREDICTION_DISK_CACHE_DIR:
+        predictor.start_persistent_prediction_cache()
+
+    if cfg.MODEL_WATCH_ENABLED:
+        predictor.start_model_watcher()
+
+    if cfg.MET_PREFETCH_ENABLED:
+        if cfg.PREDICTION_PRECOMPUTE_ENABLED:
+            precompute.start_scheduler()
+
+        met.start_prefetcher(get_airport_icaos=airports.get_destination_icaos)
+
+    _configure_compression(app)
 
     # enable CORS
     CORS(app, resources={r'/*': {'origins': '*'}})
@@ -0,0 +1,148 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import argparse
+import itertools
+import sys
+import timeit
+from typing import Callable
+
+import numpy as np
+
+from predicted_runway import serialization
+from predicted_runway.adapters.airports import get_airport_by_icao
+from predicted_runway.domain.models import Airport, Timestamp, WindInputSource, \
+    RunwayPredictionInput, RunwayConfigPredictionInput, RunwayPredictionOutput, \
+    RunwayConfigPredictionOutput, RunwayProbability, RunwayConfigProbability
+from predicted_runway.routes import negotiation
+from predicted_runway.routes.schemas import RunwayPredictionOutputSchema, \
+    RunwayConfigPredictionOutputSchema, CompactPredictionOutputSchema, IdsPredictionOutputSchema
+
+
+def get_prediction_dumps(destination: Airport, seed: int = 0) -> dict[str, dict]:
+    """
+    Returns the responses of the prediction endpoints in each format, for random probabilities
+    over the runways of `destination` and over the pairs of its runways as configurations.
+    """
+    random = np.random.default_rng(seed)
+    runway_names = [runway.name for runway in destination.runways]
+    runway_configs = [str(pair) for pair in itertools.combinations(runway_names, 2)]
+
+    runway_input = RunwayPredictionInput(origin=destination, destination=destination,
+                                         timestamp=Timestamp(1650751200), wind_direction=180.,
+                                         wind_speed=10., wind_input_source=WindInputSource.USER)
+    runway_output = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name=name, value=value)
+                for name, value in zip(runway_names,
+                                       random.dirichlet(np.ones(len(runway_names))))],
+        destination=destination
+    )
+    runway_config_input = RunwayConfigPredictionInput(
+        destination=destination, timestamp=Timestamp(1650751200), wind_direction=180.,
+        wind_speed=10., wind_input_source=WindInputSource.USER
+    )
+    runway_config_output = RunwayConfigPredictionOutput(
+        probas=[RunwayConfigProbability(runway_config=config, value=value)
+                for config, value in zip(runway_configs,
+                                         random.dirichlet(np.ones(len(runway_configs))))],
+        destination=destination
+    )
+
+    dumps = {}
+    for kind, prediction_input, prediction_output, geojson_schema in [
+        ('runway', runway_input, runway_output, RunwayPredictionOutputSchema),
+        ('runway_config', runway_config_input, runway_config_output,
+         RunwayConfigPredictionOutputSchema),
+    ]:
+        for output_format, schema in [('geojson', geojson_schema),
+                                      ('compact', CompactPredictionOutputSchema),
+                                      ('ids', IdsPredictionOutputSchema)]:
+            dumps[f'{kind} {output_format}'] = schema(prediction_input, prediction_output).dump()
+
+    return dumps
+
+
+def _time(encode: Callable[[], bytes | str], number: int) -> float:
+    return timeit.timeit(encode, number=number) / number
+
+
+def benchmark_payload(payload: dict, number: int) -> dict:
+    """
+    Returns the encoding time (seconds) and the size (bytes) of the payload as JSON and as
+    MessagePack.
+    """
+    def encode_json():
+        return serialization.dumps(payload, sort_keys=True).encode()
+
+    def encode_msgpack():
+        return negotiation.packb(payload)
+
+    return {
+        'json_seconds': _time(encode_json, number),
+        'json_bytes': len(encode_json()),
+        'msgpack_seconds': _time(encode_msgpack, number),
+        'msgpack_bytes': len(encode_msgpack()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compares the encoding time and the size of the '
+                                                 'prediction responses as JSON and MessagePack.')
+    parser.add_argument('--destination', default='EHAM',
+                        help='ICAO of the destination airport whose runways are predicted')
+    parser.add_argument('--number', type=int, default=2000,
+                        help='number of encodings timed per payload')
+    args = parser.parse_args()
+
+    if negotiation.msgpack is None:
+        sys.exit('The benchmark requires the msgpack package to be installed.')
+
+    destination = get_airport_by_icao(args.destination)
+    if destination is None:
+        sys.exit(f'Unknown destination {args.destination}')
+
+    print(f"{'payload':<24}{'json us':>10}{'msgpack us':>12}{'json B':>10}{'msgpack B':>11}")
+    for name, payload in get_prediction_dumps(destination).items():
+        report = benchmark_payload(payload, args.number)
+
+        print(f"{name:<24}{report['json_seconds'] * 1e6:>10.1f}"
+              f"{report['msgpack_seconds'] * 1e6:>12.1f}{report['json_bytes']:>10}"
+              f"{report['msgpack_bytes']:>11}")
+
+
+if __name__ == '__main__':
+    main()
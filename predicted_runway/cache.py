@@ -0,0 +1,548 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Hashable, Callable, Protocol
+
+import predicted_runway.config as cfg
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate
+        }
+
+
+class TTLCache:
+    """
+    Thread safe in-process cache where every entry carries its own time to live. The least
+    recently used entries are evicted once `maxsize` is exceeded.
+    """
+
+    def __init__(self, maxsize: int, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._timer = timer
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is not None:
+                expires_at, value = item
+
+                if expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+
+                del self._data[key]
+
+            self.stats.misses += 1
+
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (self._timer() + ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+
+            for key in keys:
+                del self._data[key]
+
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.stats = CacheStats()
+
+
+class CacheBackend(Protocol):
+    """
+    Stores opaque values under string keys. The ttl is a hint for the eviction of the backend,
+    the expiry itself is enforced by `Cache` so that it behaves the same on every backend.
+
+    Backends with `holds_objects` keep the values as they are given instead of their bytes.
+    """
+    holds_objects: bool
+
+    def get(self, key: str) -> bytes | None:
+        ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class InProcessCacheBackend:
+    holds_objects = True
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        return self._cache.invalidate(predicate)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SharedMemoryCacheBackend:
+    """
+    Hash table in a memory mapped file which is shared by all the processes of the host that open
+    the same path. The table is split in sets of `ways` fixed size slots; a key can only live in
+    the set its hash points to and replaces the entry of that set that expires first. Entries
+    bigger than a slot are not stored. The keys are stored with the values so that entries can be
+    invalidated by key like in the other backends.
+
+    Slot layout: key hash (16 bytes) | expires at (float64) | key length (uint16) |
+    value length (uint32) | key | value
+    """
+    holds_objects = False
+    _HEADER = struct.Struct('<16sdHI')
+
+    def __init__(self, path: Path, slots: int, slot_size: int, ways: int = 4):
+        self.path = Path(path)
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = max(slots // ways, 1)
+        self._size = self.sets * ways * slot_size
+        self._lock = threading.Lock()
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, self._size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self._mmap = mmap.mmap(self._fd, self._size)
+
+    @staticmethod
+    def _hash(key: str) -> bytes:
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def _get_set_offsets(self, key_hash: bytes) -> range:
+        set_index = int.from_bytes(key_hash[:8], 'little') % self.sets
+        start = set_index * self.ways * self.slot_size
+
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    @contextmanager
+    def _locked(self, operation: int):
+        # flock only excludes other processes, threads of this one are excluded by the lock
+        with self._lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read_key(self, offset: int, key_length: int) -> bytes:
+        start = offset + self._HEADER.size
+
+        return self._mmap[start:start + key_length]
+
+    def get(self, key: str) -> bytes | None:
+        key_hash = self._hash(key)
+        encoded_key = key.encode()
+
+        with self._locked(fcntl.LOCK_SH):
+            for offset in self._get_set_offsets(key_hash):
+                slot_hash, expires_at, key_length, length = \
+                    self._HEADER.unpack_from(self._mmap, offset)
+
+                if slot_hash == key_hash and expires_at > time.time() \
+                        and self._read_key(offset, key_length) == encoded_key:
+                    start = offset + self._HEADER.size + key_length
+                    return self._mmap[start:start + length]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        encoded_key = key.encode()
+        if ttl <= 0 or self._HEADER.size + len(encoded_key) + len(value) > self.slot_size:
+            return
+
+        key_hash = self._hash(key)
+
+        with self._locked(fcntl.LOCK_EX):
+            victim_offset, victim_expires_at = None, None
+
+            for offset in self._get_set_offsets(key_hash):
+                slot_hash, expires_at, _, _ = self._HEADER.unpack_from(self._mmap, offset)
+
+                if slot_hash == key_hash:
+                    victim_offset = offset
+                    break
+
+                if victim_offset is None or expires_at < victim_expires_at:
+                    victim_offset, victim_expires_at = offset, expires_at
+
+            self._HEADER.pack_into(self._mmap, victim_offset, key_hash, time.time() + ttl,
+                                   len(encoded_key), len(value))
+            start = victim_offset + self._HEADER.size
+            self._mmap[start:start + len(encoded_key) + len(value)] = encoded_key + value
+
+    def delete(self, key: str) -> None:
+        key_hash = self._hash(key)
+
+        with self._locked(fcntl.LOCK_EX):
+            for offset in self._get_set_offsets(key_hash):
+                slot_hash, _, _, _ = self._HEADER.unpack_from(self._mmap, offset)
+
+                if slot_hash == key_hash:
+                    self._HEADER.pack_into(self._mmap, offset, bytes(16), 0., 0, 0)
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        invalidated = 0
+
+        with self._locked(fcntl.LOCK_EX):
+            for offset in range(0, self._size, self.slot_size):
+                slot_hash, _, key_length, _ = self._HEADER.unpack_from(self._mmap, offset)
+                if slot_hash == bytes(16):
+                    continue
+
+                try:
+                    key = self._read_key(offset, key_length).decode()
+                except UnicodeDecodeError:
+                    # written with another layout
+                    key = None
+
+                if key is None or predicate(key):
+                    self._HEADER.pack_into(self._mmap, offset, bytes(16), 0., 0, 0)
+                    invalidated += 1
+
+        return invalidated
+
+    def clear(self) -> None:
+        with self._locked(fcntl.LOCK_EX):
+            self._mmap[:] = bytes(self._size)
+
+
+class RedisCacheBackend:
+    """
+    Stores the entries in Redis so that they are shared by every worker of every host. The client
+    only needs the get/set/delete/scan_iter subset of the redis-py API.
+    """
+    holds_objects = False
+
+    def __init__(self, client: Any, prefix: str = 'predicted-runway:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisCacheBackend':
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis cache backend requires the redis package to be installed.")
+
+        return cls(client=redis.Redis.from_url(url))
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if ttl > 0:
+            self.client.set(self.prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        keys = [
+            key for key in self.client.scan_iter(match=f"{self.prefix}*")
+            if predicate(key.decode()[len(self.prefix):])
+        ]
+
+        if keys:
+            self.client.delete(*keys)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate(lambda _: True)
+
+
+class PersistentCacheTier(Protocol):
+
+    def get(self, key: str) -> bytes | None:
+        ...
+
+    def put(self, key: str, value: bytes, expires_at: float, scope: str = '') -> None:
+        ...
+
+    def drop_scope(self, scope: str) -> None:
+        ...
+
+
+class CacheCodec(Protocol):
+
+    def dumps(self, value: Any) -> bytes:
+        ...
+
+    def loads(self, data: bytes) -> Any:
+        ...
+
+
+class JSONCodec:
+    """
+    Serialises the values made of JSON types (tuples come back as lists). Unlike pickle, loading
+    what another process wrote to a shared backend cannot run code.
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class Cache:
+    """
+    Caches values under a namespace of a backend. Keys are rendered with `repr` and values are
+    stored together with their absolute expiry time, which is checked on every read, so that keys
+    and ttl semantics are the same whatever the backend. The values are serialised by `codec`,
+    except in the backends that hold objects.
+
+    An optional persistent tier is looked up on backend misses and receives every write.
+    """
+    _EXPIRES_AT = struct.Struct('<d')
+
+    def __init__(self,
+                 namespace: str,
+                 backend: CacheBackend,
+                 persistent_tier: PersistentCacheTier | None = None,
+                 codec: CacheCodec | None = None):
+        self.namespace = namespace
+        self.backend = backend
+        self.persistent_tier = persistent_tier
+        self.codec = codec or JSONCodec()
+        self.stats = CacheStats()
+        self.persistent_hits = 0
+
+    def _get_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key!r}"
+
+    def _encode(self, expires_at: float, value: Any) -> bytes:
+        return self._EXPIRES_AT.pack(expires_at) + self.codec.dumps(value)
+
+    def _decode(self, payload: bytes) -> tuple[float, Any] | None:
+        try:
+            expires_at, = self._EXPIRES_AT.unpack_from(payload)
+            return expires_at, self.codec.loads(payload[self._EXPIRES_AT.size:])
+        except Exception as e:
+            # e.g. written by an older version, handled as a miss
+            _logger.debug('Undecodable %s cache entry: %s', self.namespace, e)
+            return None
+
+    def _set_backend_entry(self, key: str, expires_at: float, value: Any,
+                           payload: bytes = None) -> None:
+        if self.backend.holds_objects:
+            entry = (expires_at, value)
+        else:
+            entry = payload if payload is not None else self._encode(expires_at, value)
+
+        self.backend.set(key, entry, ttl=expires_at - time.time())
+
+    def _get_entry(self, key: str) -> tuple[float, Any] | None:
+        entry = self.backend.get(key)
+
+        if entry is not None:
+            return entry if self.backend.holds_objects else self._decode(entry)
+
+        if self.persistent_tier is None:
+            return None
+
+        payload = self.persistent_tier.get(key)
+        entry = self._decode(payload) if payload is not None else None
+
+        if entry is not None:
+            self.persistent_hits += 1
+            self._set_backend_entry(key, *entry, payload=payload)
+
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._get_entry(self._get_key(key))
+
+        if entry is not None:
+            expires_at, value = entry
+
+            if expires_at > time.time():
+                self.stats.hits += 1
+                return value
+
+        self.stats.misses += 1
+
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float, scope: str = '') -> None:
+        if ttl <= 0:
+            return
+
+        expires_at = time.time() + ttl
+        payload = None
+        if not self.backend.holds_objects or self.persistent_tier is not None:
+            payload = self._encode(expires_at, value)
+
+        self._set_backend_entry(self._get_key(key), expires_at, value, payload=payload)
+
+        if self.persistent_tier is not None:
+            self.persistent_tier.put(self._get_key(key), payload, expires_at=expires_at,
+                                     scope=scope)
+
+    def drop_scope(self, scope: str) -> None:
+        if self.persistent_tier is not None:
+            self.persistent_tier.drop_scope(scope)
+
+    def delete(self, key: Hashable) -> None:
+        self.backend.delete(self._get_key(key))
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        """
+        Removes the entries of the namespace whose rendered key matches the predicate, where the
+        backend is able to enumerate its keys.
+        """
+        prefix = f"{self.namespace}:"
+
+        return self.backend.invalidate(
+            lambda key: key.startswith(prefix) and predicate(key[len(prefix):]))
+
+    def clear(self) -> None:
+        self.invalidate(lambda _: True)
+        self.stats = CacheStats()
+
+
+_shared_backend: CacheBackend | None = None
+
+
+def _get_shared_backend() -> CacheBackend:
+    global _shared_backend
+
+    if _shared_backend is None:
+        if cfg.CACHE_BACKEND == 'shared_memory':
+            _shared_backend = SharedMemoryCacheBackend(path=Path(cfg.CACHE_SHARED_MEMORY_PATH),
+                                                       slots=cfg.CACHE_SHARED_MEMORY_SLOTS,
+                                                       slot_size=cfg.CACHE_SHARED_MEMORY_SLOT_SIZE)
+        elif cfg.CACHE_BACKEND == 'redis':
+            _shared_backend = RedisCacheBackend.from_url(cfg.CACHE_REDIS_URL)
+        else:
+            raise ValueError(f"Invalid cache backend: {cfg.CACHE_BACKEND}")
+
+    return _shared_backend
+
+
+def create_cache(namespace: str,
+                 maxsize: int,
+                 persistent_tier: PersistentCacheTier | None = None,
+                 codec: CacheCodec | None = None) -> Cache:
+    """
+    Creates the cache of a namespace on the configured backend. `maxsize` only bounds in-process
+    caches, the shared ones are sized by their own configuration.
+    """
+    if cfg.CACHE_BACKEND == 'memory':
+        backend = InProcessCacheBackend(maxsize=maxsize)
+    else:
+        backend = _get_shared_backend()
+
+    return Cache(namespace=namespace, backend=backend, persistent_tier=persistent_tier,
+                 codec=codec)
@@ -0,0 +1,118 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import load, dump
+
+from predicted_runway.domain.compact import CompactForest, compact_forest
+
+
+def get_parity_input(model: CompactForest, samples: int, seed: int = 0) -> pd.DataFrame:
+    # values spread over the range of the thresholds of each feature, so that all the branches
+    # get exercised
+    random = np.random.default_rng(seed)
+    internal = model.children_left != -1
+    columns = {}
+
+    for index, name in enumerate(model.feature_names_in_):
+        thresholds = model.threshold[internal & (model.feature == index)]
+        low, high = (thresholds.min(), thresholds.max()) if len(thresholds) else (0., 1.)
+        margin = max(high - low, 1.) * .1
+        columns[name] = random.uniform(low - margin, high + margin, samples)
+
+    return pd.DataFrame(columns)
+
+
+def compact_model_file(path: Path, output_path: Path, samples: int) -> dict:
+    """
+    Writes the compact version of the forest of a model file and returns the size reduction and
+    the largest probability difference between both versions over `samples` inputs.
+    """
+    model = load(path)
+    compact_model = compact_forest(model)
+
+    model_input = get_parity_input(compact_model, samples)
+    difference = np.abs(compact_model.predict_proba(model_input)
+                        - model.predict_proba(model_input)).max()
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    dump(compact_model, output_path)
+
+    size = os.path.getsize(path)
+    compact_size = os.path.getsize(output_path)
+
+    return {
+        "size": size,
+        "compact_size": compact_size,
+        "reduction": 1 - compact_size / size,
+        "max_difference": float(difference)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Writes the compact version of the forests of '
+                                                 'model files and reports their size reduction.')
+    parser.add_argument('paths', nargs='+', type=Path, help='model files to compact')
+    parser.add_argument('--output-dir', type=Path, required=True,
+                        help='directory where the compact model files are written, with the same '
+                             'names')
+    parser.add_argument('--samples', type=int, default=1000,
+                        help='number of random inputs the predictions are compared on')
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help='largest accepted probability difference')
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.paths:
+        report = compact_model_file(path, args.output_dir.joinpath(path.name), args.samples)
+        failed |= report['max_difference'] > args.tolerance
+
+        print(f"{path}: {report['size']} -> {report['compact_size']} bytes "
+              f"({report['reduction']:.1%} smaller), max probability difference "
+              f"{report['max_difference']:.2e}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import gzip
+import hashlib
+
+from flask import request, Response
+
+import predicted_runway.config as cfg
+from predicted_runway.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+# (encoding, digest of the body) -> compressed body
+_compressed_bodies = TTLCache(maxsize=cfg.COMPRESSION_CACHE_MAXSIZE)
+
+
+def get_encoding(accept_encodings) -> str | None:
+    """
+    Returns the encoding of the response: brotli when installed and accepted at least as much as
+    gzip, gzip if accepted, None otherwise.
+    """
+    gzip_quality = accept_encodings[GZIP]
+
+    if brotli is not None and accept_encodings[BROTLI] and \
+            accept_encodings[BROTLI] >= gzip_quality:
+        return BROTLI
+
+    return GZIP if gzip_quality else None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=cfg.COMPRESSION_BROTLI_QUALITY)
+
+    # no timestamp, the same body is always compressed to the same bytes
+    return gzip.compress(body, compresslevel=cfg.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compresses the body, or returns its cached compression, e.g. for the responses of the cached
+    predictions.
+    """
+    key = encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    compressed = _compressed_bodies.get(key)
+    if compressed is None:
+        compressed = _compress(body, encoding)
+        _compressed_bodies.set(key, compressed, ttl=cfg.COMPRESSION_CACHE_TTL)
+
+    return compressed
+
+
+def _is_compressible(response: Response) -> bool:
+    # streamed and passed through (e.g. files) bodies are left untouched
+    return 200 <= response.status_code < 300 and response.status_code != 206 \
+        and not response.is_streamed \
+        and not response.direct_passthrough \
+        and 'Content-Encoding' not in response.headers \
+        and response.mimetype in cfg.COMPRESSION_MIMETYPES \
+        and (response.content_length or 0) >= cfg.COMPRESSION_MIN_SIZE
+
+
+def compress_response(response: Response) -> Response:
+    if not cfg.COMPRESSION_ENABLED or not _is_compressible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = get_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # the representation differs from the uncompressed one, which a strong ETag would identify
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def get_compression_stats() -> dict:
+    return {
+        "cache": _compressed_bodies.stats.to_dict(),
+        "cached_bodies": len(_compressed_bodies)
+    }
+
+
+def clear_compressed_bodies() -> None:
+    _compressed_bodies.clear()
@@ -31,7 +31,12 @@ LOGGING = {
 }
 
 
-DESTINATION_ICAOS = os.getenv("DESTINATION_ICAOS", "EHAM,LEMD,LFPO,LOWW").split(',')
+# Comma separated destinations. When empty, the destinations are the airports of the catalog
+# having a model in ARRIVALS_RUNWAY_MODELS_DIR or ARRIVALS_RUNWAY_CONFIG_MODELS_DIR, discovered
+# again every DESTINATIONS_DISCOVERY_INTERVAL seconds.
+DESTINATION_ICAOS = [icao for icao in os.getenv("DESTINATION_ICAOS", "").split(',') if icao]
+
+DESTINATIONS_DISCOVERY_INTERVAL = int(os.getenv("DESTINATIONS_DISCOVERY_INTERVAL", "60"))
 
 MONGO = {
   "db": os.getenv("MET_UPDATE_DB_NAME", "met-update"),
@@ -53,11 +58,199 @@ ARRIVALS_RUNWAY_CONFIG_MODEL_STATS_DIR = os.getenv("ARRIVALS_RUNWAY_CONFIG_MODEL
 ICAO_AIRPORTS_CATALOG_PATH = os.getenv("ICAO_AIRPORTS_CATALOG_PATH",
                                        "/data/airports/icao_airports_catalog.json")
 
+# Where the METAR/TAF wind information is read from: "mongo" (met-update DB), "memory" (empty,
+# filled programmatically) or "file" (replayed from the JSON/CSV file at MET_DATA_PATH)
+MET_PROVIDER = os.getenv("MET_PROVIDER", "mongo")
+
+MET_DATA_PATH = os.getenv("MET_DATA_PATH", "/data/met/met.json")
+
+METAR_VALIDITY_SECONDS = int(os.getenv("METAR_VALIDITY_SECONDS", "3600"))
+
+# Backend shared by the wind, prediction and stats caches: "memory" (per process), "shared_memory"
+# (memory mapped file shared by the workers of the host) or "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+CACHE_SHARED_MEMORY_PATH = os.getenv("CACHE_SHARED_MEMORY_PATH",
+                                     "/dev/shm/predicted-runway-cache")
+
+CACHE_SHARED_MEMORY_SLOTS = int(os.getenv("CACHE_SHARED_MEMORY_SLOTS", "4096"))
+
+CACHE_SHARED_MEMORY_SLOT_SIZE = int(os.getenv("CACHE_SHARED_MEMORY_SLOT_SIZE", "16384"))
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "3600"))
+
+# Wind lookups are cached per destination and time bucket. The bucket matches the 15 minute
+# granularity of the runway configuration model. Buckets that are already in the past are kept
+# for WIND_CACHE_PAST_TTL, the current one until it elapses (next METAR) and future ones until the
+# next TAF issuance, or until they start when their wind comes from a METAR. Missing MET data is
+# cached for WIND_CACHE_NEGATIVE_TTL only.
+WIND_CACHE_ENABLED = os.getenv("WIND_CACHE_ENABLED", "true").lower() == "true"
+
+WIND_CACHE_MAXSIZE = int(os.getenv("WIND_CACHE_MAXSIZE", "4096"))
+
+WIND_CACHE_BUCKET_SECONDS = int(os.getenv("WIND_CACHE_BUCKET_SECONDS", "900"))
+
+WIND_CACHE_PAST_TTL = int(os.getenv("WIND_CACHE_PAST_TTL", "21600"))
+
+WIND_CACHE_NEGATIVE_TTL = int(os.getenv("WIND_CACHE_NEGATIVE_TTL", "60"))
+
+TAF_ISSUE_INTERVAL_SECONDS = int(os.getenv("TAF_ISSUE_INTERVAL_SECONDS", "21600"))
+
+
+# When enabled, a background thread started by the app refreshes the MET information of every
+# destination airport every MET_PREFETCH_INTERVAL seconds so that wind lookups for the current
+# time and over the TAF horizon are served from memory. Snapshots older than
+# MET_PREFETCH_MAX_AGE are ignored.
+MET_PREFETCH_ENABLED = os.getenv("MET_PREFETCH_ENABLED", "false").lower() == "true"
+
+MET_PREFETCH_INTERVAL = int(os.getenv("MET_PREFETCH_INTERVAL", "300"))
+
+MET_PREFETCH_MAX_AGE = int(os.getenv("MET_PREFETCH_MAX_AGE", "900"))
+
+
+# Every MET lookup of a request has to complete within MET_LOOKUP_TIMEOUT seconds, the wait for one
+# of the MET_LOOKUP_WORKERS threads included (0 disables the budget). There should be as many
+# workers as threads serving requests so that lookups do not queue. With pymongo >= 4.2 the budget
+# is enforced by the MongoDB driver as well for these lookups only, so that timed out lookups do
+# not keep holding the workers while the prefetcher keeps the default timeouts. After
+# MET_CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive failures the provider is not called for
+# MET_CIRCUIT_BREAKER_RESET_TIMEOUT seconds. Meanwhile, the last known wind of the airport is used
+# provided that it is not older than MET_FALLBACK_MAX_STALENESS seconds.
+MET_LOOKUP_TIMEOUT = float(os.getenv("MET_LOOKUP_TIMEOUT", "0.5"))
+
+MET_LOOKUP_WORKERS = int(os.getenv("MET_LOOKUP_WORKERS", "4"))
+
+MET_CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("MET_CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+
+MET_CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv("MET_CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+
+MET_FALLBACK_MAX_STALENESS = int(os.getenv("MET_FALLBACK_MAX_STALENESS", "3600"))
+
+
+# Predictions are cached per model and (rounded) model input values, so that all the requests
+# resolving to the same model input share the same output.
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+
+PREDICTION_CACHE_MAXSIZE = int(os.getenv("PREDICTION_CACHE_MAXSIZE", "10000"))
+
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+PREDICTION_CACHE_DECIMALS = int(os.getenv("PREDICTION_CACHE_DECIMALS", "2"))
+
+# Optional on-disk tier of the prediction cache that survives restarts (disabled when empty)
+PREDICTION_DISK_CACHE_DIR = os.getenv("PREDICTION_DISK_CACHE_DIR", "")
+
+PREDICTION_DISK_CACHE_MAX_MB = int(os.getenv("PREDICTION_DISK_CACHE_MAX_MB", "512"))
+
+# Precomputation of the predictions of every quarter hour of the prefetched MET snapshots
+# (requires MET_PREFETCH_ENABLED). Runway predictions are precomputed per origin angle bin of
+# PREDICTION_PRECOMPUTE_ORIGIN_ANGLE_BIN degrees, at the centre of the bin.
+PREDICTION_PRECOMPUTE_ENABLED = \
+    os.getenv("PREDICTION_PRECOMPUTE_ENABLED", "false").lower() == "true"
+
+PREDICTION_PRECOMPUTE_ORIGIN_ANGLE_BIN = int(os.getenv("PREDICTION_PRECOMPUTE_ORIGIN_ANGLE_BIN",
+                                                       "10"))
+
+# Micro-batching of the concurrent predictions of a model: rows are collected for up to
+# INFERENCE_BATCH_MAX_WAIT_MS milliseconds or INFERENCE_BATCH_MAX_SIZE rows before a single
+# batched prediction. Trades a little latency for throughput under concurrent load.
+INFERENCE_BATCHING_ENABLED = os.getenv("INFERENCE_BATCHING_ENABLED", "false").lower() == "true"
+
+INFERENCE_BATCH_MAX_SIZE = int(os.getenv("INFERENCE_BATCH_MAX_SIZE", "64"))
+
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "2"))
+
+# Where the predictions run: "thread" (in the thread serving the request), "process" (in a
+# pool of INFERENCE_PROCESSES processes, which only share the memory mapped compact models, see
+# predicted_runway.compact_models) or "server" (in the inference server of the node, see
+# predicted_runway.inference_server)
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", str(os.cpu_count() or 1)))
+
+INFERENCE_SERVER_SOCKET = os.getenv("INFERENCE_SERVER_SOCKET",
+                                    "/tmp/predicted-runway-inference.sock")
+
+INFERENCE_SERVER_POOL_SIZE = int(os.getenv("INFERENCE_SERVER_POOL_SIZE", "8"))
+
+INFERENCE_SERVER_TIMEOUT = float(os.getenv("INFERENCE_SERVER_TIMEOUT", "5"))
+
+# Reloads the models in the background when their files change (inotify where available, polling
+# every MODEL_WATCH_INTERVAL seconds otherwise). When disabled, a changed model is reloaded by the
+# first request using it.
+MODEL_WATCH_ENABLED = os.getenv("MODEL_WATCH_ENABLED", "true").lower() == "true"
+
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+
+# Number of trees averaged by the predictions requested with quality=fast, for the models without
+# a subset of trees selected offline (python -m predicted_runway.select_fast_trees)
+PREDICTION_FAST_ESTIMATORS = int(os.getenv("PREDICTION_FAST_ESTIMATORS", "10"))
+
+# Models are loaded on their first request and evicted, least valuable first, once they hold more
+# than MODEL_MEMORY_BUDGET_MB (0 for no limit). The models of the MODEL_PINNED_AIRPORTS busiest
+# airports are always kept.
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+
+MODEL_PINNED_AIRPORTS = int(os.getenv("MODEL_PINNED_AIRPORTS", "4"))
+
+# Half life (seconds) of the request frequencies that decide which models are evicted or pinned
+MODEL_FREQUENCY_HALF_LIFE = float(os.getenv("MODEL_FREQUENCY_HALF_LIFE", "3600"))
+
+
+# Fraction of the predictions that are also made, in the background, by the candidate model of
+# their airport (if any) in order to compare it with the current one
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0"))
+
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "100"))
+
+# Responses of COMPRESSION_MIMETYPES of at least COMPRESSION_MIN_SIZE bytes are compressed with
+# brotli (if installed) or gzip, as accepted by the client. The compressed bodies are cached so that
+# the same body is only compressed once.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+COMPRESSION_MIMETYPES = os.getenv("COMPRESSION_MIMETYPES",
+                                  "application/json,application/msgpack,text/html").split(',')
+
+COMPRESSION_CACHE_MAXSIZE = int(os.getenv("COMPRESSION_CACHE_MAXSIZE", "1024"))
+
+COMPRESSION_CACHE_TTL = int(os.getenv("COMPRESSION_CACHE_TTL", "3600"))
+
+CURRENT_MODEL = 'current'
+CANDIDATE_MODEL = 'candidate'
+
+
+def get_model_path(models_dir: str, airport_icao: str, pointer: str = CURRENT_MODEL) -> Path:
+    """
+    The models of an airport are either stored in a single {airport_icao}.pkl file or versioned as
+    {airport_icao}/{version}.pkl files, along with a `current` symlink to the version in use and
+    optionally a `candidate` one to the version being evaluated.
+    """
+    versions_dir = Path(models_dir).joinpath(str(airport_icao))
+
+    if versions_dir.is_dir():
+        return versions_dir.joinpath(pointer).absolute()
+
+    return Path(models_dir).joinpath(f'{airport_icao}.pkl').absolute()
+
 
 def get_runway_model_path(airport_icao: str) -> Path:
-    return Path(ARRIVALS_RUNWAY_MODELS_DIR).joinpath(f'{airport_icao}.pkl').absolute()
+    return get_model_path(ARRIVALS_RUNWAY_MODELS_DIR, airport_icao)
 
 
 def get_runway_config_model_path(airport_icao: str) -> Path:
-    return Path(ARRIVALS_RUNWAY_CONFIG_MODELS_DIR).joinpath(f'{airport_icao}.pkl').absolute()
+    return get_model_path(ARRIVALS_RUNWAY_CONFIG_MODELS_DIR, airport_icao)
+
+
+def get_candidate_model_path(models_dir: str, airport_icao: str) -> Path | None:
+    path = Path(models_dir).joinpath(airport_icao, CANDIDATE_MODEL)
 
+    if path.exists():
+        return path.absolute()
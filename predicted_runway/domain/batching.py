@@ -0,0 +1,184 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import logging
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Protocol
+
+_logger = logging.getLogger(__name__)
+
+# upper bounds of the batch size histogram, the last bucket holds every larger batch
+_BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+_BATCH_SIZE_LABELS = [f"<={bucket}" for bucket in _BATCH_SIZE_BUCKETS] + \
+                     [f">{_BATCH_SIZE_BUCKETS[-1]}"]
+
+
+class BatchPredictor(Protocol):
+    model_id: str | None
+    trained_model: Any
+
+    def predict_values_batch(self, rows: list[list[Any]]) -> list[Any]:
+        ...
+
+
+@dataclass
+class BatchingStats:
+    batches: int = 0
+    rows: int = 0
+    total_wait: float = 0.
+    max_wait: float = 0.
+    batch_sizes: list[int] = field(default_factory=lambda: [0] * len(_BATCH_SIZE_LABELS))
+
+    def record(self, waits: list[float]) -> None:
+        self.batches += 1
+        self.rows += len(waits)
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, *waits)
+        self.batch_sizes[bisect_left(_BATCH_SIZE_BUCKETS, len(waits))] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.,
+            "batch_sizes": dict(zip(_BATCH_SIZE_LABELS, self.batch_sizes)),
+            "mean_queue_wait_ms": 1000 * self.total_wait / self.rows if self.rows else 0.,
+            "max_queue_wait_ms": 1000 * self.max_wait
+        }
+
+
+@dataclass
+class _PendingRow:
+    predictor: BatchPredictor
+    values: list[Any]
+    future: Future
+    enqueued_at: float
+
+
+class InferenceDispatcher:
+    """
+    Merges the rows submitted concurrently for the same model into a single batched prediction.
+    Rows are collected from the arrival of the first pending one for up to `max_wait` seconds or
+    until `max_batch_size` rows are pending, whichever comes first, and each caller gets the
+    output of its own row. Each model has its own queue and worker thread, so that a slow model
+    does not hold up the batches of the others. A worker stops after `idle_timeout` seconds
+    without rows.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float, idle_timeout: float = 60.):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.idle_timeout = idle_timeout
+        self.stats = BatchingStats()
+        self._pending: dict[Hashable, queue.SimpleQueue] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, predictor: BatchPredictor, values: list[Any]) -> Future:
+        future = Future()
+        row = _PendingRow(predictor=predictor,
+                          values=values,
+                          future=future,
+                          enqueued_at=time.monotonic())
+        model_key = predictor.model_id or id(predictor.trained_model)
+
+        # under the lock so that the worker of the model does not stop in the meantime
+        with self._lock:
+            pending = self._pending.get(model_key)
+
+            if pending is None:
+                pending = self._pending[model_key] = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(model_key, pending),
+                                 name=f'inference-dispatcher-{model_key}', daemon=True).start()
+
+            pending.put(row)
+
+        return future
+
+    def predict(self, predictor: BatchPredictor, values: list[Any]) -> Any:
+        return self.submit(predictor, values).result()
+
+    def _collect(self, pending: queue.SimpleQueue) -> list[_PendingRow]:
+        try:
+            rows = [pending.get(timeout=self.idle_timeout)]
+        except queue.Empty:
+            return []
+
+        deadline = rows[0].enqueued_at + self.max_wait
+
+        while len(rows) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+
+            try:
+                rows.append(pending.get(timeout=timeout) if timeout > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+
+        return rows
+
+    def _run(self, model_key: Hashable, pending: queue.SimpleQueue) -> None:
+        while True:
+            rows = self._collect(pending)
+
+            if rows:
+                self._predict(rows)
+                continue
+
+            with self._lock:
+                if pending.empty():
+                    del self._pending[model_key]
+                    return
+
+    def _predict(self, rows: list[_PendingRow]) -> None:
+        started_at = time.monotonic()
+        with self._lock:
+            self.stats.record([started_at - row.enqueued_at for row in rows])
+
+        try:
+            outputs = rows[0].predictor.predict_values_batch([row.values for row in rows])
+        except Exception as e:
+            _logger.exception(f"Batched prediction failed: {e}")
+
+            for row in rows:
+                row.future.set_exception(e)
+        else:
+            for row, output in zip(rows, outputs):
+                row.future.set_result(output)
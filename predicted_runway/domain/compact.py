@@ -0,0 +1,208 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from typing import Any
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+_LEAF = -1
+
+
+def _get_index_dtype(size: int) -> np.dtype:
+    return np.dtype(np.int16) if size <= np.iinfo(np.int16).max else np.dtype(np.int32)
+
+
+class CompactForest:
+    """
+    Random forest reduced to what inference reads, with the nodes of all the trees in flat arrays:
+    float32 thresholds, int16 (int32 for large forests) features and child indices, and float32
+    class probabilities for the leaves only. A leaf has a `children_left` of -1 and the row of its
+    probabilities in `leaf_probas` as `children_right`.
+
+    `fast_estimators` optionally holds the trees selected offline to make fast predictions.
+    """
+
+    def __init__(self,
+                 feature_names_in_: np.ndarray,
+                 classes_: np.ndarray,
+                 roots: np.ndarray,
+                 children_left: np.ndarray,
+                 children_right: np.ndarray,
+                 feature: np.ndarray,
+                 threshold: np.ndarray,
+                 leaf_probas: np.ndarray,
+                 fast_estimators: np.ndarray = None):
+        self.feature_names_in_ = feature_names_in_
+        self.classes_ = classes_
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.leaf_probas = leaf_probas
+        self.fast_estimators = fast_estimators
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.roots, self.children_left, self.children_right,
+                                              self.feature, self.threshold, self.leaf_probas))
+
+    def predict_tree_probas(self, X: Any, estimators: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the leaf probabilities reached by each row of X in each tree of `estimators` (the
+        indices of the trees, all by default), as a (trees, rows, classes) array.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        roots = (self.roots if estimators is None else self.roots[estimators]).astype(np.intp)
+        rows = np.arange(len(X))
+
+        # the current node of every (tree, row) pair, walked down one level per iteration
+        nodes = np.repeat(roots[:, np.newaxis], len(X), axis=1)
+        while True:
+            left = self.children_left[nodes]
+            internal = left != _LEAF
+            if not internal.any():
+                break
+
+            internal_nodes = nodes[internal]
+            values = X[np.broadcast_to(rows, nodes.shape)[internal],
+                       self.feature[internal_nodes]]
+            nodes[internal] = np.where(values <= self.threshold[internal_nodes],
+                                       left[internal],
+                                       self.children_right[internal_nodes])
+
+        return self.leaf_probas[self.children_right[nodes]]
+
+    def predict_proba(self, X: Any, estimators: np.ndarray = None) -> np.ndarray:
+        """
+        Averages the probabilities of the trees of `estimators` (all by default) for each row of X,
+        as RandomForestClassifier.predict_proba does.
+        """
+        # float64 as the forest, the probabilities end up serialised
+        return self.predict_tree_probas(X, estimators).mean(axis=0, dtype=np.float64)
+
+
+def get_fast_estimators(model: Any, default_size: int) -> np.ndarray:
+    """
+    Returns the indices of the trees used by fast predictions: the ones selected offline for a
+    compact forest, the first `default_size` trees otherwise.
+    """
+    fast_estimators = getattr(model, 'fast_estimators', None)
+    if fast_estimators is not None:
+        return fast_estimators
+
+    n_estimators = model.n_estimators if isinstance(model, CompactForest) \
+        else len(model.estimators_)
+
+    return np.arange(min(default_size, n_estimators))
+
+
+def predict_proba_fast(model: Any, X: Any, default_size: int) -> np.ndarray:
+    """
+    Averages the probabilities of the fast subset of the trees of a forest, either compact or a
+    RandomForestClassifier.
+    """
+    estimators = get_fast_estimators(model, default_size)
+
+    if isinstance(model, CompactForest):
+        return model.predict_proba(X, estimators)
+
+    # the trees of the forest are fitted without the feature names
+    X = np.asarray(X, dtype=np.float32)
+
+    return np.mean([model.estimators_[index].predict_proba(X) for index in estimators], axis=0)
+
+
+def _to_float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    """
+    Rounds float64 thresholds down to float32, so that `x <= threshold` takes the same branch for
+    every float32 input as in the trees, which compare the float32 inputs with float64 thresholds.
+    Rounding to the nearest float32 may land on the input right above the threshold and flip the
+    split.
+    """
+    rounded = threshold.astype(np.float32)
+
+    return np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+def compact_forest(model: RandomForestClassifier) -> CompactForest:
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    node_counts = [tree.node_count for tree in trees]
+    leaf_counts = [int((tree.children_left == _LEAF).sum()) for tree in trees]
+
+    index_dtype = _get_index_dtype(max(sum(node_counts), sum(leaf_counts)))
+    roots = np.zeros(len(trees), dtype=index_dtype)
+    children_left = np.empty(sum(node_counts), dtype=index_dtype)
+    children_right = np.empty(sum(node_counts), dtype=index_dtype)
+    feature = np.empty(sum(node_counts), dtype=_get_index_dtype(model.n_features_in_))
+    threshold = np.empty(sum(node_counts), dtype=np.float32)
+    leaf_probas = np.empty((sum(leaf_counts), len(model.classes_)), dtype=np.float32)
+
+    node_offset = 0
+    leaf_offset = 0
+    for index, (tree, node_count, leaf_count) in enumerate(zip(trees, node_counts, leaf_counts)):
+        nodes = slice(node_offset, node_offset + node_count)
+        is_leaf = tree.children_left == _LEAF
+
+        # single output forests, the counts (or fractions) of the classes of each leaf
+        leaf_values = tree.value[is_leaf, 0, :]
+        leaf_probas[leaf_offset:leaf_offset + leaf_count] = \
+            leaf_values / leaf_values.sum(axis=1, keepdims=True)
+
+        roots[index] = node_offset
+        children_left[nodes] = np.where(is_leaf, _LEAF, tree.children_left + node_offset)
+        leaf_rows = np.cumsum(is_leaf) - 1 + leaf_offset
+        children_right[nodes] = np.where(is_leaf, leaf_rows, tree.children_right + node_offset)
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, 0., _to_float32_thresholds(tree.threshold))
+
+        node_offset += node_count
+        leaf_offset += leaf_count
+
+    return CompactForest(feature_names_in_=model.feature_names_in_,
+                         classes_=model.classes_,
+                         roots=roots,
+                         children_left=children_left,
+                         children_right=children_right,
+                         feature=feature,
+                         threshold=threshold,
+                         leaf_probas=leaf_probas)
@@ -0,0 +1,95 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from typing import Callable, Sequence
+
+import numpy as np
+
+from predicted_runway import serialization
+
+_PROBABILITY = '__probability__'
+
+# (kind, destination icao, model class) -> JSON of the feature before and after its probability
+_feature_templates: dict[tuple[str, str, str], tuple[str, str]] = {}
+
+
+def compile_feature_template(feature: dict) -> tuple[str, str]:
+    """
+    Serialises a GeoJSON feature whose probability is the placeholder into the JSON fragments
+    that come before and after the probability, with sorted keys as jsonify serialises it.
+    """
+    prefix, suffix = serialization.dumps(feature, sort_keys=True).split(
+        serialization.dumps(_PROBABILITY)
+    )
+
+    return prefix, suffix
+
+
+def get_feature_template(kind: str,
+                         destination_icao: str,
+                         model_class: str,
+                         create_feature: Callable[[str], dict]) -> tuple[str, str]:
+    """
+    Returns the fragments of the feature of a model class, compiled from `create_feature` (called
+    with the probability placeholder) the first time. The geometry of the airports never changes,
+    so the templates are kept for the lifetime of the process.
+    """
+    key = kind, destination_icao, model_class
+
+    template = _feature_templates.get(key)
+    if template is None:
+        template = compile_feature_template(create_feature(_PROBABILITY))
+        _feature_templates[key] = template
+
+    return template
+
+
+def render_feature_collection(templates: Sequence[tuple[str, str]],
+                              probabilities: np.ndarray) -> str:
+    """
+    Renders a GeoJSON FeatureCollection from feature templates and their probabilities, serialised
+    straight from the array.
+    """
+    return '{"features":[' + ','.join(
+        prefix + probability + suffix
+        for (prefix, suffix), probability in zip(templates,
+                                                 serialization.dumps_numbers(probabilities))
+    ) + '],"type":"FeatureCollection"}'
+
+
+def clear_feature_templates() -> None:
+    _feature_templates.clear()
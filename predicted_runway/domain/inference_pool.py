@@ -0,0 +1,124 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from predicted_runway.domain.registry import ModelRegistry, load_memory_mapped
+
+_logger = logging.getLogger(__name__)
+
+# the registry of a child process of the pool
+_child_registry: ModelRegistry | None = None
+
+
+def _init_child() -> None:
+    global _child_registry
+
+    _child_registry = ModelRegistry(loader=load_memory_mapped)
+
+
+def _predict_proba(model_path: str, rows: np.ndarray) -> tuple[str, np.ndarray]:
+    loaded_model = _child_registry.get(Path(model_path))
+    trained_model = loaded_model.trained_model
+
+    model_input = pd.DataFrame(rows, columns=trained_model.feature_names_in_)
+
+    return loaded_model.model_id, trained_model.predict_proba(model_input)
+
+
+class InferencePool:
+    """
+    Runs the predictions in a pool of child processes, out of the GIL of the workers serving the
+    requests. Every child loads the models it is asked for in its own registry and only receives
+    the path of the model and the feature rows as a float array. The models are memory mapped, so
+    compact forests are shared between the children, while any other model is copied in each of
+    them.
+
+    The children are spawned on first use. A prediction returns None when the child did not
+    predict with the expected model, e.g. while the model file is being replaced.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    # forking a process with running threads is not safe
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_child
+                )
+
+            return self._executor
+
+    def predict_proba(self, model_path: Path, model_id: str, rows: list[list[Any]]) \
+            -> np.ndarray | None:
+
+        executor = self._get_executor()
+
+        try:
+            child_model_id, probas = executor.submit(
+                _predict_proba, str(model_path), np.asarray(rows, dtype=np.float64)
+            ).result()
+        except BrokenProcessPool:
+            _logger.exception('The inference pool is broken, it will be restarted.')
+            self.shutdown()
+            return None
+
+        if child_model_id != model_id:
+            return None
+
+        return probas
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
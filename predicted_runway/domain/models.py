@@ -35,23 +35,33 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 
 __author__ = "EUROCONTROL (SWIM)"
 
+import hashlib
+import json
 import math
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Protocol, Any
+from collections.abc import Mapping
+from functools import cached_property
+from typing import Protocol, Any, Sequence, Iterator
 
 import holidays
+import numpy as np
+
+from predicted_runway.domain.geojson import get_feature_template, render_feature_collection
 
 
 class WindInputSource(Enum):
     METAR = 'METAR'
     TAF = 'TAF'
     USER = 'USER'
+    LAST_KNOWN = 'LAST_KNOWN'
 
     @classmethod
     def choices(cls):
-        return [v.value for v in cls.__members__.values()]
+        # LAST_KNOWN is only ever set by the service when the MET data cannot be retrieved
+        return [v.value for v in cls.__members__.values() if v != cls.LAST_KNOWN]
 
     def __str__(self):
         return f"from {self.value}"
@@ -211,8 +221,106 @@ class RunwayConfigPredictionInput:
         return [_model_input_mapper[feature] for feature in features]
 
 
-class PredictionModelOutput(dict):
-    ...
+RUNWAY = 'runway'
+RUNWAY_CONFIG = 'runway_config'
+
+
+class UnknownRunwayError(ValueError):
+    pass
+
+
+def parse_runway_config(runway_config: str) -> list[str]:
+    runways = runway_config.replace("(", "")\
+                           .replace(")", "")\
+                           .replace("'", "")\
+                           .replace(" ", "")\
+                           .split(",")
+
+    return [runway for runway in runways if runway]
+
+
+@dataclass(frozen=True)
+class ModelClasses:
+    """
+    Classes of a model, in the order of its probabilities. Once compiled for a destination, the
+    runways (a single one for a runway model, several for a runway configuration model) each
+    class refers to are resolved as well.
+    """
+    classes: tuple[str, ...]
+    kind: str = None
+    destination: Airport = field(default=None, compare=False)
+    runways: tuple[tuple[Runway, ...], ...] = field(default=None, compare=False)
+
+    @classmethod
+    def compile(cls, classes: Sequence[str], kind: str, destination: Airport) -> 'ModelClasses':
+        runways_by_name = {runway.name: runway for runway in destination.runways or []}
+        runways = []
+
+        for model_class in classes:
+            names = parse_runway_config(model_class) if kind == RUNWAY_CONFIG else [model_class]
+
+            if unknown_runways := [name for name in names if name not in runways_by_name]:
+                raise UnknownRunwayError(f"Unknown runways of {destination.icao}: "
+                                         f"{unknown_runways}")
+
+            runways.append(tuple(runways_by_name[name] for name in names))
+
+        return cls(classes=tuple(str(model_class) for model_class in classes),
+                   kind=kind,
+                   destination=destination,
+                   runways=tuple(runways))
+
+    def is_compiled_for(self, kind: str, destination: Airport) -> bool:
+        return self.runways is not None and self.kind == kind \
+            and self.destination.icao == destination.icao
+
+    @cached_property
+    def indexes(self) -> dict[str, int]:
+        return {model_class: index for index, model_class in enumerate(self.classes)}
+
+    @cached_property
+    def table_id(self) -> str:
+        """Identifies the classes, and their order, for clients caching the table."""
+        return hashlib.sha256(json.dumps(self.classes).encode()).hexdigest()[:16]
+
+    def to_dict(self) -> dict:
+        return {
+            "table_id": self.table_id,
+            "classes": list(self.classes),
+            "runway_names": [[runway.name for runway in runways] for runways in self.runways]
+        }
+
+
+class PredictionModelOutput(Mapping):
+    """
+    Probabilities predicted by a model, read as a mapping of its classes to their probability. The
+    predictor keeps the probability vector of the model along with the (shared) classes of the
+    model instead of building the mapping.
+    """
+
+    def __init__(self,
+                 probas: Any = (),
+                 model_classes: ModelClasses = None,
+                 probabilities: Sequence[float] = None):
+        if model_classes is None:
+            probas = dict(probas)
+            model_classes = ModelClasses(classes=tuple(probas))
+            probabilities = list(probas.values())
+
+        self.model_classes = model_classes
+        self.probabilities = probabilities
+
+    def __getitem__(self, model_class: str) -> float:
+        return self.probabilities[self.model_classes.indexes[model_class]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.model_classes.classes)
+
+    def __len__(self) -> int:
+        return len(self.model_classes.classes)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)})"
 
 
 @dataclass
@@ -228,36 +336,205 @@ class RunwayConfigProbability:
 
     @property
     def runway_names(self):
-        runways = self.runway_config.replace("(", "")\
-                             .replace(")", "")\
-                             .replace("'", "")\
-                             .replace(" ", "")\
-                             .split(",")
-
-        return [runway for runway in runways if runway]
+        return parse_runway_config(self.runway_config)
 
 
 class PredictionOutput(Protocol):
 
-    def to_geojson(self, exclude_zero_probas: bool = False) -> dict:
+    def to_geojson(self,
+                   exclude_zero_probas: bool = False,
+                   top_k: int = None,
+                   min_probability: float = None) -> dict:
+        ...
+
+    def render_geojson(self,
+                       exclude_zero_probas: bool = False,
+                       top_k: int = None,
+                       min_probability: float = None) -> str:
         ...
 
 
-@dataclass
-class RunwayPredictionOutput:
-    probas: list[RunwayProbability]
-    destination: Airport
+class _ModelPredictionOutput(ABC):
+    """
+    Output of a model for a destination: its probability vector and its classes. The GeoJSON
+    features are built from the runways of the classes, in decreasing order of probability. The
+    classes are compiled for the destination when the model was loaded, or else on the first
+    rendering.
+    """
+    kind: str
+    compact_names_key: str
+
+    def __init__(self, model_output: Mapping[str, float], destination: Airport):
+        if not isinstance(model_output, PredictionModelOutput):
+            model_output = PredictionModelOutput(model_output)
+
+        self.destination = destination
+        self.model_classes = model_output.model_classes
+        self.probabilities = np.asarray(model_output.probabilities, dtype=np.float64)
+        # outputs may be shared by coalesced requests, so the rendering is done once
+        self._geojson = {}
+        self._rendered_geojson = {}
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+
+        return self.destination == other.destination \
+            and self.model_classes.classes == other.model_classes.classes \
+            and np.array_equal(self.probabilities, other.probabilities)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(destination={self.destination.icao!r}, " \
+               f"probas={dict(zip(self.model_classes.classes, self.probabilities))})"
+
+    def select_indexes(self,
+                       exclude_zero_probas: bool = False,
+                       top_k: int = None,
+                       min_probability: float = None) -> np.ndarray:
+        """
+        Returns the indexes of the classes to output, in decreasing order of probability: the
+        `top_k` most probable ones with at least `min_probability`. They are picked from the
+        probability vector, without sorting all the classes.
+        """
+        probabilities = self.probabilities
+        indexes = np.arange(len(probabilities))
+
+        if exclude_zero_probas:
+            indexes = indexes[probabilities > 0.01]
+
+        if min_probability is not None:
+            indexes = indexes[probabilities[indexes] >= min_probability]
+
+        if top_k is not None and top_k < len(indexes):
+            indexes = np.sort(indexes[np.argpartition(-probabilities[indexes], top_k - 1)[:top_k]])
+
+        # stable, so that classes of equal probability keep the order of the model
+        return indexes[np.argsort(-probabilities[indexes], kind='stable')]
+
+    def _get_runways(self, index: int) -> tuple[Runway, ...]:
+        if not self.model_classes.is_compiled_for(self.kind, self.destination):
+            self.model_classes = ModelClasses.compile(self.model_classes.classes, self.kind,
+                                                      self.destination)
+
+        return self.model_classes.runways[index]
+
+    @abstractmethod
+    def _get_feature(self, index: int, probability: Any) -> dict:
+        ...
+
+    def _to_geojson(self, indexes: np.ndarray) -> dict:
+        return {
+            "type": "FeatureCollection",
+            "features": [self._get_feature(index, self.probabilities[index]) for index in indexes]
+        }
+
+    def to_geojson(self,
+                   exclude_zero_probas: bool = False,
+                   top_k: int = None,
+                   min_probability: float = None) -> dict:
+        # only the unrestricted outputs are kept, the restrictions are cheap to render
+        if top_k is not None or min_probability is not None:
+            return self._to_geojson(self.select_indexes(exclude_zero_probas, top_k,
+                                                        min_probability))
+
+        if exclude_zero_probas not in self._geojson:
+            self._geojson[exclude_zero_probas] = self._to_geojson(
+                self.select_indexes(exclude_zero_probas)
+            )
+
+        return self._geojson[exclude_zero_probas]
+
+    def _render_geojson(self, indexes: np.ndarray) -> str:
+        return render_feature_collection([self._get_feature_template(index) for index in indexes],
+                                         self.probabilities[indexes])
+
+    def render_geojson(self,
+                       exclude_zero_probas: bool = False,
+                       top_k: int = None,
+                       min_probability: float = None) -> str:
+        """
+        Returns the JSON of `to_geojson`, spliced from the pre-rendered features of the classes.
+        """
+        if top_k is not None or min_probability is not None:
+            return self._render_geojson(self.select_indexes(exclude_zero_probas, top_k,
+                                                            min_probability))
+
+        if exclude_zero_probas not in self._rendered_geojson:
+            self._rendered_geojson[exclude_zero_probas] = self._render_geojson(
+                self.select_indexes(exclude_zero_probas)
+            )
+
+        return self._rendered_geojson[exclude_zero_probas]
+
+    @abstractmethod
+    def _get_compact_names(self, index: int) -> Any:
+        ...
+
+    def to_compact(self, top_k: int = None, min_probability: float = None) -> dict:
+        """Returns the names and the probabilities of the classes as parallel arrays."""
+        indexes = self.select_indexes(top_k=top_k, min_probability=min_probability)
+
+        return {
+            self.compact_names_key: [self._get_compact_names(index) for index in indexes],
+            "probabilities": self.probabilities[indexes].tolist()
+        }
+
+    def to_ids(self, top_k: int = None, min_probability: float = None) -> dict:
+        """
+        Returns the indexes of the classes, in the table identified by `table_id`, and their
+        probabilities as parallel arrays.
+        """
+        indexes = self.select_indexes(top_k=top_k, min_probability=min_probability)
+
+        return {
+            "table_id": self.model_classes.table_id,
+            "class_indexes": indexes.tolist(),
+            "probabilities": self.probabilities[indexes].tolist()
+        }
+
+    def _get_feature_template(self, index: int) -> tuple[str, str]:
+        return get_feature_template(
+            self.kind, self.destination.icao, self.model_classes.classes[index],
+            create_feature=lambda probability: self._get_feature(index, probability)
+        )
+
+
+class RunwayPredictionOutput(_ModelPredictionOutput):
+    kind = RUNWAY
+    compact_names_key = 'runway_names'
+
+    def __init__(self,
+                 probas: list[RunwayProbability] = None,
+                 destination: Airport = None,
+                 model_output: PredictionModelOutput = None):
+        if model_output is None:
+            model_output = PredictionModelOutput(
+                (proba.runway_name, proba.value) for proba in probas
+            )
+
+        super().__init__(model_output, destination)
+
+    @property
+    def probas(self) -> list[RunwayProbability]:
+        return [RunwayProbability(runway_name=runway_name, value=probability)
+                for runway_name, probability in zip(self.model_classes.classes,
+                                                    self.probabilities)]
 
     @property
     def sorted_probas(self):
         return sorted(self.probas, key=lambda x: x.value, reverse=True)
 
-    def _get_runway_geojson(self, runway: Runway, proba: RunwayProbability) -> dict:
+    def _get_compact_names(self, index: int) -> str:
+        return self.model_classes.classes[index]
+
+    def _get_feature(self, index: int, probability: Any) -> dict:
+        runway, = self._get_runways(index)
+
         return {
             "type": "Feature",
             "properties": {
                 "runway_name": runway.name,
-                "probability": proba.value,
+                "probability": probability,
                 "true_bearing": runway.true_bearing
             },
             "geometry": {
@@ -266,39 +543,42 @@ class RunwayPredictionOutput:
             }
         }
 
-    def to_geojson(self, exclude_zero_probas: bool = False) -> dict:
-        probas = self.sorted_probas
-
-        if exclude_zero_probas:
-            probas = [proba for proba in probas if proba.value > 0.01]
 
-        return {
-            "type": "FeatureCollection",
-            "features": [
-                self._get_runway_geojson(runway=self.destination.get_runway(proba.runway_name),
-                                         proba=proba)
+class RunwayConfigPredictionOutput(_ModelPredictionOutput):
+    kind = RUNWAY_CONFIG
+    compact_names_key = 'runway_configs'
 
-                for proba in probas
-            ]
-        }
+    def __init__(self,
+                 probas: list[RunwayConfigProbability] = None,
+                 destination: Airport = None,
+                 model_output: PredictionModelOutput = None):
+        if model_output is None:
+            model_output = PredictionModelOutput(
+                (proba.runway_config, proba.value) for proba in probas
+            )
 
+        super().__init__(model_output, destination)
 
-@dataclass
-class RunwayConfigPredictionOutput:
-    probas: list[RunwayConfigProbability]
-    destination: Airport
+    @property
+    def probas(self) -> list[RunwayConfigProbability]:
+        return [RunwayConfigProbability(runway_config=runway_config, value=probability)
+                for runway_config, probability in zip(self.model_classes.classes,
+                                                      self.probabilities)]
 
     @property
     def sorted_probas(self):
         return sorted(self.probas, key=lambda x: x.value, reverse=True)
 
-    def _get_runway_config_geojson(self, proba: RunwayConfigProbability) -> dict:
-        runways = [self.destination.get_runway(name) for name in proba.runway_names]
+    def _get_compact_names(self, index: int) -> list[str]:
+        return [runway.name for runway in self._get_runways(index)]
+
+    def _get_feature(self, index: int, probability: Any) -> dict:
+        runways = self._get_runways(index)
 
         return {
             "type": "Feature",
             "properties": {
-                "probability": proba.value,
+                "probability": probability,
                 "runways": [
                     {
                         "name": runway.name,
@@ -315,19 +595,6 @@ class RunwayConfigPredictionOutput:
             }
         }
 
-    def to_geojson(self, exclude_zero_probas: bool = False) -> dict:
-        probas = self.sorted_probas
-
-        if exclude_zero_probas:
-            probas = [proba for proba in probas if proba.value > 0.01]
-
-        return {
-            "type": "FeatureCollection",
-            "features": [
-                self._get_runway_config_geojson(proba)for proba in probas
-            ]
-        }
-
 
 def get_airports_angle(origin: Airport, destination: Airport) -> float:
     origin_lat = math.radians(origin.lat)
@@ -0,0 +1,353 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Iterator
+
+import predicted_runway.config as cfg
+from predicted_runway.adapters import met
+from predicted_runway.adapters.airports import get_airport_by_icao
+from predicted_runway.cache import CacheStats
+from predicted_runway.config import get_runway_model_path, get_runway_config_model_path
+from predicted_runway.domain import predictor as predictor_module
+from predicted_runway.domain.models import Airport, Timestamp, WindInputSource, \
+    RunwayPredictionInput, RunwayConfigPredictionInput, RunwayPredictionOutput, \
+    RunwayConfigPredictionOutput, PredictionInput, PredictionOutput, PredictionModelOutput
+
+_logger = logging.getLogger(__name__)
+
+_QUARTER_SECONDS = 15 * 60
+
+RUNWAY = 'runway'
+RUNWAY_CONFIG = 'runway_config'
+
+
+@dataclass(frozen=True)
+class PredictionCube:
+    """
+    The predictions of a destination for every quarter hour covered by a MET snapshot, keyed by
+    their normalised model input.
+    """
+    destination_icao: str
+    model_id: str
+    computed_at: int
+    met_refreshed_at: int
+    outputs: dict[tuple, PredictionOutput]
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def to_dict(self) -> dict:
+        return {
+            "size": len(self),
+            "computed_at": self.computed_at,
+            "met_refreshed_at": self.met_refreshed_at
+        }
+
+
+def _get_cube_key(features: list[str], values: list[Any]) -> tuple:
+    return tuple(
+        int(value // cfg.PREDICTION_PRECOMPUTE_ORIGIN_ANGLE_BIN) if feature == 'origin_angle'
+        else round(value, cfg.PREDICTION_CACHE_DECIMALS) if isinstance(value, float)
+        else value
+        for feature, value in zip(features, values)
+    )
+
+
+def _get_snapshot_winds(snapshot: met.METSnapshot) -> Iterator[tuple[int, met.WindData]]:
+    """
+    Yields the wind of every timestamp of the snapshot from which the model input of a request
+    may change, i.e. every quarter hour (the finest time feature) and every step of the wind
+    series.
+    """
+    series = snapshot.wind_series
+    start = snapshot.refreshed_at
+    end = series.start + series.step * len(series)
+
+    first_quarter = start - start % _QUARTER_SECONDS + _QUARTER_SECONDS
+    # the series starts with the bucket of the refresh, before the refresh itself
+    timestamps = {start, *range(first_quarter, end, _QUARTER_SECONDS),
+                  *(int(timestamp) for timestamp in series.timestamps if timestamp > start)}
+
+    for timestamp in sorted(timestamps):
+        wind_data = snapshot.get_wind_data(timestamp)
+
+        if wind_data is not None:
+            yield timestamp, wind_data
+
+
+def _get_runway_config_rows(destination: Airport,
+                            snapshot: met.METSnapshot,
+                            features: list[str]) -> dict[tuple, list[Any]]:
+    rows = {}
+
+    for timestamp, wind_data in _get_snapshot_winds(snapshot):
+        values = RunwayConfigPredictionInput(
+            destination=destination,
+            timestamp=Timestamp(timestamp),
+            wind_direction=wind_data.direction,
+            wind_speed=wind_data.speed,
+            wind_input_source=wind_data.source
+        ).get_model_input_values(features=features)
+
+        rows.setdefault(_get_cube_key(features, values), values)
+
+    return rows
+
+
+def _get_runway_rows(destination: Airport,
+                     snapshot: met.METSnapshot,
+                     features: list[str]) -> dict[tuple, list[Any]]:
+    bin_size = cfg.PREDICTION_PRECOMPUTE_ORIGIN_ANGLE_BIN
+    bin_centres = [(index + 0.5) * bin_size for index in range(math.ceil(360 / bin_size))]
+
+    rows = {}
+
+    for timestamp, wind_data in _get_snapshot_winds(snapshot):
+        # the origin only matters through its angle, which is set to the centre of each bin
+        values = RunwayPredictionInput(
+            origin=destination,
+            destination=destination,
+            timestamp=Timestamp(timestamp),
+            wind_direction=wind_data.direction,
+            wind_speed=wind_data.speed,
+            wind_input_source=wind_data.source
+        ).get_model_input_values(features=features)
+
+        for bin_centre in bin_centres:
+            binned_values = [bin_centre if feature == 'origin_angle' else value
+                             for feature, value in zip(features, values)]
+
+            rows.setdefault(_get_cube_key(features, binned_values), binned_values)
+
+    return rows
+
+
+@dataclass(frozen=True)
+class _CubeKind:
+    get_model_path: Callable[[str], Any]
+    get_rows: Callable[[Airport, met.METSnapshot, list[str]], dict[tuple, list[Any]]]
+    create_output: Callable[[PredictionModelOutput, Airport], PredictionOutput]
+
+
+_cube_kinds = {
+    RUNWAY: _CubeKind(get_model_path=get_runway_model_path,
+                      get_rows=_get_runway_rows,
+                      create_output=predictor_module.create_runway_prediction_output),
+    RUNWAY_CONFIG: _CubeKind(get_model_path=get_runway_config_model_path,
+                             get_rows=_get_runway_config_rows,
+                             create_output=predictor_module.create_runway_config_prediction_output)
+}
+
+_cubes: dict[tuple[str, str], PredictionCube] = {}
+_cube_stats: dict[str, CacheStats] = {kind: CacheStats() for kind in _cube_kinds}
+
+
+def _drop_model_cubes(_, model_id: str) -> None:
+    for key, cube in list(_cubes.items()):
+        if cube.model_id == model_id:
+            del _cubes[key]
+
+
+predictor_module.add_model_reload_listener(_drop_model_cubes)
+
+
+def refresh_prediction_cube(kind: str, snapshot: met.METSnapshot, now: int) -> PredictionCube:
+    """
+    Recomputes the cube of a destination from its latest MET snapshot with a single batched
+    inference. The existing cube is kept (only its MET refresh time is updated) as long as it
+    already holds every model input of the snapshot, i.e. until a new METAR or TAF comes in or the
+    model changes.
+    """
+    cube_kind = _cube_kinds[kind]
+    destination = get_airport_by_icao(snapshot.airport_icao)
+    predictor = predictor_module.get_predictor(cube_kind.get_model_path(snapshot.airport_icao))
+    features = predictor.features
+
+    rows = cube_kind.get_rows(destination, snapshot, features)
+
+    cube = _cubes.get((kind, snapshot.airport_icao))
+    if cube is not None and cube.model_id == predictor.model_id \
+            and rows.keys() <= cube.outputs.keys():
+        cube = replace(cube, met_refreshed_at=snapshot.refreshed_at)
+    else:
+        model_outputs = predictor.predict_values_batch(list(rows.values())) if rows else []
+
+        cube = PredictionCube(
+            destination_icao=snapshot.airport_icao,
+            model_id=predictor.model_id,
+            computed_at=now,
+            met_refreshed_at=snapshot.refreshed_at,
+            outputs={
+                key: cube_kind.create_output(model_output, destination)
+                for key, model_output in zip(rows, model_outputs)
+            }
+        )
+
+    _cubes[(kind, snapshot.airport_icao)] = cube
+
+    return cube
+
+
+def _get_prediction_output(kind: str, prediction_input: PredictionInput) \
+        -> tuple[PredictionOutput, PredictionCube] | None:
+
+    cube = _cubes.get((kind, prediction_input.destination.icao))
+
+    # only the wind of the MET snapshots is precomputed
+    if cube is None or prediction_input.wind_input_source not in (WindInputSource.METAR,
+                                                                  WindInputSource.TAF):
+        return None
+
+    predictor = predictor_module.get_predictor(
+        _cube_kinds[kind].get_model_path(prediction_input.destination.icao)
+    )
+    output = None
+
+    if predictor.model_id == cube.model_id:
+        values = prediction_input.get_model_input_values(features=predictor.features)
+        output = cube.outputs.get(_get_cube_key(predictor.features, values))
+
+    if output is None:
+        _cube_stats[kind].misses += 1
+        return None
+
+    _cube_stats[kind].hits += 1
+
+    return output, cube
+
+
+def get_runway_prediction_output(prediction_input: RunwayPredictionInput) \
+        -> tuple[RunwayPredictionOutput, PredictionCube] | None:
+
+    return _get_prediction_output(RUNWAY, prediction_input)
+
+
+def get_runway_config_prediction_output(prediction_input: RunwayConfigPredictionInput) \
+        -> tuple[RunwayConfigPredictionOutput, PredictionCube] | None:
+
+    return _get_prediction_output(RUNWAY_CONFIG, prediction_input)
+
+
+def get_prediction_cubes_stats() -> dict:
+    return {
+        kind: {
+            **_cube_stats[kind].to_dict(),
+            "cubes": {
+                icao: cube.to_dict() for (cube_kind, icao), cube in _cubes.items()
+                if cube_kind == kind
+            }
+        }
+        for kind in _cube_kinds
+    }
+
+
+def clear_prediction_cubes() -> None:
+    _cubes.clear()
+
+    for stats in _cube_stats.values():
+        stats.hits = stats.misses = 0
+
+
+class PredictionCubeScheduler(threading.Thread):
+    """
+    Refreshes the cubes of a destination whenever the prefetcher refreshes its MET snapshot. Only
+    the latest pending snapshot of each destination is processed.
+    """
+
+    def __init__(self):
+        super().__init__(name='prediction-cube-scheduler', daemon=True)
+        self._pending: dict[str, met.METSnapshot] = {}
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def schedule(self, snapshot: met.METSnapshot) -> None:
+        with self._condition:
+            self._pending[snapshot.airport_icao] = snapshot
+            self._condition.notify()
+
+    def refresh(self, snapshot: met.METSnapshot) -> None:
+        for kind in _cube_kinds:
+            try:
+                refresh_prediction_cube(kind, snapshot, now=int(time.time()))
+            except Exception as e:
+                _logger.exception(f"Failed to precompute the {kind} predictions of "
+                                  f"{snapshot.airport_icao}: {e}")
+
+    def run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopped)
+
+                if self._stopped:
+                    break
+
+                snapshots = list(self._pending.values())
+                self._pending.clear()
+
+            for snapshot in snapshots:
+                self.refresh(snapshot)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+
+_scheduler: PredictionCubeScheduler | None = None
+
+
+def start_scheduler() -> PredictionCubeScheduler:
+    global _scheduler
+
+    if _scheduler is None:
+        met.add_snapshot_listener(_schedule)
+
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = PredictionCubeScheduler()
+        _scheduler.start()
+
+    return _scheduler
+
+
+def _schedule(snapshot: met.METSnapshot) -> None:
+    if _scheduler is not None:
+        _scheduler.schedule(snapshot)
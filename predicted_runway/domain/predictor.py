@@ -35,55 +35,376 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 
 __author__ = "EUROCONTROL (SWIM)"
 
+import struct
+from collections import defaultdict
 from pathlib import Path
+from typing import Any, Callable, Hashable
 
+import numpy as np
 import pandas as pd
 from joblib import load
 from sklearn.ensemble import RandomForestClassifier
 
+import predicted_runway.config as cfg
+from predicted_runway.adapters.disk_cache import SQLiteCacheTier
+from predicted_runway.adapters.inference import InferenceClient
+from predicted_runway.cache import CacheStats, create_cache
 from predicted_runway.config import get_runway_model_path, get_runway_config_model_path
+from predicted_runway.domain.batching import InferenceDispatcher
+from predicted_runway.domain.compact import CompactForest, predict_proba_fast
 from predicted_runway.domain.models import RunwayPredictionInput, RunwayConfigPredictionInput, \
     RunwayPredictionOutput, RunwayConfigPredictionOutput, PredictionModelOutput, RunwayProbability, \
-    RunwayConfigProbability, PredictionInput
+    RunwayConfigProbability, PredictionInput, PredictionOutput, Airport, ModelClasses, RUNWAY, \
+    RUNWAY_CONFIG
+from predicted_runway.domain.inference_pool import InferencePool
+from predicted_runway.domain.registry import ModelRegistry, ModelWatcher, load_memory_mapped
+from predicted_runway.domain.validation import validate_model, get_model_location, \
+    InvalidModelError, compile_model_classes
+from predicted_runway.singleflight import SingleFlight
+
+FULL_QUALITY = 'full'
+FAST_QUALITY = 'fast'
 
 
 class Predictor:
 
-    def __init__(self, trained_model: RandomForestClassifier):
+    def __init__(self,
+                 trained_model: RandomForestClassifier,
+                 model_id: str = None,
+                 model_path: Path = None,
+                 model_classes: ModelClasses = None):
         self.trained_model = trained_model
+        self.model_id = model_id
+        self.model_path = model_path
+        self._model_classes = model_classes
 
     @classmethod
     def from_path(cls, path: Path):
         return cls(trained_model=load(path))
 
+    @property
+    def features(self) -> list[str]:
+        return list(self.trained_model.feature_names_in_)
+
+    @property
+    def model_classes(self) -> ModelClasses:
+        # compiled when the model is loaded by the registry
+        if self._model_classes is None:
+            self._model_classes = ModelClasses(classes=tuple(self.trained_model.classes_))
+
+        return self._model_classes
+
+    def predict_values(self, values: list[Any]) -> PredictionModelOutput:
+        if cfg.INFERENCE_BATCHING_ENABLED:
+            return _dispatcher.predict(self, values)
+
+        return self.predict_values_batch([values])[0]
+
+    def _predict_proba(self, rows: list[list[Any]]) -> Any:
+        # the pool needs the model file to load the model in its processes
+        if cfg.INFERENCE_EXECUTOR == 'process' and self.model_path is not None:
+            probas = _inference_pool.predict_proba(self.model_path, self.model_id, rows)
+            if probas is not None:
+                return probas
+
+        model_input = pd.DataFrame(rows, columns=self.features)
+
+        return self.trained_model.predict_proba(model_input)
+
+    def predict_values_fast(self, values: list[Any]) -> PredictionModelOutput:
+        """
+        Predicts in the calling thread from the fast subset of the trees. Models held by the
+        inference server have no trees in this process and make full predictions instead.
+        """
+        if not isinstance(self.trained_model, (RandomForestClassifier, CompactForest)):
+            return self.predict_values(values)
+
+        model_input = pd.DataFrame([values], columns=self.features)
+        probas = predict_proba_fast(self.trained_model, model_input,
+                                    default_size=cfg.PREDICTION_FAST_ESTIMATORS)[0]
+
+        return PredictionModelOutput(model_classes=self.model_classes, probabilities=probas)
+
+    def predict_values_batch(self, rows: list[list[Any]]) -> list[PredictionModelOutput]:
+        prediction_result = self._predict_proba(rows)
+
+        return [
+            PredictionModelOutput(model_classes=self.model_classes, probabilities=probas)
+            for probas in prediction_result
+        ]
+
     def predict(self, prediction_input: PredictionInput) -> PredictionModelOutput:
-        features = list(self.trained_model.feature_names_in_)
-        values = prediction_input.get_model_input_values(features=features)
+        values = prediction_input.get_model_input_values(features=self.features)
 
-        model_input = pd.DataFrame([values], columns=features)
+        return self.predict_values(values)
 
-        prediction_result = self.trained_model.predict_proba(model_input)
 
-        return PredictionModelOutput(zip(self.trained_model.classes_, prediction_result[0]))
+def _get_model_loader() -> Callable[[Path], Any]:
+    if cfg.INFERENCE_EXECUTOR == 'process':
+        return load_memory_mapped
 
+    # the models are held by the inference server, only their description is loaded here
+    if cfg.INFERENCE_EXECUTOR == 'server':
+        return InferenceClient(socket_path=Path(cfg.INFERENCE_SERVER_SOCKET),
+                               pool_size=cfg.INFERENCE_SERVER_POOL_SIZE,
+                               timeout=cfg.INFERENCE_SERVER_TIMEOUT).describe
 
-def predict_runway(prediction_input: RunwayPredictionInput) -> list[RunwayProbability]:
-    model_path = get_runway_model_path(airport_icao=prediction_input.destination.icao)
+    return load
 
-    predictor = Predictor.from_path(model_path)
 
-    model_output = predictor.predict(prediction_input=prediction_input)
+def _get_model_airport(path: Path) -> str:
+    try:
+        return get_model_location(path)[1]
+    except InvalidModelError:
+        return str(path)
+
+
+_registry = ModelRegistry(loader=_get_model_loader(),
+                          validator=validate_model,
+                          compiler=compile_model_classes,
+                          reload_on_get=not cfg.MODEL_WATCH_ENABLED,
+                          memory_budget=cfg.MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+                          pinned_groups=cfg.MODEL_PINNED_AIRPORTS,
+                          group_key=_get_model_airport,
+                          frequency_half_life=cfg.MODEL_FREQUENCY_HALF_LIFE)
+_inference_pool = InferencePool(max_workers=cfg.INFERENCE_PROCESSES)
+_dispatcher = InferenceDispatcher(max_batch_size=cfg.INFERENCE_BATCH_MAX_SIZE,
+                                  max_wait=cfg.INFERENCE_BATCH_MAX_WAIT_MS / 1000)
+
+
+def get_predictor(model_path: Path) -> Predictor:
+    loaded_model = _registry.get(model_path)
+
+    return Predictor(trained_model=loaded_model.trained_model,
+                     model_id=loaded_model.model_id,
+                     model_path=loaded_model.path,
+                     model_classes=loaded_model.model_classes)
+
+
+class _ProbabilitiesCodec:
+    """
+    Serialises the cached (model_id, probabilities) pairs as a plain versioned payload: the
+    format version, the model id and the probabilities as raw little endian float64s. The outputs
+    are rebuilt around the classes of the loaded model, so no code is persisted with them.
+    """
+    VERSION = 1
+    _HEADER = struct.Struct('<BH')
+
+    def dumps(self, value: tuple[str, np.ndarray]) -> bytes:
+        model_id, probabilities = value
+        model_id = model_id.encode()
+
+        return self._HEADER.pack(self.VERSION, len(model_id)) + model_id + \
+            np.asarray(probabilities, dtype='<f8').tobytes()
+
+    def loads(self, data: bytes) -> tuple[str, np.ndarray]:
+        version, model_id_size = self._HEADER.unpack_from(data)
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported prediction payload version: {version}")
+
+        offset = self._HEADER.size + model_id_size
+
+        return bytes(data[self._HEADER.size:offset]).decode(), \
+            np.frombuffer(data, dtype='<f8', offset=offset)
+
+
+_prediction_cache = create_cache(namespace='prediction',
+                                 maxsize=cfg.PREDICTION_CACHE_MAXSIZE,
+                                 codec=_ProbabilitiesCodec())
+_prediction_cache_stats: dict[str, CacheStats] = defaultdict(CacheStats)
+_prediction_flights = SingleFlight()
+
+
+def start_persistent_prediction_cache() -> SQLiteCacheTier:
+    """
+    Adds the on-disk tier to the prediction cache, which opens the database and starts its writer
+    thread, so that it is only done by the application rather than on import.
+    """
+    if _prediction_cache.persistent_tier is None:
+        _prediction_cache.persistent_tier = SQLiteCacheTier(
+            path=Path(cfg.PREDICTION_DISK_CACHE_DIR).joinpath('predictions.sqlite'),
+            max_bytes=cfg.PREDICTION_DISK_CACHE_MAX_MB * 1024 * 1024,
+            version=_ProbabilitiesCodec.VERSION
+        )
+
+    return _prediction_cache.persistent_tier
+
+
+def _invalidate_model_predictions(_: Path, model_id: str) -> None:
+    _prediction_cache.invalidate(lambda key: key.startswith(f"({model_id!r},"))
+    _prediction_cache.drop_scope(model_id)
+
+
+_registry.add_reload_listener(_invalidate_model_predictions)
+
+
+def add_model_reload_listener(listener: Callable[[Path, str], None]) -> None:
+    _registry.add_reload_listener(listener)
+
+
+def start_model_watcher() -> ModelWatcher:
+    watcher = ModelWatcher(registry=_registry,
+                           directories=[Path(cfg.ARRIVALS_RUNWAY_MODELS_DIR),
+                                        Path(cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR)],
+                           interval=cfg.MODEL_WATCH_INTERVAL)
+    watcher.start()
+
+    return watcher
+
+
+def get_model_registry_stats() -> dict:
+    return _registry.get_stats()
+
+
+def _quantise(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, cfg.PREDICTION_CACHE_DECIMALS)
+
+    return value
+
+
+def _get_prediction_cache_key(predictor: Predictor,
+                              values: list[Any],
+                              quality: str = FULL_QUALITY) -> Hashable:
+    key = predictor.model_id, tuple(values)
+
+    return key if quality == FULL_QUALITY else (*key, quality)
+
+
+def _compute_prediction_output(
+    predictor: Predictor,
+    values: list[Any],
+    create_output: Callable[[PredictionModelOutput], PredictionOutput],
+    quality: str = FULL_QUALITY
+) -> PredictionOutput:
+    if quality == FAST_QUALITY:
+        model_output = predictor.predict_values_fast(values)
+    else:
+        model_output = predictor.predict_values(values)
+
+    output = create_output(model_output)
+    # rendered once here so that the callers sharing the output of a coalesced flight get the
+    # GeoJSON for free. Cache hits only keep the probabilities and render their own output.
+    output.render_geojson()
+
+    return output
 
+
+def _get_prediction_output(
+    predictor: Predictor,
+    prediction_input: PredictionInput,
+    create_output: Callable[[PredictionModelOutput], PredictionOutput],
+    quality: str = FULL_QUALITY
+) -> PredictionOutput:
+    # the model predicts on the quantised values as well, so that all the requests sharing a cache
+    # entry get the same prediction whichever of them computed it
+    values = [_quantise(value)
+              for value in prediction_input.get_model_input_values(features=predictor.features)]
+    key = _get_prediction_cache_key(predictor, values, quality)
+
+    if not cfg.PREDICTION_CACHE_ENABLED:
+        return _prediction_flights.do(
+            key, lambda: _compute_prediction_output(predictor, values, create_output, quality)
+        )
+
+    stats = _prediction_cache_stats[prediction_input.destination.icao]
+
+    cached = _prediction_cache.get(key)
+    if cached is not None:
+        model_id, probabilities = cached
+
+        if model_id == predictor.model_id and \
+                len(probabilities) == len(predictor.model_classes.classes):
+            stats.hits += 1
+            return create_output(PredictionModelOutput(model_classes=predictor.model_classes,
+                                                       probabilities=probabilities))
+
+    stats.misses += 1
+
+    def compute_and_cache() -> PredictionOutput:
+        result = _compute_prediction_output(predictor, values, create_output, quality)
+        _prediction_cache.set(key, (predictor.model_id, result.probabilities),
+                              ttl=cfg.PREDICTION_CACHE_TTL, scope=predictor.model_id)
+
+        return result
+
+    return _prediction_flights.do(key, compute_and_cache)
+
+
+def get_prediction_cache_stats() -> dict:
+    return {
+        **_prediction_cache.stats.to_dict(),
+        "persistent_hits": _prediction_cache.persistent_hits,
+        "airports": {icao: stats.to_dict() for icao, stats in _prediction_cache_stats.items()}
+    }
+
+
+def get_prediction_flights_stats() -> dict:
+    return {
+        **_prediction_flights.stats.to_dict(),
+        "in_flight": _prediction_flights.in_flight()
+    }
+
+
+def get_inference_batching_stats() -> dict:
+    return _dispatcher.stats.to_dict()
+
+
+def clear_prediction_cache() -> None:
+    _prediction_cache.clear()
+    _prediction_cache_stats.clear()
+
+
+def _get_runway_probas(model_output: PredictionModelOutput) -> list[RunwayProbability]:
     return [
         RunwayProbability(runway_name=runway_name, value=proba)
         for runway_name, proba in model_output.items()
     ]
 
 
-def get_runway_prediction_output(prediction_input: RunwayPredictionInput) -> RunwayPredictionOutput:
-    probas = predict_runway(prediction_input)
+def _get_runway_config_probas(model_output: PredictionModelOutput) \
+        -> list[RunwayConfigProbability]:
+
+    return [
+        RunwayConfigProbability(runway_config=runway_config, value=proba)
+        for runway_config, proba in model_output.items()
+    ]
+
+
+def create_runway_prediction_output(model_output: PredictionModelOutput,
+                                    destination: Airport) -> RunwayPredictionOutput:
+    return RunwayPredictionOutput(model_output=model_output, destination=destination)
+
 
-    return RunwayPredictionOutput(probas=probas, destination=prediction_input.destination)
+def create_runway_config_prediction_output(model_output: PredictionModelOutput,
+                                           destination: Airport) -> RunwayConfigPredictionOutput:
+    return RunwayConfigPredictionOutput(model_output=model_output, destination=destination)
+
+
+def predict_runway(prediction_input: RunwayPredictionInput) -> list[RunwayProbability]:
+    model_path = get_runway_model_path(airport_icao=prediction_input.destination.icao)
+
+    predictor = get_predictor(model_path)
+
+    model_output = predictor.predict(prediction_input=prediction_input)
+
+    return _get_runway_probas(model_output)
+
+
+def get_runway_prediction_output(prediction_input: RunwayPredictionInput,
+                                 quality: str = FULL_QUALITY) -> RunwayPredictionOutput:
+    model_path = get_runway_model_path(airport_icao=prediction_input.destination.icao)
+
+    predictor = get_predictor(model_path)
+
+    return _get_prediction_output(
+        predictor=predictor,
+        prediction_input=prediction_input,
+        create_output=lambda model_output: create_runway_prediction_output(
+            model_output, destination=prediction_input.destination
+        ),
+        quality=quality
+    )
 
 
 def predict_runway_config(prediction_input: RunwayConfigPredictionInput) \
@@ -91,19 +412,45 @@ def predict_runway_config(prediction_input: RunwayConfigPredictionInput) \
 
     model_path = get_runway_config_model_path(airport_icao=prediction_input.destination.icao)
 
-    predictor = Predictor.from_path(model_path)
+    predictor = get_predictor(model_path)
 
     model_output = predictor.predict(prediction_input=prediction_input)
 
-    return [
-        RunwayConfigProbability(runway_config=runway_config, value=proba)
-        for runway_config, proba in model_output.items()
-    ]
+    return _get_runway_config_probas(model_output)
 
 
-def get_runway_config_prediction_output(prediction_input: RunwayConfigPredictionInput) \
+def get_runway_config_prediction_output(prediction_input: RunwayConfigPredictionInput,
+                                        quality: str = FULL_QUALITY) \
         -> RunwayConfigPredictionOutput:
 
-    probas = predict_runway_config(prediction_input)
+    model_path = get_runway_config_model_path(airport_icao=prediction_input.destination.icao)
+
+    predictor = get_predictor(model_path)
+
+    return _get_prediction_output(
+        predictor=predictor,
+        prediction_input=prediction_input,
+        create_output=lambda model_output: create_runway_config_prediction_output(
+            model_output, destination=prediction_input.destination
+        ),
+        quality=quality
+    )
+
+
+def _get_model_classes(model_path: Path, kind: str, destination: Airport) -> ModelClasses:
+    model_classes = get_predictor(model_path).model_classes
+
+    if not model_classes.is_compiled_for(kind, destination):
+        model_classes = ModelClasses.compile(model_classes.classes, kind, destination)
+
+    return model_classes
+
+
+def get_runway_model_classes(destination: Airport) -> ModelClasses:
+    return _get_model_classes(get_runway_model_path(airport_icao=destination.icao),
+                              kind=RUNWAY, destination=destination)
+
 
-    return RunwayConfigPredictionOutput(probas=probas, destination=prediction_input.destination)
+def get_runway_config_model_classes(destination: Airport) -> ModelClasses:
+    return _get_model_classes(get_runway_config_model_path(airport_icao=destination.icao),
+                              kind=RUNWAY_CONFIG, destination=destination)
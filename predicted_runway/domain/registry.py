@@ -0,0 +1,492 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Any
+
+from joblib import load
+
+from predicted_runway.domain.compact import CompactForest
+from predicted_runway.singleflight import SingleFlight
+
+_logger = logging.getLogger(__name__)
+
+
+def load_memory_mapped(path: Path) -> Any:
+    """
+    Loads a model with its arrays memory mapped from the file (read only). Only the arrays of a
+    CompactForest stay mapped, so that the processes loading the same file share its pages: the
+    trees of a RandomForestClassifier copy their arrays when unpickled, and compressed files cannot
+    be mapped, so every process loading these holds a copy of them.
+    """
+    trained_model = load(path, mmap_mode='r')
+
+    if not isinstance(trained_model, CompactForest):
+        _logger.warning(f"The model {path} is not a compact forest, it is copied in every process "
+                        f"loading it")
+
+    return trained_model
+
+
+def get_model_file_hash(path: Path) -> str:
+    sha256 = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()[:16]
+
+
+def get_model_file_version(path: Path) -> tuple[int, int, int]:
+    # symlinks are followed, the inode tells when a version pointer is moved to another file
+    stat = os.stat(path)
+
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def get_model_footprint(path: Path, trained_model: Any) -> int:
+    """
+    Returns the bytes held by the node and value arrays of the trees of a forest, or the size of
+    the model file for any other model.
+    """
+    if isinstance(trained_model, CompactForest):
+        return trained_model.nbytes
+
+    estimators = getattr(trained_model, 'estimators_', None)
+    if not isinstance(estimators, list):
+        return os.path.getsize(path)
+
+    footprint = 0
+    for estimator in estimators:
+        state = estimator.tree_.__getstate__()
+        footprint += state['nodes'].nbytes + state['values'].nbytes
+
+    return footprint
+
+
+class LoadedModel:
+
+    def __init__(self,
+                 path: Path,
+                 trained_model: Any,
+                 model_id: str,
+                 version: tuple[int, int, int],
+                 footprint: int = 0,
+                 load_seconds: float = 0.,
+                 model_classes: Any = None):
+        self.path = path
+        self.trained_model = trained_model
+        self.model_id = model_id
+        self.version = version
+        self.model_classes = model_classes
+        self.footprint = footprint
+        self.load_seconds = load_seconds
+        self._frequency = 0.
+        self._accessed_at = time.monotonic()
+
+    def get_frequency(self, now: float, half_life: float) -> float:
+        """Exponentially decayed number of requests of the model."""
+        return self._frequency * 0.5 ** ((now - self._accessed_at) / half_life)
+
+    def record_access(self, now: float, half_life: float) -> None:
+        # not locked, a lost update only skews the frequency slightly
+        self._frequency = self.get_frequency(now, half_life) + 1
+        self._accessed_at = now
+
+
+class ModelRegistry:
+    """
+    Keeps the trained models in memory once loaded.
+
+    With `reload_on_get`, a model is loaded again by `get` when its file changes (modification
+    time or size). Otherwise models are only replaced by `reload`, e.g. from a `ModelWatcher`, so
+    that requests never wait for a model to load once it is in memory. Models are loaded outside
+    of the lock, once for all the concurrent callers of a path, and validated by `validator` (which
+    raises on invalid models) on every load: an invalid model raises on its first load, while an
+    invalid replacement is dropped and the current model kept. Replacements are swapped in
+    atomically. The reload listeners are then called with the path and the id of the replaced
+    model.
+
+    With a `memory_budget` (bytes), models are evicted once their total footprint exceeds it, the
+    ones that are the cheapest to keep out first: the lowest request frequency times load time
+    (the cost of a miss) per byte. The models of the `pinned_groups` groups with the most requests
+    (by `group_key`, e.g. the airports) are never evicted. An evicted model is loaded again on its
+    next `get`.
+
+    The `compiler`, if any, is called with the path and the model once loaded, e.g. to resolve the
+    classes of the model, and its result kept as `model_classes` of the loaded model.
+    """
+
+    def __init__(self,
+                 loader: Callable[[Path], Any] = load,
+                 validator: Callable[[Path, Any], None] = None,
+                 compiler: Callable[[Path, Any], Any] = None,
+                 reload_on_get: bool = True,
+                 memory_budget: int = 0,
+                 pinned_groups: int = 0,
+                 group_key: Callable[[Path], str] = str,
+                 frequency_half_life: float = 3600.):
+        self._loader = loader
+        self._validator = validator
+        self._compiler = compiler
+        self.reload_on_get = reload_on_get
+        self.memory_budget = memory_budget
+        self.pinned_groups = pinned_groups
+        self._group_key = group_key
+        self.frequency_half_life = frequency_half_life
+        self._models: dict[Path, LoadedModel] = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._reload_listeners: list[Callable[[Path, str], None]] = []
+        self.reloads = 0
+        self.reload_failures = 0
+        self.evictions = 0
+
+    def add_reload_listener(self, listener: Callable[[Path, str], None]) -> None:
+        self._reload_listeners.append(listener)
+
+    def _load(self, path: Path, version: tuple[int, int, int]) -> LoadedModel:
+        started_at = time.perf_counter()
+        trained_model = self._loader(path)
+        load_seconds = time.perf_counter() - started_at
+
+        if self._validator is not None:
+            self._validator(path, trained_model)
+
+        return LoadedModel(path=path,
+                           trained_model=trained_model,
+                           model_id=get_model_file_hash(path),
+                           version=version,
+                           footprint=get_model_footprint(path, trained_model),
+                           load_seconds=load_seconds,
+                           model_classes=self._compiler(path, trained_model)
+                           if self._compiler is not None else None)
+
+    def _get_pinned_groups(self, now: float) -> set[str]:
+        frequencies = defaultdict(float)
+        for loaded_model in list(self._models.values()):
+            frequencies[self._group_key(loaded_model.path)] += loaded_model.get_frequency(
+                now, self.frequency_half_life)
+
+        busiest = sorted(frequencies, key=frequencies.get, reverse=True)
+
+        return set(busiest[:self.pinned_groups])
+
+    def _get_priority(self, loaded_model: LoadedModel, now: float) -> float:
+        frequency = loaded_model.get_frequency(now, self.frequency_half_life)
+
+        return frequency * loaded_model.load_seconds / max(loaded_model.footprint, 1)
+
+    def _evict(self, kept_path: Path) -> None:
+        """Evicts models until the budget is met, except the pinned ones and `kept_path`."""
+        with self._lock:
+            footprint = sum(loaded_model.footprint for loaded_model in self._models.values())
+            if footprint <= self.memory_budget:
+                return
+
+            now = time.monotonic()
+            pinned_groups = self._get_pinned_groups(now)
+            candidates = sorted(
+                (loaded_model for loaded_model in self._models.values()
+                 if loaded_model.path != kept_path
+                 and self._group_key(loaded_model.path) not in pinned_groups),
+                key=lambda loaded_model: self._get_priority(loaded_model, now)
+            )
+
+            for loaded_model in candidates:
+                if footprint <= self.memory_budget:
+                    break
+
+                del self._models[loaded_model.path]
+                footprint -= loaded_model.footprint
+                self.evictions += 1
+                _logger.info(f"Evicted the model {loaded_model.path} ({loaded_model.footprint} "
+                             f"bytes)")
+
+    def _swap(self, path: Path, loaded_model: LoadedModel) -> None:
+        with self._lock:
+            replaced_model = self._models.get(path)
+            self._models[path] = loaded_model
+
+        if replaced_model is not None and replaced_model.model_id != loaded_model.model_id:
+            for listener in self._reload_listeners:
+                try:
+                    listener(path, replaced_model.model_id)
+                except Exception as e:
+                    _logger.exception(f"Reload listener failed for the model {path}: {e}")
+
+    def get(self, path: Path) -> LoadedModel:
+        path = Path(path)
+
+        loaded_model = self._get(path)
+        loaded_model.record_access(time.monotonic(), self.frequency_half_life)
+
+        return loaded_model
+
+    def _get(self, path: Path) -> LoadedModel:
+        loaded_model = self._models.get(path)
+        if loaded_model is not None and not self.reload_on_get:
+            return loaded_model
+
+        version = get_model_file_version(path)
+        if loaded_model is not None and loaded_model.version == version:
+            return loaded_model
+
+        return self._loads.do((path, version), lambda: self._load_missing(path, version))
+
+    def _load_missing(self, path: Path, version: tuple[int, int, int]) -> LoadedModel:
+        current_model = self._models.get(path)
+        if current_model is not None and (current_model.version == version
+                                          or not self.reload_on_get):
+            return current_model
+
+        if current_model is not None:
+            return self.reload(path) or current_model
+
+        loaded_model = self._load(path, version)
+
+        with self._lock:
+            loaded_model = self._models.setdefault(path, loaded_model)
+
+        if self.memory_budget:
+            self._evict(kept_path=path)
+
+        return loaded_model
+
+    def reload(self, path: Path) -> LoadedModel | None:
+        """
+        Loads the model file again if it changed and swaps it in once validated. The current model
+        is kept, and None returned, when the new one cannot be loaded or is invalid.
+        """
+        path = Path(path)
+
+        try:
+            version = get_model_file_version(path)
+
+            current_model = self._models.get(path)
+            if current_model is not None and current_model.version == version:
+                return current_model
+
+            loaded_model = self._load(path, version)
+        except Exception as e:
+            self.reload_failures += 1
+            _logger.exception(f"Failed to reload the model {path}: {e}")
+            return None
+
+        self._swap(path, loaded_model)
+        self.reloads += 1
+        _logger.info(f"Reloaded the model {path} ({loaded_model.model_id})")
+
+        return loaded_model
+
+    def get_loaded_models(self) -> list[LoadedModel]:
+        return list(self._models.values())
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        loaded_models = self.get_loaded_models()
+        pinned_groups = self._get_pinned_groups(now)
+
+        return {
+            "models": {
+                str(model.path): {
+                    "model_id": model.model_id,
+                    "footprint_bytes": model.footprint,
+                    "load_seconds": round(model.load_seconds, 3),
+                    "frequency": round(model.get_frequency(now, self.frequency_half_life), 3),
+                    "pinned": self._group_key(model.path) in pinned_groups
+                }
+                for model in loaded_models
+            },
+            "footprint_bytes": sum(model.footprint for model in loaded_models),
+            "memory_budget_bytes": self.memory_budget,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "evictions": self.evictions
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+class _Inotify:
+    """
+    Minimal binding of the Linux inotify API, reporting the files written or moved into the
+    watched directories.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self._directories: dict[int, Path] = {}
+
+    def add_watch(self, directory: Path) -> None:
+        watch = self._libc.inotify_add_watch(self._fd, os.fsencode(directory),
+                                             self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if watch < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+
+        self._directories[watch] = directory
+
+    def read(self, timeout: float) -> list[Path]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+
+        data = os.read(self._fd, 64 * 1024)
+        paths = []
+        offset = 0
+
+        while offset < len(data):
+            watch, _, _, name_size = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + name_size].rstrip(b'\0')
+            offset += name_size
+
+            if watch in self._directories and name:
+                paths.append(self._directories[watch].joinpath(os.fsdecode(name)))
+
+        return paths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class ModelWatcher(threading.Thread):
+    """
+    Reloads the models of a registry when their files change in the watched directories. File
+    writes are caught by inotify where available; every `interval` seconds the loaded models are
+    also polled for changes of modification time or size, which is the only mechanism elsewhere.
+    A polled change is only reloaded once the file stayed the same for a whole interval, so that
+    half copied files are not picked up.
+    """
+
+    def __init__(self, registry: ModelRegistry, directories: list[Path], interval: float):
+        super().__init__(name='model-watcher', daemon=True)
+        self.registry = registry
+        self.directories = [Path(directory).absolute() for directory in directories]
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._pending_versions: dict[Path, tuple[int, int, int]] = {}
+        self._inotify = self._create_inotify()
+
+    def _create_inotify(self) -> _Inotify | None:
+        try:
+            inotify = _Inotify()
+        except (OSError, AttributeError, TypeError):
+            _logger.info('inotify is not available, model files will be polled.')
+            return None
+
+        for directory in self.directories:
+            try:
+                inotify.add_watch(directory)
+            except OSError as e:
+                _logger.warning(f"Model directory {directory} cannot be watched: {e}")
+                continue
+
+            # the directories of the versioned models
+            for subdirectory in directory.iterdir():
+                if subdirectory.is_dir():
+                    inotify.add_watch(subdirectory)
+
+        return inotify
+
+    def _is_loaded(self, path: Path) -> bool:
+        return any(model.path == path for model in self.registry.get_loaded_models())
+
+    def poll(self) -> None:
+        for loaded_model in self.registry.get_loaded_models():
+            try:
+                version = get_model_file_version(loaded_model.path)
+            except OSError:
+                continue
+
+            if version == loaded_model.version:
+                self._pending_versions.pop(loaded_model.path, None)
+            elif self._pending_versions.get(loaded_model.path) == version:
+                del self._pending_versions[loaded_model.path]
+                self.registry.reload(loaded_model.path)
+            else:
+                self._pending_versions[loaded_model.path] = version
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            # a failure of a cycle must not stop the hot reload for the life of the process
+            try:
+                self._watch()
+            except Exception as e:
+                _logger.exception(f"Failed to watch the model files: {e}")
+                self._stop_event.wait(self.interval)
+
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def _watch(self) -> None:
+        if self._inotify is None:
+            self._stop_event.wait(self.interval)
+        else:
+            for path in self._inotify.read(timeout=self.interval):
+                # complete files only: closed after writing or moved into the directory
+                if self._is_loaded(path):
+                    self._pending_versions.pop(path, None)
+                    self.registry.reload(path)
+
+        self.poll()
+
+    def stop(self) -> None:
+        self._stop_event.set()
@@ -0,0 +1,191 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import predicted_runway.config as cfg
+from predicted_runway.config import get_model_path, get_candidate_model_path
+from predicted_runway.domain import predictor as predictor_module
+from predicted_runway.domain.models import PredictionInput, PredictionModelOutput
+
+_logger = logging.getLogger(__name__)
+
+RUNWAY = 'runway'
+RUNWAY_CONFIG = 'runway_config'
+
+_models_dirs = {
+    RUNWAY: lambda: cfg.ARRIVALS_RUNWAY_MODELS_DIR,
+    RUNWAY_CONFIG: lambda: cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR
+}
+
+
+@dataclass
+class DivergenceStats:
+    """
+    How the predictions of a candidate model compare to the ones of the current model: how often
+    both rank the same class first, and the total variation distance between their probabilities
+    (half the sum of their absolute differences, 0 when identical and 1 when disjoint).
+    """
+    current_model_id: str = None
+    candidate_model_id: str = None
+    samples: int = 0
+    top_class_agreements: int = 0
+    total_distance: float = 0.
+    max_distance: float = 0.
+
+    def record(self, current: PredictionModelOutput, candidate: PredictionModelOutput) -> None:
+        classes = set(current) | set(candidate)
+        distance = sum(abs(current.get(c, 0.) - candidate.get(c, 0.)) for c in classes) / 2
+
+        self.samples += 1
+        self.top_class_agreements += max(current, key=current.get) == \
+            max(candidate, key=candidate.get)
+        self.total_distance += distance
+        self.max_distance = max(self.max_distance, distance)
+
+    def to_dict(self) -> dict:
+        return {
+            "current_model_id": self.current_model_id,
+            "candidate_model_id": self.candidate_model_id,
+            "samples": self.samples,
+            "top_class_agreement": self.top_class_agreements / self.samples if self.samples else 0.,
+            "mean_distance": self.total_distance / self.samples if self.samples else 0.,
+            "max_distance": self.max_distance
+        }
+
+
+class ShadowEvaluator:
+    """
+    Runs the candidate model of an airport on a sampled fraction of the predictions, in a
+    background thread, and compares its outputs to the ones served from the current model.
+    Submitting never blocks: samples are dropped when `max_pending` of them are already waiting.
+    """
+
+    def __init__(self, sample_rate: float, max_pending: int):
+        self.sample_rate = sample_rate
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self.divergences: dict[tuple[str, str], DivergenceStats] = {}
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self,
+               kind: str,
+               prediction_input: PredictionInput,
+               current: PredictionModelOutput) -> None:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+
+        models_dir = _models_dirs[kind]()
+        airport_icao = prediction_input.destination.icao
+
+        candidate_path = get_candidate_model_path(models_dir, airport_icao)
+        if candidate_path is None:
+            return
+
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return
+
+        self._executor.submit(self._evaluate, kind, prediction_input, current,
+                              get_model_path(models_dir, airport_icao), candidate_path)
+
+    def _evaluate(self,
+                  kind: str,
+                  prediction_input: PredictionInput,
+                  current: PredictionModelOutput,
+                  current_path: Path,
+                  candidate_path: Path) -> None:
+        try:
+            current_model_id = predictor_module.get_predictor(current_path).model_id
+            candidate_predictor = predictor_module.get_predictor(candidate_path)
+
+            # the candidate is fed with its own features, it may use new ones. It predicts
+            # outside of the dispatcher so that it does not hold up the batches of the requests
+            values = prediction_input.get_model_input_values(features=candidate_predictor.features)
+            candidate = candidate_predictor.predict_values_batch([values])[0]
+
+            with self._lock:
+                key = (kind, prediction_input.destination.icao)
+                stats = self.divergences.get(key)
+
+                if stats is None or (stats.current_model_id, stats.candidate_model_id) != \
+                        (current_model_id, candidate_predictor.model_id):
+                    stats = self.divergences[key] = DivergenceStats(
+                        current_model_id=current_model_id,
+                        candidate_model_id=candidate_predictor.model_id
+                    )
+
+                stats.record(current, candidate)
+        except Exception as e:
+            self.errors += 1
+            _logger.exception(f"Shadow evaluation failed: {e}")
+        finally:
+            self._slots.release()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "dropped": self.dropped,
+                "errors": self.errors,
+                **{
+                    kind: {
+                        airport_icao: stats.to_dict()
+                        for (stats_kind, airport_icao), stats in self.divergences.items()
+                        if stats_kind == kind
+                    }
+                    for kind in _models_dirs
+                }
+            }
+
+
+_evaluator = ShadowEvaluator(sample_rate=cfg.SHADOW_SAMPLE_RATE,
+                             max_pending=cfg.SHADOW_MAX_PENDING)
+
+
+def submit(kind: str, prediction_input: PredictionInput, current: PredictionModelOutput) -> None:
+    _evaluator.submit(kind, prediction_input, current)
+
+
+def get_shadow_stats() -> dict:
+    return _evaluator.get_stats()
@@ -0,0 +1,122 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import os
+from pathlib import Path
+from typing import Any
+
+import predicted_runway.config as cfg
+from predicted_runway.adapters.airports import get_airport_by_icao
+from predicted_runway.domain.models import RunwayPredictionInput, RunwayConfigPredictionInput, \
+    Timestamp, ModelClasses, UnknownRunwayError, Airport, RUNWAY, RUNWAY_CONFIG
+
+
+class InvalidModelError(Exception):
+    pass
+
+
+def get_model_location(path: Path) -> tuple[str, str]:
+    """
+    Returns the models directory and the airport of a model file, stored as
+    {models_dir}/{airport_icao}.pkl or versioned as {models_dir}/{airport_icao}/{version}.pkl.
+    """
+    path = Path(os.path.abspath(path))
+
+    for models_dir in (cfg.ARRIVALS_RUNWAY_MODELS_DIR, cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR):
+        models_dir_path = Path(models_dir).absolute()
+
+        if path.parent == models_dir_path:
+            return models_dir, path.stem
+
+        if path.parent.parent == models_dir_path:
+            return models_dir, path.parent.name
+
+    raise InvalidModelError(f"{path} is not in a models directory")
+
+
+def _get_model_destination(path: Path) -> tuple[str, Airport]:
+    models_dir, airport_icao = get_model_location(path)
+
+    destination = get_airport_by_icao(airport_icao)
+    if destination is None:
+        raise InvalidModelError(f"{airport_icao} is not a known airport")
+
+    kind = RUNWAY_CONFIG if models_dir == cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR else RUNWAY
+
+    return kind, destination
+
+
+def compile_model_classes(path: Path, trained_model: Any) -> ModelClasses:
+    """
+    Resolves the classes of a model to the runways of its destination, failing when a class refers
+    to an unknown runway.
+    """
+    kind, destination = _get_model_destination(path)
+
+    try:
+        return ModelClasses.compile(trained_model.classes_, kind, destination)
+    except UnknownRunwayError as e:
+        raise InvalidModelError(str(e))
+
+
+def validate_model(path: Path, trained_model: Any) -> None:
+    """
+    Checks that a model can be fed with the features of its prediction input and that its classes
+    only refer to runways of its destination.
+    """
+    kind, destination = _get_model_destination(path)
+
+    features = list(trained_model.feature_names_in_)
+
+    if kind == RUNWAY_CONFIG:
+        prediction_input = RunwayConfigPredictionInput(destination=destination,
+                                                       timestamp=Timestamp(0),
+                                                       wind_direction=0.,
+                                                       wind_speed=0.)
+    else:
+        prediction_input = RunwayPredictionInput(origin=destination,
+                                                 destination=destination,
+                                                 timestamp=Timestamp(0),
+                                                 wind_direction=0.,
+                                                 wind_speed=0.)
+
+    try:
+        prediction_input.get_model_input_values(features=features)
+    except KeyError as e:
+        raise InvalidModelError(f"Unsupported feature {e}")
+
+    compile_model_classes(path, trained_model)
@@ -0,0 +1,265 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import argparse
+import logging.config
+import os
+import socket
+import socketserver
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from predicted_runway import config as cfg
+from predicted_runway.domain.registry import ModelRegistry, ModelWatcher, LoadedModel
+from predicted_runway.domain.validation import validate_model
+
+# Inference daemon holding the trained models of a node once for all the API workers, which talk to
+# it over a Unix domain socket (see `predicted_runway.adapters.inference.InferenceClient`).
+#
+# Every message is a frame: its length as a little endian uint32 followed by its body. Strings are
+# utf-8 encoded and prefixed by their length as a uint16, matrices are row major float64 arrays
+# prefixed by their number of rows and columns as two uint32.
+#
+# Requests start with an operation and the path of the model file:
+# - DESCRIBE: no payload, answered with the model id, its feature names and its class labels
+# - PREDICT: the feature matrix, answered with the model id and the probability matrix, whose
+#   columns follow the class labels of the model
+#
+# Responses start with a status; the body of an ERROR is the error message.
+
+_logger = logging.getLogger(__name__)
+
+DESCRIBE = 1
+PREDICT = 2
+
+OK = 0
+ERROR = 1
+
+_FRAME_HEADER = struct.Struct('<I')
+_UINT8 = struct.Struct('<B')
+_UINT16 = struct.Struct('<H')
+_MATRIX_HEADER = struct.Struct('<II')
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes | None:
+    buffer = bytearray()
+
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+
+    return bytes(buffer)
+
+
+def read_frame(sock: socket.socket) -> bytes | None:
+    """
+    Returns the body of the next frame, or None once the peer closed the connection.
+    """
+    header = _recv_exactly(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+
+    (size,) = _FRAME_HEADER.unpack(header)
+
+    body = _recv_exactly(sock, size)
+    if body is None:
+        raise ConnectionError('Connection closed in the middle of a frame')
+
+    return body
+
+
+def write_frame(sock: socket.socket, body: bytes) -> None:
+    sock.sendall(_FRAME_HEADER.pack(len(body)) + body)
+
+
+def pack_uint8(value: int) -> bytes:
+    return _UINT8.pack(value)
+
+
+def pack_str(value: str) -> bytes:
+    encoded = value.encode('utf-8')
+
+    return _UINT16.pack(len(encoded)) + encoded
+
+
+def pack_str_list(values: list[str]) -> bytes:
+    return _UINT16.pack(len(values)) + b''.join(pack_str(value) for value in values)
+
+
+def pack_matrix(matrix: np.ndarray) -> bytes:
+    matrix = np.ascontiguousarray(matrix, dtype='<f8')
+
+    return _MATRIX_HEADER.pack(*matrix.shape) + matrix.tobytes()
+
+
+class FrameReader:
+
+    def __init__(self, body: bytes):
+        self._body = body
+        self._offset = 0
+
+    def _read(self, size: int) -> bytes:
+        if self._offset + size > len(self._body):
+            raise ValueError('Truncated frame')
+
+        data = self._body[self._offset:self._offset + size]
+        self._offset += size
+
+        return data
+
+    def read_uint8(self) -> int:
+        return _UINT8.unpack(self._read(_UINT8.size))[0]
+
+    def read_str(self) -> str:
+        (size,) = _UINT16.unpack(self._read(_UINT16.size))
+
+        return self._read(size).decode('utf-8')
+
+    def read_str_list(self) -> list[str]:
+        (size,) = _UINT16.unpack(self._read(_UINT16.size))
+
+        return [self.read_str() for _ in range(size)]
+
+    def read_matrix(self) -> np.ndarray:
+        rows, columns = _MATRIX_HEADER.unpack(self._read(_MATRIX_HEADER.size))
+
+        return np.frombuffer(self._read(rows * columns * 8), dtype='<f8').reshape(rows, columns)
+
+    def read_rest(self) -> bytes:
+        return self._read(len(self._body) - self._offset)
+
+
+class _InferenceRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        # connections are kept open by the clients and serve any number of requests
+        while (body := read_frame(self.request)) is not None:
+            try:
+                response = pack_uint8(OK) + self.server.respond(FrameReader(body))
+            except Exception as e:
+                _logger.exception(f"Failed to serve inference request: {e}")
+                response = pack_uint8(ERROR) + str(e).encode('utf-8')
+
+            write_frame(self.request, response)
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves the DESCRIBE and PREDICT requests of the models found under `model_dirs`.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, model_dirs: list[Path], registry: ModelRegistry = None):
+        self.socket_path = Path(socket_path)
+        self.model_dirs = [Path(model_dir).absolute() for model_dir in model_dirs]
+        self.registry = registry or ModelRegistry()
+
+        # left behind by a previous run
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+        super().__init__(str(self.socket_path), _InferenceRequestHandler)
+
+    def _get_model(self, path: str) -> LoadedModel:
+        # symlinks (versioned model pointers) are not followed so that the registry notices
+        # when they are moved
+        model_path = Path(os.path.abspath(path))
+
+        if not any(model_path.is_relative_to(model_dir) for model_dir in self.model_dirs):
+            raise ValueError(f"{path} is not a model of this server")
+
+        return self.registry.get(model_path)
+
+    def respond(self, reader: FrameReader) -> bytes:
+        operation = reader.read_uint8()
+        loaded_model = self._get_model(reader.read_str())
+        trained_model = loaded_model.trained_model
+
+        if operation == DESCRIBE:
+            return pack_str(loaded_model.model_id) \
+                + pack_str_list([str(feature) for feature in trained_model.feature_names_in_]) \
+                + pack_str_list([str(label) for label in trained_model.classes_])
+
+        if operation == PREDICT:
+            model_input = pd.DataFrame(reader.read_matrix(),
+                                       columns=trained_model.feature_names_in_)
+
+            return pack_str(loaded_model.model_id) \
+                + pack_matrix(trained_model.predict_proba(model_input))
+
+        raise ValueError(f"Unknown operation {operation}")
+
+    def server_close(self) -> None:
+        super().server_close()
+
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serves the predictions of the trained models '
+                                                 'over a Unix domain socket.')
+    parser.add_argument('--socket', default=cfg.INFERENCE_SERVER_SOCKET,
+                        help='path of the Unix domain socket to listen on')
+    args = parser.parse_args()
+
+    logging.config.dictConfig(cfg.LOGGING)
+
+    model_dirs = [Path(cfg.ARRIVALS_RUNWAY_MODELS_DIR), Path(cfg.ARRIVALS_RUNWAY_CONFIG_MODELS_DIR)]
+    registry = ModelRegistry(validator=validate_model, reload_on_get=not cfg.MODEL_WATCH_ENABLED)
+
+    if cfg.MODEL_WATCH_ENABLED:
+        ModelWatcher(registry=registry, directories=model_dirs,
+                     interval=cfg.MODEL_WATCH_INTERVAL).start()
+
+    server = InferenceServer(socket_path=Path(args.socket), model_dirs=model_dirs,
+                             registry=registry)
+    os.chmod(args.socket, 0o660)
+
+    _logger.info(f"Inference server listening on {args.socket}")
+
+    with server:
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -37,19 +37,24 @@ __author__ = "EUROCONTROL (SWIM)"
 
 import logging
 
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response
 from marshmallow import ValidationError
+from werkzeug.http import http_date
 
 from met_update_db import repo as met_repo
 
-import predicted_runway.config as cfg
-from predicted_runway.domain import predictor
-from predicted_runway.domain.models import RunwayPredictionInput, RunwayConfigPredictionInput
+from predicted_runway.adapters import airports as airports_api
+from predicted_runway.domain import predictor, precompute, shadow
+from predicted_runway.domain.models import RunwayPredictionInput, RunwayConfigPredictionInput, \
+    RunwayPredictionOutput, RunwayConfigPredictionOutput, PredictionInput, PredictionOutput, \
+    ModelClasses, PredictionModelOutput
+from predicted_runway.routes import negotiation
 from predicted_runway.routes.factory import RunwayPredictionInputFactory, \
     RunwayConfigPredictionInputFactory
-from predicted_runway.routes.schemas import RunwayPredictionInputSchema, \
-    RunwayConfigPredictionInputSchema, RunwayConfigPredictionOutputSchema, \
-    RunwayPredictionOutputSchema
+from predicted_runway.routes.schemas import PredictionOutputOptionsSchema, \
+    RunwayPredictionInputSchema, RunwayConfigPredictionInputSchema, \
+    RunwayConfigPredictionOutputSchema, RunwayPredictionOutputSchema, \
+    CompactPredictionOutputSchema, IdsPredictionOutputSchema
 
 _logger = logging.getLogger(__name__)
 
@@ -66,6 +71,94 @@ def _runway_config_prediction_input_from_input_data(input_data: dict) -> RunwayC
     return RunwayConfigPredictionInputFactory.create(**validated_input)
 
 
+def _output_options_from_input_data(input_data: dict) -> dict:
+    # the options only shape the output, they are not part of the prediction input
+    options_data = {name: input_data.pop(name)
+                    for name in PredictionOutputOptionsSchema().fields if name in input_data}
+
+    return PredictionOutputOptionsSchema().load(options_data)
+
+
+def _prediction_output_response(prediction_input: PredictionInput,
+                                prediction_output: PredictionOutput,
+                                output_options: dict,
+                                geojson_schema: type,
+                                headers: dict) -> Response:
+    schema = {
+        'compact': CompactPredictionOutputSchema,
+        'ids': IdsPredictionOutputSchema
+    }.get(output_options['format'], geojson_schema)(
+        prediction_input,
+        prediction_output,
+        top_k=output_options.get('top_k'),
+        min_probability=output_options.get('min_probability')
+    )
+
+    if negotiation.get_response_mimetype() == negotiation.MSGPACK_MIMETYPE:
+        return negotiation.msgpack_response(schema.dump(), headers)
+
+    return _json_response(schema.dumps(), {**headers, **negotiation.VARY_HEADERS})
+
+
+def _get_staleness_headers(cube: precompute.PredictionCube) -> dict:
+    return {
+        "X-Prediction-Computed-At": http_date(cube.computed_at),
+        "X-MET-Refreshed-At": http_date(cube.met_refreshed_at)
+    }
+
+
+def _submit_shadow(kind: str,
+                   prediction_input: PredictionInput,
+                   prediction_output: RunwayPredictionOutput | RunwayConfigPredictionOutput,
+                   quality: str) -> None:
+    # fast outputs come from a subset of the trees and would skew the divergence
+    if quality == predictor.FULL_QUALITY:
+        shadow.submit(kind, prediction_input,
+                      PredictionModelOutput(model_classes=prediction_output.model_classes,
+                                            probabilities=prediction_output.probabilities))
+
+
+def _get_runway_prediction_output(prediction_input: RunwayPredictionInput, quality: str) \
+        -> tuple[RunwayPredictionOutput, dict]:
+
+    precomputed = precompute.get_runway_prediction_output(prediction_input)
+    if precomputed is not None:
+        prediction_output, cube = precomputed
+        headers = _get_staleness_headers(cube)
+    else:
+        prediction_output = predictor.get_runway_prediction_output(prediction_input,
+                                                                   quality=quality)
+        headers = {}
+
+    _submit_shadow(shadow.RUNWAY, prediction_input, prediction_output, quality)
+
+    return prediction_output, headers
+
+
+def _get_runway_config_prediction_output(prediction_input: RunwayConfigPredictionInput,
+                                         quality: str) \
+        -> tuple[RunwayConfigPredictionOutput, dict]:
+
+    precomputed = precompute.get_runway_config_prediction_output(prediction_input)
+    if precomputed is not None:
+        prediction_output, cube = precomputed
+        headers = _get_staleness_headers(cube)
+    else:
+        prediction_output = predictor.get_runway_config_prediction_output(prediction_input,
+                                                                          quality=quality)
+        headers = {}
+
+    _submit_shadow(shadow.RUNWAY_CONFIG, prediction_input, prediction_output, quality)
+
+    return prediction_output, headers
+
+
+def _json_response(body: str, headers: dict) -> Response:
+    # terminated by a newline as jsonify terminates its responses
+    return current_app.response_class(body + '\n', status=200, headers=headers,
+                                      mimetype='application/json')
+
+
 def _message_invalid_request_exception(exc: Exception) -> tuple[str, int]:
     mapper = {
         ValidationError: (str(exc), 400),
@@ -77,66 +170,74 @@ def _message_invalid_request_exception(exc: Exception) -> tuple[str, int]:
 
 
 def arrivals_runway_prediction(destination_icao: str):
-    if destination_icao not in cfg.DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(cfg.DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     input_data = dict(request.args)
     input_data.update({'destination_icao': destination_icao})
 
     try:
+        output_options = _output_options_from_input_data(input_data)
         prediction_input = _runway_prediction_input_from_input_data(input_data)
     except Exception as exc:
         message, status_code = _message_invalid_request_exception(exc)
         return jsonify({"detail": message}), status_code
 
     try:
-        prediction_output = predictor.get_runway_prediction_output(prediction_input)
+        prediction_output, headers = _get_runway_prediction_output(
+            prediction_input, quality=output_options['quality']
+        )
     except Exception as e:
         _logger.exception(e)
         return jsonify({
             "detail": "Something went wrong during the prediction. Please try again later."
         }), 500
 
-    result = RunwayPredictionOutputSchema(prediction_input, prediction_output).dump()
-
-    return jsonify(result), 200
+    return _prediction_output_response(prediction_input, prediction_output, output_options,
+                                       geojson_schema=RunwayPredictionOutputSchema,
+                                       headers=headers)
 
 
 def arrivals_runway_config_prediction(destination_icao: str):
-    if destination_icao not in cfg.DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(cfg.DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     input_data = dict(request.args)
     input_data.update({'destination_icao': destination_icao})
 
     try:
+        output_options = _output_options_from_input_data(input_data)
         prediction_input = _runway_config_prediction_input_from_input_data(input_data)
     except Exception as exc:
         message, status_code = _message_invalid_request_exception(exc)
         return jsonify({"detail": message}), status_code
 
     try:
-        prediction_output = predictor.get_runway_config_prediction_output(prediction_input)
+        prediction_output, headers = _get_runway_config_prediction_output(
+            prediction_input, quality=output_options['quality']
+        )
     except Exception as e:
         _logger.exception(e)
         return jsonify({
             "detail": "Something went wrong during the prediction. Please try again later."
         }), 500
 
-    result = RunwayConfigPredictionOutputSchema(prediction_input,
-                                                prediction_output).dump()
-
-    return jsonify(result), 200
+    return _prediction_output_response(prediction_input, prediction_output, output_options,
+                                       geojson_schema=RunwayConfigPredictionOutputSchema,
+                                       headers=headers)
 
 
 def create_runway_prediction_input(destination_icao: str):
-    if destination_icao not in cfg.DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(cfg.DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     input_data = dict(request.args)
@@ -155,9 +256,10 @@ def create_runway_prediction_input(destination_icao: str):
 
 
 def create_runway_config_prediction_input(destination_icao: str):
-    if destination_icao not in cfg.DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(cfg.DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     input_data = dict(request.args)
@@ -173,3 +275,35 @@ def create_runway_config_prediction_input(destination_icao: str):
         return jsonify({"detail": message}), status_code
 
     return jsonify(**prediction_input.to_dict()), 200
+
+
+def _model_classes_response(model_classes: ModelClasses) -> Response:
+    response = jsonify(model_classes.to_dict())
+    # the table only changes with the classes of the model
+    response.set_etag(model_classes.table_id)
+
+    return response.make_conditional(request)
+
+
+def get_runway_prediction_classes(destination_icao: str):
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
+        return jsonify({
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
+        }), 404
+
+    destination = airports_api.get_airport_by_icao(destination_icao)
+
+    return _model_classes_response(predictor.get_runway_model_classes(destination))
+
+
+def get_runway_config_prediction_classes(destination_icao: str):
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
+        return jsonify({
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
+        }), 404
+
+    destination = airports_api.get_airport_by_icao(destination_icao)
+
+    return _model_classes_response(predictor.get_runway_config_model_classes(destination))
@@ -35,14 +35,26 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 
 __author__ = "EUROCONTROL (SWIM)"
 
+from typing import Any
+
 import flask as f
 from flask import jsonify
 from met_update_db import repo as met_repo
 
-from predicted_runway.adapters import airports as airports_api, stats
-from predicted_runway.config import DESTINATION_ICAOS, get_runway_model_path, \
+from predicted_runway import compression
+from predicted_runway.adapters import airports as airports_api, stats, met
+from predicted_runway.config import get_runway_model_path, \
     get_runway_config_model_path
+from predicted_runway.domain import predictor, precompute, shadow
 from predicted_runway.domain.models import Airport
+from predicted_runway.routes import negotiation
+
+
+def _negotiated_response(result: Any):
+    if negotiation.get_response_mimetype() == negotiation.MSGPACK_MIMETYPE:
+        return negotiation.msgpack_response(result)
+
+    return result, 200, negotiation.VARY_HEADERS
 
 
 def get_airports_data(search: str):
@@ -54,13 +66,14 @@ def get_airports_data(search: str):
 
 
 def get_latest_taf_end_time(destination_icao: str):
-    if destination_icao not in DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     try:
-        end_time_datetime = met_repo.get_last_taf_end_time(airport_icao=destination_icao)
+        end_time_datetime = met.get_last_taf_end_time(airport_icao=destination_icao)
     except met_repo.METNotAvailable:
         return {"detail": "Couldn't determine a future time window because no meteorological data "
                           "are available at the moment. Please try again later."}, 409
@@ -71,31 +84,48 @@ def get_latest_taf_end_time(destination_icao: str):
 
 
 def get_arrivals_runway_prediction_stats(destination_icao: str):
-    if destination_icao not in DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     result = stats.get_arrivals_runway_airport_stats(destination_icao=destination_icao)
 
-    return result, 200
+    return _negotiated_response(result)
 
 
 def get_arrivals_runway_config_prediction_stats(destination_icao: str):
-    if destination_icao not in DESTINATION_ICAOS:
+    destination_icaos = airports_api.get_destination_icaos()
+    if destination_icao not in destination_icaos:
         return jsonify({
-            "detail": f'destination_icao should be one of {", ".join(DESTINATION_ICAOS)}'
+            "detail": f'destination_icao should be one of {", ".join(destination_icaos)}'
         }), 404
 
     result = stats.get_arrivals_runway_config_airport_stats(destination_icao=destination_icao)
 
-    return result, 200
+    return _negotiated_response(result)
+
+
+def get_metrics():
+    return {
+        "wind_cache": met.get_wind_cache_stats(),
+        "met_lookup": met.get_met_lookup_stats(),
+        "met_snapshots": met.get_met_snapshots_stats(),
+        "prediction_cache": predictor.get_prediction_cache_stats(),
+        "prediction_flights": predictor.get_prediction_flights_stats(),
+        "prediction_cubes": precompute.get_prediction_cubes_stats(),
+        "inference_batching": predictor.get_inference_batching_stats(),
+        "models": predictor.get_model_registry_stats(),
+        "shadow": shadow.get_shadow_stats(),
+        "compression": compression.get_compression_stats()
+    }, 200
 
 
 def get_config():
     config = [
         _get_airport_config_data(airport_icao=dest_icao)
-        for dest_icao in DESTINATION_ICAOS
+        for dest_icao in airports_api.get_destination_icaos()
     ]
 
     return config, 200
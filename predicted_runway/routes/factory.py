@@ -35,19 +35,12 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 
 __author__ = "EUROCONTROL (SWIM)"
 
-from met_update_db import repo as met_repo
-
+from predicted_runway.adapters import met
 from predicted_runway.adapters.airports import get_airport_by_icao
 from predicted_runway.domain.models import WindInputSource, RunwayPredictionInput, \
     RunwayConfigPredictionInput, Timestamp
 
 
-def wind_input_source_from_wind_data_source(wind_data_source: met_repo.WindDataSource) \
-        -> WindInputSource:
-
-    return WindInputSource(wind_data_source.value)
-
-
 def _handle_wind_input(
     destination_icao: str,
     timestamp: int,
@@ -57,11 +50,10 @@ def _handle_wind_input(
 ) -> tuple[float, float, WindInputSource]:
 
     if wind_direction is None or wind_speed is None:
-        wind_data, wind_data_source = met_repo.get_wind_data(airport_icao=destination_icao,
-                                                             before_timestamp=timestamp)
+        wind_data = met.get_wind_data(airport_icao=destination_icao, before_timestamp=timestamp)
         wind_direction = wind_data.direction
         wind_speed = wind_data.speed
-        wind_input_source = wind_input_source_from_wind_data_source(wind_data_source)
+        wind_input_source = wind_data.source
     elif wind_input_source is None:
         wind_input_source = WindInputSource.USER
 
@@ -41,9 +41,11 @@ from datetime import datetime
 
 import marshmallow as ma
 
-from predicted_runway.config import DESTINATION_ICAOS
+from predicted_runway import serialization
+from predicted_runway.adapters.airports import get_destination_icaos
 from predicted_runway.domain.models import RunwayPredictionInput, WindInputSource, \
-    RunwayConfigPredictionInput, RunwayPredictionOutput, RunwayConfigPredictionOutput
+    RunwayConfigPredictionInput, RunwayPredictionOutput, RunwayConfigPredictionOutput, \
+    PredictionInput, PredictionOutput
 
 
 def _is_valid_icao(icao: str):
@@ -61,8 +63,9 @@ def _validate_destination_icao(value: Any) -> str:
     if not _is_valid_icao(value):
         raise ma.ValidationError("Should be a string of 4 characters.")
 
-    if value not in DESTINATION_ICAOS:
-        raise ma.ValidationError(f"Should be one of {', '.join(DESTINATION_ICAOS)}.")
+    destination_icaos = get_destination_icaos()
+    if value not in destination_icaos:
+        raise ma.ValidationError(f"Should be one of {', '.join(destination_icaos)}.")
 
     return value
 
@@ -117,6 +120,41 @@ def _validate_wind_input_source(value: Any) -> str:
     return value
 
 
+def _validate_quality(value: Any) -> str:
+    if value not in ('full', 'fast'):
+        raise ma.ValidationError("Should be one of full, fast.")
+
+    return value
+
+
+def _validate_format(value: Any) -> str:
+    if value not in ('geojson', 'compact', 'ids'):
+        raise ma.ValidationError("Should be one of geojson, compact, ids.")
+
+    return value
+
+
+def _validate_top_k(value: Any) -> int:
+    if value < 1:
+        raise ma.ValidationError('Should be at least 1.')
+
+    return value
+
+
+def _validate_min_probability(value: Any) -> float:
+    if not 0 <= value <= 1:
+        raise ma.ValidationError('Should be between 0 and 1.')
+
+    return value
+
+
+class PredictionOutputOptionsSchema(ma.Schema):
+    quality = ma.fields.Str(load_default='full', validate=_validate_quality)
+    format = ma.fields.Str(load_default='geojson', validate=_validate_format)
+    top_k = ma.fields.Int(validate=_validate_top_k)
+    min_probability = ma.fields.Float(validate=_validate_min_probability)
+
+
 class PredictionInputSchema(ma.Schema):
     destination_icao = ma.fields.Str(required=True, validate=_validate_destination_icao)
     timestamp = ma.fields.Int(required=True, validate=_validate_timestamp)
@@ -143,25 +181,72 @@ class RunwayConfigPredictionInputSchema(PredictionInputSchema):
     ...
 
 
+class _GeoJSONOutputSchemaMixin:
+    prediction_input: PredictionInput
+    prediction_output: PredictionOutput
+    top_k: int
+    min_probability: float
+
+    def dump(self) -> dict:
+        return {
+            "prediction_input": self.prediction_input.to_dict(),
+            "prediction_output": self.prediction_output.to_geojson(
+                top_k=self.top_k, min_probability=self.min_probability
+            ),
+        }
+
+    def dumps(self) -> str:
+        # the GeoJSON is spliced in already serialised, the keys sorted as jsonify sorts them
+        prediction_input = serialization.dumps(self.prediction_input.to_dict(), sort_keys=True)
+        prediction_output = self.prediction_output.render_geojson(
+            top_k=self.top_k, min_probability=self.min_probability
+        )
+
+        return f'{{"prediction_input":{prediction_input},"prediction_output":{prediction_output}}}'
+
+
 @dataclass
-class RunwayPredictionOutputSchema:
+class RunwayPredictionOutputSchema(_GeoJSONOutputSchemaMixin):
     prediction_input: RunwayPredictionInput
     prediction_output: RunwayPredictionOutput
+    top_k: int = None
+    min_probability: float = None
+
+
+@dataclass
+class RunwayConfigPredictionOutputSchema(_GeoJSONOutputSchemaMixin):
+    prediction_input: RunwayConfigPredictionInput
+    prediction_output: RunwayConfigPredictionOutput
+    top_k: int = None
+    min_probability: float = None
+
+
+@dataclass
+class CompactPredictionOutputSchema:
+    prediction_input: PredictionInput
+    prediction_output: PredictionOutput
+    top_k: int = None
+    min_probability: float = None
 
     def dump(self) -> dict:
         return {
             "prediction_input": self.prediction_input.to_dict(),
-            "prediction_output": self.prediction_output.to_geojson(),
+            "prediction_output": self.prediction_output.to_compact(
+                top_k=self.top_k, min_probability=self.min_probability
+            ),
         }
 
+    def dumps(self) -> str:
+        return serialization.dumps(self.dump(), sort_keys=True)
+
 
 @dataclass
-class RunwayConfigPredictionOutputSchema:
-    prediction_input: RunwayConfigPredictionInput
-    prediction_output: RunwayConfigPredictionOutput
+class IdsPredictionOutputSchema(CompactPredictionOutputSchema):
 
     def dump(self) -> dict:
         return {
             "prediction_input": self.prediction_input.to_dict(),
-            "prediction_output": self.prediction_output.to_geojson(),
+            "prediction_output": self.prediction_output.to_ids(
+                top_k=self.top_k, min_probability=self.min_probability
+            ),
         }
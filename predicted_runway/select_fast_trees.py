@@ -0,0 +1,154 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from joblib import load, dump
+
+from predicted_runway.compact_models import get_parity_input
+from predicted_runway.domain.compact import CompactForest, compact_forest
+
+
+def select_trees(tree_probas: np.ndarray, size: int) -> np.ndarray:
+    """
+    Greedily selects `size` trees whose average probabilities stay the closest (mean total
+    variation distance) to the ones of the whole forest, given the (trees, rows, classes)
+    probabilities of every tree. The selected trees are returned in the order of selection.
+    """
+    forest_probas = tree_probas.mean(axis=0)
+    selected = []
+    selected_sum = np.zeros_like(forest_probas)
+
+    for count in range(1, size + 1):
+        candidates = [index for index in range(len(tree_probas)) if index not in selected]
+        subset_probas = (selected_sum + tree_probas[candidates]) / count
+        distances = np.abs(subset_probas - forest_probas).sum(axis=2).mean(axis=1) / 2
+
+        best = candidates[int(distances.argmin())]
+        selected.append(best)
+        selected_sum += tree_probas[best]
+
+    return np.array(selected, dtype=np.int32)
+
+
+def _get_latency(model: CompactForest, model_input, estimators: np.ndarray, repeat: int) -> float:
+    row = model_input.iloc[:1]
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        model.predict_proba(row, estimators)
+        timings.append(time.perf_counter() - started_at)
+
+    return float(np.median(timings))
+
+
+def get_subset_curve(model: CompactForest,
+                     model_input,
+                     selected: np.ndarray,
+                     sizes: list[int],
+                     repeat: int = 20) -> list[dict]:
+    """
+    Returns, for the first `size` selected trees, how the predictions compare with the ones of the
+    whole forest (top class agreement and mean total variation distance) and the latency of a
+    single prediction.
+    """
+    tree_probas = model.predict_tree_probas(model_input)
+    forest_probas = tree_probas.mean(axis=0)
+    forest_latency = _get_latency(model, model_input, None, repeat)
+    curve = []
+
+    for size in sizes:
+        subset_probas = tree_probas[selected[:size]].mean(axis=0)
+        latency = _get_latency(model, model_input, selected[:size], repeat)
+
+        curve.append({
+            "trees": size,
+            "top_class_agreement": float(
+                (subset_probas.argmax(axis=1) == forest_probas.argmax(axis=1)).mean()
+            ),
+            "total_variation_distance": float(
+                np.abs(subset_probas - forest_probas).sum(axis=1).mean() / 2
+            ),
+            "latency_ms": latency * 1000,
+            "speedup": forest_latency / latency
+        })
+
+    return curve
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Selects the trees used by the fast predictions of '
+                                                 'model files, writes them as compact models and '
+                                                 'reports the accuracy/latency curve of each.')
+    parser.add_argument('paths', nargs='+', type=Path, help='model files, compact or not')
+    parser.add_argument('--output-dir', type=Path, required=True,
+                        help='directory where the compact model files are written, with the same '
+                             'names')
+    parser.add_argument('--trees', type=int, default=10,
+                        help='number of trees used by the fast predictions')
+    parser.add_argument('--samples', type=int, default=1000,
+                        help='number of random inputs the subsets are evaluated on')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        model = load(path)
+        if not isinstance(model, CompactForest):
+            model = compact_forest(model)
+
+        model_input = get_parity_input(model, args.samples)
+        selected = select_trees(model.predict_tree_probas(model_input),
+                                size=min(args.trees, model.n_estimators))
+        sizes = sorted({size for size in (1, 2, 5, 10, 20, 50) if size < len(selected)}
+                       | {len(selected)})
+
+        print(path)
+        for point in get_subset_curve(model, model_input, selected, sizes):
+            print(f"  {point['trees']:>4} trees: top class agreement "
+                  f"{point['top_class_agreement']:.1%}, total variation distance "
+                  f"{point['total_variation_distance']:.4f}, {point['latency_ms']:.3f} ms "
+                  f"({point['speedup']:.1f}x)")
+
+        model.fast_estimators = selected
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        dump(model, args.output_dir.joinpath(path.name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import json
+import re
+from typing import Any
+
+import numpy as np
+from connexion.apps.flask_app import FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson formats floats as the json module does, but for the exponents (1e-07 vs 1e-7) and the
+# floats below 1e-4, written with an exponent by the json module
+_EXPONENT = re.compile(rb'e[-+0-9]')
+_BELOW_1E_4 = b'0.0000'
+_NULL = b'null'
+
+_COMPACT_SEPARATORS = (',', ':')
+
+
+def to_builtin(o: Any) -> Any:
+    """
+    Converts the NumPy values the json module cannot serialise. float32 values are written with
+    their shortest representation, as orjson does.
+    """
+    if isinstance(o, np.ndarray):
+        if o.dtype == np.float32:
+            return o.astype(str).astype(np.float64).tolist()
+        return o.tolist()
+
+    if isinstance(o, np.float32):
+        return float(str(o))
+
+    if isinstance(o, np.generic):
+        return o.item()
+
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def _has_diverging_number(data: bytes) -> bool:
+    # false positives, e.g. 10.00001, None or some text, only make the json module serialise
+    if _BELOW_1E_4 in data:
+        return True
+
+    # orjson writes NaN and infinities as null, the json module as NaN and Infinity
+    if _NULL in data:
+        return True
+
+    return any(data[match.start() - 1:match.start()].isdigit()
+               for match in _EXPONENT.finditer(data))
+
+
+def _orjson_dumps(obj: Any,
+                  option: int,
+                  default: Any = to_builtin,
+                  ensure_ascii: bool = True) -> bytes | None:
+    """
+    Serialises with orjson, or returns None when its output would differ from the json module's:
+    numbers formatted differently, non-finite numbers, characters the json module escapes with
+    `ensure_ascii` or types orjson does not support (e.g. non string keys).
+    """
+    try:
+        data = orjson.dumps(obj, default=default, option=option | orjson.OPT_SERIALIZE_NUMPY)
+    except TypeError:
+        return None
+
+    if ensure_ascii and (not data.isascii() or b'\x7f' in data):
+        return None
+
+    if _has_diverging_number(data):
+        return None
+
+    return data
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """
+    Serialises to compact JSON (as jsonify does outside debug), with orjson when it is installed
+    and the json module otherwise. NumPy arrays and scalars are supported by both.
+    """
+    if orjson is not None:
+        data = _orjson_dumps(obj, orjson.OPT_SORT_KEYS if sort_keys else 0)
+        if data is not None:
+            return data.decode()
+
+    return json.dumps(obj, separators=_COMPACT_SEPARATORS, sort_keys=sort_keys,
+                      default=to_builtin)
+
+
+def dumps_numbers(values: np.ndarray) -> list[str]:
+    """
+    Serialises each number of a 1-D array, e.g. to splice probabilities into pre-rendered JSON.
+    """
+    if orjson is not None:
+        data = _orjson_dumps(values, 0)
+        if data is not None:
+            return data[1:-1].decode().split(',') if len(values) else []
+
+    return [json.dumps(value) for value in to_builtin(np.asarray(values))]
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """
+    The JSON encoder of jsonify and of the connexion handlers, encoding with orjson when it
+    produces the same text as the json module for the options of the encoder, e.g. compact or
+    indented by 2 spaces, with sorted keys or not.
+    """
+
+    def _get_orjson_option(self) -> int | None:
+        if orjson is None or self.skipkeys or not self.check_circular:
+            return None
+
+        separators = self.item_separator, self.key_separator
+        if self.indent is None and separators == _COMPACT_SEPARATORS:
+            option = 0
+        elif self.indent in (2, '  ') and separators == (',', ': '):
+            option = orjson.OPT_INDENT_2
+        else:
+            return None
+
+        # datetimes and dataclasses are serialised as Flask and connexion do
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+        return option | orjson.OPT_SORT_KEYS if self.sort_keys else option
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, (np.ndarray, np.generic)):
+            return to_builtin(o)
+
+        return super().default(o)
+
+    def encode(self, o: Any) -> str:
+        option = self._get_orjson_option()
+        if option is not None:
+            data = _orjson_dumps(o, option, default=self.default, ensure_ascii=self.ensure_ascii)
+            if data is not None:
+                return data.decode()
+
+        return super().encode(o)
@@ -0,0 +1,118 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    coalesced: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing the same key: the first caller runs the function and the
+    ones arriving while it is in flight wait for its result (or exception) instead of running it
+    again. Flights are shared between threads and coroutines.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, Future] = {}
+        self.stats = SingleFlightStats()
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            self.stats.calls += 1
+
+            future = self._flights.get(key)
+            if future is not None:
+                self.stats.coalesced += 1
+                return future, False
+
+            future = self._flights[key] = Future()
+
+            return future, True
+
+    def _fly(self, key: Hashable, future: Future, function: Callable[[], Any]) -> Any:
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        future, is_leader = self._join(key)
+
+        if is_leader:
+            return self._fly(key, future, function)
+
+        return future.result()
+
+    async def do_async(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Same as `do` without blocking the event loop: the function runs in the default executor
+        of the running loop.
+        """
+        future, is_leader = self._join(key)
+
+        if is_leader:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._fly, key, future, function)
+
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
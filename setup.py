@@ -35,4 +35,12 @@ setuptools.setup(
         'flask-cors',
         'predicted-runway-met-update-db @ git+https://git@github.com/eurocontrol-swim/predicted-runway-met-update-db.git'
     ],
+    extras_require={
+        # faster JSON, MessagePack responses and Brotli compression, each optional
+        'speedups': [
+            'orjson>=3.8.3',
+            'msgpack>=1.0.4',
+            'Brotli>=1.0.9',
+        ],
+    },
 )
@@ -0,0 +1,78 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from unittest import mock
+
+from predicted_runway.adapters import airports
+
+
+def test_discover_destination_icaos__models_of_known_airports(tmp_path):
+    runway_models_dir = tmp_path.joinpath('runway')
+    runway_config_models_dir = tmp_path.joinpath('runway_config')
+    runway_models_dir.mkdir()
+    runway_config_models_dir.mkdir()
+
+    runway_models_dir.joinpath('EHAM.pkl').touch()
+    runway_models_dir.joinpath('XXXX.pkl').touch()
+    runway_models_dir.joinpath('notes.txt').touch()
+    runway_config_models_dir.joinpath('EBBR').mkdir()
+    runway_config_models_dir.joinpath('EBBR', 'current').touch()
+    runway_config_models_dir.joinpath('LFPO').mkdir()
+
+    with mock.patch.object(airports.cfg, 'ARRIVALS_RUNWAY_MODELS_DIR', str(runway_models_dir)), \
+            mock.patch.object(airports.cfg, 'ARRIVALS_RUNWAY_CONFIG_MODELS_DIR',
+                              str(runway_config_models_dir)):
+        assert airports.discover_destination_icaos() == ['EBBR', 'EHAM']
+
+
+def test_get_destination_icaos__configured__not_discovered():
+    with mock.patch.object(airports.cfg, 'DESTINATION_ICAOS', ['LOWW']), \
+            mock.patch.object(airports, 'discover_destination_icaos') as discover:
+        assert airports.get_destination_icaos() == ['LOWW']
+
+    discover.assert_not_called()
+
+
+def test_get_destination_icaos__not_configured__discovered_once_per_interval():
+    with mock.patch.object(airports.cfg, 'DESTINATION_ICAOS', []), \
+            mock.patch.object(airports, '_discovered_destinations', None), \
+            mock.patch.object(airports, 'discover_destination_icaos',
+                              return_value=['EHAM']) as discover:
+        assert airports.get_destination_icaos() == ['EHAM']
+        assert airports.get_destination_icaos() == ['EHAM']
+
+    discover.assert_called_once()
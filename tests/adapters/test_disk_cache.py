@@ -0,0 +1,135 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import sqlite3
+import time
+
+from predicted_runway.adapters.disk_cache import SQLiteCacheTier
+from predicted_runway.cache import Cache, InProcessCacheBackend
+
+
+def test_sqlite_cache_tier__put_and_get(tmp_path):
+    tier = SQLiteCacheTier(path=tmp_path.joinpath('cache.sqlite'), max_bytes=10 * 1024 * 1024)
+
+    tier.put('key', b'value', expires_at=time.time() + 60, scope='model')
+    tier.put('expired', b'value', expires_at=time.time() - 1, scope='model')
+    tier.flush()
+
+    assert tier.get('key') == b'value'
+    assert tier.get('expired') is None
+    assert tier.get('missing') is None
+
+
+def test_sqlite_cache_tier__survives_restarts(tmp_path):
+    path = tmp_path.joinpath('cache.sqlite')
+    tier = SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024)
+    tier.put('key', b'value', expires_at=time.time() + 60)
+    tier.flush()
+
+    assert SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024).get('key') == b'value'
+
+
+def test_sqlite_cache_tier__drop_scope(tmp_path):
+    tier = SQLiteCacheTier(path=tmp_path.joinpath('cache.sqlite'), max_bytes=10 * 1024 * 1024)
+
+    tier.put('old', b'value', expires_at=time.time() + 60, scope='old_model')
+    tier.put('new', b'value', expires_at=time.time() + 60, scope='new_model')
+    tier.drop_scope('old_model')
+    tier.flush()
+
+    assert tier.get('old') is None
+    assert tier.get('new') == b'value'
+
+
+def test_sqlite_cache_tier__compacts_to_max_bytes(tmp_path):
+    max_bytes = 256 * 1024
+    tier = SQLiteCacheTier(path=tmp_path.joinpath('cache.sqlite'), max_bytes=max_bytes)
+
+    for i in range(200):
+        tier.put(f'key{i}', bytes(4096), expires_at=time.time() + 60 + i)
+    tier.flush()
+
+    assert tier.get_size() <= max_bytes
+    # the entries expiring first are dropped first
+    assert tier.get('key0') is None
+    assert tier.get('key199') == bytes(4096)
+
+
+def test_cache__persistent_tier__populates_backend_on_miss(tmp_path):
+    tier = SQLiteCacheTier(path=tmp_path.joinpath('cache.sqlite'), max_bytes=10 * 1024 * 1024)
+    Cache('namespace', InProcessCacheBackend(maxsize=10), persistent_tier=tier)\
+        .set('key', {'value': 1}, ttl=60, scope='model')
+    tier.flush()
+
+    backend = InProcessCacheBackend(maxsize=10)
+    cache = Cache('namespace', backend, persistent_tier=tier)
+
+    assert cache.get('key') == {'value': 1}
+    assert cache.persistent_hits == 1
+    assert backend.get("namespace:'key'") is not None
+
+
+def test_sqlite_cache_tier__other_version__drops_entries_at_startup(tmp_path):
+    path = tmp_path.joinpath('cache.sqlite')
+    tier = SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024, version=1)
+    tier.put('key', b'value', expires_at=time.time() + 60)
+    tier.flush()
+
+    assert SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024, version=1).get('key') == b'value'
+    assert SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024, version=2).get('key') is None
+
+
+def test_sqlite_cache_tier__database_without_auto_vacuum__shrinks(tmp_path):
+    path = tmp_path.joinpath('cache.sqlite')
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('CREATE TABLE entries (key TEXT PRIMARY KEY, scope TEXT NOT NULL, '
+                       'expires_at REAL NOT NULL, value BLOB NOT NULL)')
+    connection.close()
+
+    tier = SQLiteCacheTier(path=path, max_bytes=10 * 1024 * 1024)
+    for index in range(200):
+        tier.put(f'key{index}', bytes(4096), expires_at=time.time() + 60, scope='model')
+    tier.flush()
+    size = path.stat().st_size + path.with_name('cache.sqlite-wal').stat().st_size
+
+    tier.max_bytes = 64 * 1024
+    tier.put('trigger', b'value', expires_at=time.time() + 60)
+    tier.flush()
+
+    assert tier._get_connection().execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert path.stat().st_size < size / 2
@@ -0,0 +1,400 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pytest
+from met_update_db import repo as met_repo
+
+from predicted_runway.adapters import met
+from predicted_runway.domain.models import WindInputSource
+
+
+@pytest.fixture(autouse=True)
+def clear_wind_cache():
+    met.clear_wind_cache()
+    yield
+    met.clear_wind_cache()
+
+
+@pytest.mark.parametrize('bucket, now, source, expected_ttl', [
+    # bucket already elapsed
+    (0, 900, WindInputSource.METAR, 21600),
+    # current bucket lives until the end of the bucket
+    (1, 1000, WindInputSource.METAR, 800),
+    # future bucket lives until the next TAF issuance
+    (10, 1000, WindInputSource.TAF, 20600),
+    # future bucket from a METAR lives until the bucket starts
+    (10, 1000, WindInputSource.METAR, 8000),
+    (30, 1000, WindInputSource.METAR, 20600),
+])
+def test_get_ttl(bucket, now, source, expected_ttl):
+    assert met._get_ttl(bucket, now, source) == expected_ttl
+
+
+@mock.patch('met_update_db.repo.get_wind_data')
+def test_get_wind_data__same_bucket__hits_the_cache(mock_get_wind_data):
+    mock_get_wind_data.return_value = (mock.Mock(direction=180.0, speed=10.0),
+                                       met_repo.WindDataSource.METAR)
+
+    first = met.get_wind_data(airport_icao='EHAM', before_timestamp=1650751200)
+    second = met.get_wind_data(airport_icao='EHAM', before_timestamp=1650751200 + 60)
+
+    assert first == second == met.WindData(direction=180.0, speed=10.0,
+                                           source=WindInputSource.METAR)
+    mock_get_wind_data.assert_called_once()
+    assert met.get_wind_cache_stats()['hits'] == 1
+
+
+@mock.patch('met_update_db.repo.get_wind_data')
+def test_get_wind_data__met_not_available__is_cached_negatively(mock_get_wind_data):
+    mock_get_wind_data.side_effect = met_repo.METNotAvailable()
+
+    for _ in range(2):
+        with pytest.raises(met_repo.METNotAvailable):
+            met.get_wind_data(airport_icao='EHAM', before_timestamp=1650751200)
+
+    mock_get_wind_data.assert_called_once()
+    assert met.get_wind_cache_stats()['negative_hits'] == 1
+
+
+@pytest.fixture
+def in_memory_provider():
+    return met.InMemoryWindProvider(
+        metars=[
+            met.METARRecord(airport_icao='EHAM', time=1000, wind_direction=180., wind_speed=10.),
+        ],
+        tafs=[
+            met.TAFRecord(airport_icao='EHAM', start_time=0, end_time=10000,
+                          wind_direction=90., wind_speed=5.),
+            met.TAFRecord(airport_icao='EHAM', start_time=5000, end_time=20000,
+                          wind_direction=270., wind_speed=20.),
+        ],
+        metar_validity=3600
+    )
+
+
+@pytest.mark.parametrize('before_timestamp, expected_wind_data', [
+    (500, met.WindData(direction=90., speed=5., source=WindInputSource.TAF)),
+    (1000, met.WindData(direction=180., speed=10., source=WindInputSource.METAR)),
+    (4600, met.WindData(direction=180., speed=10., source=WindInputSource.METAR)),
+    (4601, met.WindData(direction=90., speed=5., source=WindInputSource.TAF)),
+    (6000, met.WindData(direction=270., speed=20., source=WindInputSource.TAF)),
+])
+def test_in_memory_wind_provider__get_wind_data(
+    in_memory_provider, before_timestamp, expected_wind_data
+):
+    assert in_memory_provider.get_wind_data('EHAM', before_timestamp) == expected_wind_data
+
+
+@pytest.mark.parametrize('airport_icao, before_timestamp', [
+    ('EHAM', 20000),
+    ('LFPO', 1000),
+])
+def test_in_memory_wind_provider__no_met__raises_met_not_available(
+    in_memory_provider, airport_icao, before_timestamp
+):
+    with pytest.raises(met_repo.METNotAvailable):
+        in_memory_provider.get_wind_data(airport_icao, before_timestamp)
+
+
+def test_in_memory_wind_provider__get_last_taf_end_time(in_memory_provider):
+    assert int(in_memory_provider.get_last_taf_end_time('EHAM').timestamp()) == 20000
+
+    with pytest.raises(met_repo.METNotAvailable):
+        in_memory_provider.get_last_taf_end_time('LFPO')
+
+
+@pytest.mark.parametrize('filename, content', [
+    (
+        'met.json',
+        '[{"type": "METAR", "airport_icao": "EHAM", "start_time": 1000, '
+        '"wind_direction": 180, "wind_speed": 10},'
+        ' {"type": "TAF", "airport_icao": "EHAM", "start_time": 0, "end_time": 10000, '
+        '"wind_direction": 90, "wind_speed": 5}]'
+    ),
+    (
+        'met.csv',
+        'type,airport_icao,start_time,end_time,wind_direction,wind_speed\n'
+        'METAR,EHAM,1000,,180,10\n'
+        'TAF,EHAM,0,10000,90,5\n'
+    ),
+])
+def test_file_wind_provider(tmp_path, filename, content):
+    path = tmp_path.joinpath(filename)
+    path.write_text(content)
+
+    provider = met.FileWindProvider(path=path, metar_validity=3600)
+
+    assert provider.get_wind_data('EHAM', 1500) == \
+        met.WindData(direction=180., speed=10., source=WindInputSource.METAR)
+    assert provider.get_wind_data('EHAM', 9000) == \
+        met.WindData(direction=90., speed=5., source=WindInputSource.TAF)
+
+
+def test_set_wind_provider__get_wind_data_uses_the_provider(in_memory_provider):
+    met.set_wind_provider(in_memory_provider)
+
+    try:
+        assert met.get_wind_data('EHAM', 1000).source == WindInputSource.METAR
+    finally:
+        met.set_wind_provider(None)
+
+
+def test_build_met_snapshot(in_memory_provider):
+    snapshot = met.build_met_snapshot(in_memory_provider, airport_icao='EHAM', now=1000)
+
+    # aligned to the wind cache buckets
+    assert snapshot.wind_series.start == 900
+    assert snapshot.wind_series.step == 900
+    assert len(snapshot.wind_series) == 22
+    assert snapshot.get_wind_data(1000).source == WindInputSource.TAF
+    assert snapshot.get_wind_data(1800).source == WindInputSource.METAR
+    assert snapshot.get_wind_data(19999).direction == 270.
+    assert snapshot.get_wind_data(20700) is None
+    assert snapshot.get_wind_data(899) is None
+    assert int(snapshot.taf_end_time.timestamp()) == 20000
+
+
+def test_met_prefetcher__refresh__follows_the_destinations(in_memory_provider, monkeypatch):
+    monkeypatch.setattr(met, '_snapshots', {})
+    met.set_wind_provider(in_memory_provider)
+    destinations = ['EHAM']
+    prefetcher = met.METPrefetcher(get_airport_icaos=lambda: list(destinations), interval=60)
+
+    try:
+        prefetcher.refresh()
+        assert set(met._snapshots) == {'EHAM'}
+
+        destinations[:] = ['LFPO']
+        prefetcher.refresh()
+        assert set(met._snapshots) == {'LFPO'}
+    finally:
+        met.set_wind_provider(None)
+
+
+@pytest.mark.parametrize(
+    'from_timestamp, to_timestamp, step, expected_direction, expected_source', [
+        (500, 6500, 1000,
+         [90., 180., 180., 180., 180., 270.], ['TAF', 'METAR', 'METAR', 'METAR', 'METAR', 'TAF']),
+        (19000, 22000, 1000,
+         [270., np.nan, np.nan], ['TAF', '', '']),
+        (5000, 5000, 1000,
+         [], []),
+    ]
+)
+def test_in_memory_wind_provider__get_wind_series__matches_get_wind_data(
+    in_memory_provider, from_timestamp, to_timestamp, step, expected_direction, expected_source
+):
+    series = in_memory_provider.get_wind_series('EHAM', from_timestamp, to_timestamp, step)
+
+    np.testing.assert_array_equal(series.direction, expected_direction)
+    np.testing.assert_array_equal(series.source, expected_source)
+
+    for timestamp in series.timestamps:
+        try:
+            wind_data = in_memory_provider.get_wind_data('EHAM', int(timestamp))
+        except met_repo.METNotAvailable:
+            wind_data = None
+
+        assert series.get_wind_data(int(timestamp)) == wind_data
+
+
+# create: the range query of met_update_db is newer than the placeholder of the test environments
+@mock.patch('met_update_db.repo.get_wind_data')
+@mock.patch('met_update_db.repo.get_met_records', create=True)
+def test_mongo_wind_provider__get_wind_series__single_range_query(mock_get_met_records,
+                                                                  mock_get_wind_data):
+    mock_get_met_records.return_value = [
+        {"type": "METAR", "airport_icao": "EHAM", "start_time": 3000, "wind_direction": 180.,
+         "wind_speed": 10.},
+        {"type": "TAF", "airport_icao": "EHAM", "start_time": 0, "end_time": 8000,
+         "wind_direction": 90., "wind_speed": 5.},
+    ]
+
+    series = met.MongoWindProvider().get_wind_series('EHAM', 1000, 10000, 2000)
+
+    mock_get_met_records.assert_called_once_with(airport_icao='EHAM', from_timestamp=1000 - 3600,
+                                                 to_timestamp=10000)
+    mock_get_wind_data.assert_not_called()
+    np.testing.assert_array_equal(series.direction, [90., 180., 180., 90., np.nan])
+    np.testing.assert_array_equal(series.source, ['TAF', 'METAR', 'METAR', 'TAF', ''])
+
+
+@mock.patch('met_update_db.repo.get_last_taf_end_time')
+@mock.patch('met_update_db.repo.get_wind_data')
+def test_get_wind_data__fresh_snapshot__does_not_hit_the_provider(
+    mock_get_wind_data, mock_get_last_taf_end_time, monkeypatch
+):
+    now = int(time.time())
+    provider = met.InMemoryWindProvider(
+        metars=[met.METARRecord(airport_icao='EHAM', time=now - 1800, wind_direction=180.,
+                                wind_speed=10.)],
+        tafs=[met.TAFRecord(airport_icao='EHAM', start_time=now - 3600, end_time=now + 7200,
+                            wind_direction=90., wind_speed=5.)]
+    )
+    snapshot = met.build_met_snapshot(provider, airport_icao='EHAM', now=now)
+    monkeypatch.setattr(met, '_snapshots', {'EHAM': snapshot})
+
+    assert met.get_wind_data('EHAM', now).source == WindInputSource.METAR
+    assert met.get_wind_data('EHAM', now + 3000).source == WindInputSource.TAF
+    assert met.get_last_taf_end_time('EHAM') == snapshot.taf_end_time
+
+    mock_get_wind_data.assert_not_called()
+    mock_get_last_taf_end_time.assert_not_called()
+
+
+class FakeTimer:
+
+    def __init__(self, now: float = 0.):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker():
+    timer = FakeTimer()
+    breaker = met.CircuitBreaker(failure_threshold=2, reset_timeout=10, timer=timer)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == met.CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    timer.now = 10
+    assert breaker.allow_request()
+    assert breaker.state == met.CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == met.CircuitBreaker.OPEN
+
+    timer.now = 20
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == met.CircuitBreaker.CLOSED
+
+
+class FailingWindProvider(met.InMemoryWindProvider):
+
+    def __init__(self, delay: float = 0., **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.failing = False
+
+    def get_wind_data(self, airport_icao: str, before_timestamp: int) -> met.WindData:
+        if self.failing:
+            if self.delay:
+                time.sleep(self.delay)
+            else:
+                raise ConnectionError("MongoDB is down")
+
+        return super().get_wind_data(airport_icao, before_timestamp)
+
+
+@pytest.fixture
+def reset_met_lookup(monkeypatch):
+    monkeypatch.setattr(met, '_circuit_breaker',
+                        met.CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    monkeypatch.setattr(met, '_last_known_winds', {})
+    monkeypatch.setattr(met.cfg, 'WIND_CACHE_ENABLED', False)
+    yield
+    met.set_wind_provider(None)
+
+
+@pytest.mark.parametrize('delay', [0., 0.2])
+def test_get_wind_data__provider_fails__falls_back_to_last_known_wind(
+    reset_met_lookup, monkeypatch, delay
+):
+    monkeypatch.setattr(met.cfg, 'MET_LOOKUP_TIMEOUT', 0.05)
+    now = int(time.time())
+    provider = FailingWindProvider(
+        delay=delay,
+        metars=[met.METARRecord(airport_icao='EHAM', time=now - 60, wind_direction=180.,
+                                wind_speed=10.)]
+    )
+    met.set_wind_provider(provider)
+
+    assert met.get_wind_data('EHAM', now).source == WindInputSource.METAR
+
+    provider.failing = True
+
+    for _ in range(3):
+        assert met.get_wind_data('EHAM', now + 60) == \
+            met.WindData(direction=180., speed=10., source=WindInputSource.LAST_KNOWN)
+
+    assert met.get_met_lookup_stats()['circuit_breaker'] == met.CircuitBreaker.OPEN
+
+
+def test_get_wind_data__lookup_queued_for_a_worker__budget_includes_the_wait(
+    reset_met_lookup, monkeypatch
+):
+    monkeypatch.setattr(met.cfg, 'MET_LOOKUP_TIMEOUT', 0.2)
+    monkeypatch.setattr(met, '_lookup_executor', ThreadPoolExecutor(max_workers=1))
+    now = int(time.time())
+    provider = FailingWindProvider(
+        delay=0.1,
+        metars=[met.METARRecord(airport_icao='EHAM', time=now - 60, wind_direction=180.,
+                                wind_speed=10.)]
+    )
+    provider.failing = True
+    met.set_wind_provider(provider)
+
+    met._lookup_executor.submit(time.sleep, 0.15)
+
+    started_at = time.monotonic()
+    with pytest.raises(met_repo.METNotAvailable):
+        met.get_wind_data('EHAM', now)
+
+    assert time.monotonic() - started_at < 0.3
+
+
+def test_get_wind_data__provider_fails__no_last_known_wind__raises_met_not_available(
+    reset_met_lookup
+):
+    provider = FailingWindProvider()
+    provider.failing = True
+    met.set_wind_provider(provider)
+
+    with pytest.raises(met_repo.METNotAvailable):
+        met.get_wind_data('EHAM', int(time.time()))
@@ -42,11 +42,19 @@ from pathlib import Path
 import pytest
 
 import predicted_runway
+import predicted_runway.adapters.airports
+import predicted_runway.config
 from predicted_runway.app import create_app
 from predicted_runway.domain.factory import AirportFactory
 from predicted_runway.domain.models import Airport
 
 
+def pytest_configure(config):
+    # the destinations would otherwise be discovered from the model directories
+    if not predicted_runway.config.DESTINATION_ICAOS:
+        predicted_runway.config.DESTINATION_ICAOS = ['EHAM', 'LEMD', 'LFPO', 'LOWW']
+
+
 def pytest_generate_tests(metafunc):
     os.environ['SECRET_KEY'] = 'secret'
 
@@ -0,0 +1,171 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from predicted_runway.domain.batching import InferenceDispatcher
+from predicted_runway.domain.predictor import Predictor
+
+
+class FakePredictor:
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self.trained_model = None
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict_values_batch(self, rows):
+        self.started.set()
+        self.release.wait(timeout=5)
+        self.batches.append(rows)
+
+        if any(row == ['error'] for row in rows):
+            raise ValueError('error')
+
+        return [{'value': row[0]} for row in rows]
+
+
+def test_inference_dispatcher__concurrent_rows__are_predicted_in_batches():
+    dispatcher = InferenceDispatcher(max_batch_size=64, max_wait=0.05)
+    predictor = FakePredictor(model_id='model')
+
+    # the worker is held by the first batch while the next rows queue up
+    predictor.release.clear()
+    first = dispatcher.submit(predictor, [0])
+    predictor.started.wait(timeout=5)
+    futures = [dispatcher.submit(predictor, [value]) for value in range(1, 11)]
+    predictor.release.set()
+
+    assert first.result(timeout=5) == {'value': 0}
+    assert [future.result(timeout=5) for future in futures] == \
+        [{'value': value} for value in range(1, 11)]
+    assert [len(rows) for rows in predictor.batches] == [1, 10]
+
+    stats = dispatcher.stats.to_dict()
+    assert stats['batches'] == 2
+    assert stats['rows'] == 11
+    assert stats['batch_sizes']['<=1'] == 1
+    assert stats['batch_sizes']['<=16'] == 1
+
+
+def test_inference_dispatcher__max_batch_size__splits_batches():
+    dispatcher = InferenceDispatcher(max_batch_size=4, max_wait=0.05)
+    predictor = FakePredictor(model_id='model')
+
+    predictor.release.clear()
+    dispatcher.submit(predictor, [0])
+    predictor.started.wait(timeout=5)
+    futures = [dispatcher.submit(predictor, [value]) for value in range(1, 11)]
+    predictor.release.set()
+
+    for future in futures:
+        future.result(timeout=5)
+
+    assert [len(rows) for rows in predictor.batches] == [1, 4, 4, 2]
+
+
+def test_inference_dispatcher__rows_of_different_models__are_not_merged():
+    dispatcher = InferenceDispatcher(max_batch_size=64, max_wait=0.05)
+    predictors = [FakePredictor(model_id='model1'), FakePredictor(model_id='model2')]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda i: dispatcher.predict(predictors[i % 2], [i]), range(4)))
+
+    assert results == [{'value': i} for i in range(4)]
+    assert sorted(row[0] for rows in predictors[0].batches for row in rows) == [0, 2]
+    assert sorted(row[0] for rows in predictors[1].batches for row in rows) == [1, 3]
+
+
+def test_inference_dispatcher__failed_batch__raises_to_every_caller():
+    dispatcher = InferenceDispatcher(max_batch_size=64, max_wait=0.05)
+    predictor = FakePredictor(model_id='model')
+
+    predictor.release.clear()
+    dispatcher.submit(predictor, [0])
+    predictor.started.wait(timeout=5)
+    futures = [dispatcher.submit(predictor, row) for row in (['error'], [1])]
+    predictor.release.set()
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+@mock.patch('predicted_runway.config.INFERENCE_BATCHING_ENABLED', True)
+def test_predictor__predict_values__batching_enabled__goes_through_the_dispatcher():
+    trained_model = mock.Mock()
+    trained_model.classes_ = ['18C', '36C']
+    trained_model.feature_names_in_ = ['hour', 'wind_speed']
+    trained_model.predict_proba = mock.Mock(side_effect=lambda rows: [[0.9, 0.1]] * len(rows))
+
+    predictor = Predictor(trained_model=trained_model, model_id='model')
+
+    assert predictor.predict_values([22, 15.0]) == {'18C': 0.9, '36C': 0.1}
+
+
+def test_inference_dispatcher__slow_model__does_not_hold_up_the_other_models():
+    dispatcher = InferenceDispatcher(max_batch_size=64, max_wait=0.01)
+    slow_predictor, predictor = FakePredictor(model_id='slow'), FakePredictor(model_id='model')
+
+    slow_predictor.release.clear()
+    slow = dispatcher.submit(slow_predictor, [0])
+    slow_predictor.started.wait(timeout=5)
+
+    assert dispatcher.predict(predictor, [1]) == {'value': 1}
+    assert not slow.done()
+
+    slow_predictor.release.set()
+    assert slow.result(timeout=5) == {'value': 0}
+
+
+def test_inference_dispatcher__idle_worker__stops():
+    dispatcher = InferenceDispatcher(max_batch_size=64, max_wait=0.01, idle_timeout=0.05)
+    predictor = FakePredictor(model_id='idle')
+
+    assert dispatcher.predict(predictor, [0]) == {'value': 0}
+    thread = next(t for t in threading.enumerate() if t.name == 'inference-dispatcher-idle')
+    thread.join(timeout=5)
+
+    assert dispatcher._pending == {}
+    assert dispatcher.predict(predictor, [1]) == {'value': 1}
@@ -0,0 +1,168 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import dump, load
+from sklearn.ensemble import RandomForestClassifier
+
+from predicted_runway.compact_models import compact_model_file
+from predicted_runway.domain.compact import compact_forest, predict_proba_fast
+from predicted_runway.domain.registry import get_model_footprint, load_memory_mapped
+from predicted_runway.select_fast_trees import select_trees, get_subset_curve
+
+
+def _get_input(rows: int, seed: int) -> pd.DataFrame:
+    random = np.random.default_rng(seed)
+
+    return pd.DataFrame({
+        'wind_direction': random.uniform(0, 360, rows),
+        'wind_speed': random.uniform(0, 40, rows),
+        'hour': random.integers(0, 24, rows),
+    })
+
+
+@pytest.fixture(scope='module')
+def model():
+    model_input = _get_input(rows=500, seed=0)
+    classes = np.where(model_input['wind_direction'] < 180, '18C', '36R')
+    classes[model_input['wind_speed'] > 30] = '09'
+
+    return RandomForestClassifier(n_estimators=20, random_state=0).fit(model_input, classes)
+
+
+def test_compact_forest__predict_proba__matches_the_forest(model):
+    compact_model = compact_forest(model)
+    model_input = _get_input(rows=200, seed=1)
+
+    np.testing.assert_allclose(compact_model.predict_proba(model_input),
+                               model.predict_proba(model_input),
+                               atol=1e-5)
+    assert list(compact_model.classes_) == list(model.classes_)
+    assert list(compact_model.feature_names_in_) == list(model.feature_names_in_)
+
+
+def test_compact_forest__threshold_between_adjacent_float32s__takes_the_same_branch():
+    low = np.nextafter(np.float32(3.), np.float32(np.inf))
+    high = np.nextafter(low, np.float32(np.inf))
+    model_input = pd.DataFrame({'wind_speed': [low, high] * 5})
+    model = RandomForestClassifier(n_estimators=1, bootstrap=False, random_state=0)\
+        .fit(model_input, ['18C', '36C'] * 5)
+
+    compact_model = compact_forest(model)
+
+    for value in (low, high):
+        np.testing.assert_array_equal(
+            compact_model.predict_proba(pd.DataFrame({'wind_speed': [value]})),
+            model.predict_proba(pd.DataFrame({'wind_speed': [value]}))
+        )
+
+
+def test_compact_forest__compact_arrays(model):
+    compact_model = compact_forest(model)
+
+    assert compact_model.threshold.dtype == np.float32
+    assert compact_model.leaf_probas.dtype == np.float32
+    assert compact_model.children_left.dtype in (np.int16, np.int32)
+    assert compact_model.feature.dtype == np.int16
+    assert compact_model.n_estimators == 20
+    # internal nodes hold no probabilities
+    assert len(compact_model.leaf_probas) == (compact_model.children_left == -1).sum()
+    np.testing.assert_allclose(compact_model.leaf_probas.sum(axis=1), 1, rtol=1e-6)
+    assert compact_model.nbytes < get_model_footprint(None, model) / 2
+
+
+def test_compact_model_file__writes_the_compact_model_and_reports(tmp_path, model):
+    path = tmp_path.joinpath('EHAM.pkl')
+    output_path = tmp_path.joinpath('compact', 'EHAM.pkl')
+    dump(model, path)
+
+    report = compact_model_file(path, output_path, samples=100)
+
+    assert report['compact_size'] < report['size']
+    assert 0 < report['reduction'] < 1
+    assert report['max_difference'] < 1e-5
+    assert load(output_path).n_estimators == 20
+
+
+def test_predict_proba_fast__selected_trees__averages_them(model):
+    compact_model = compact_forest(model)
+    model_input = _get_input(rows=50, seed=2)
+    compact_model.fast_estimators = np.array([3, 7])
+
+    expected = compact_model.predict_tree_probas(model_input)[[3, 7]].mean(axis=0)
+
+    np.testing.assert_allclose(predict_proba_fast(compact_model, model_input, default_size=5),
+                               expected)
+
+
+def test_predict_proba_fast__forest__averages_the_first_trees(model):
+    model_input = _get_input(rows=50, seed=2)
+
+    expected = compact_forest(model).predict_tree_probas(model_input)[:5].mean(axis=0)
+
+    np.testing.assert_allclose(predict_proba_fast(model, model_input, default_size=5), expected,
+                               atol=1e-5)
+
+
+def test_select_trees__subset_is_closer_to_the_forest_than_the_first_trees(model):
+    compact_model = compact_forest(model)
+    model_input = _get_input(rows=200, seed=3)
+    tree_probas = compact_model.predict_tree_probas(model_input)
+
+    selected = select_trees(tree_probas, size=5)
+
+    assert len(set(selected)) == 5
+    curve = get_subset_curve(compact_model, model_input, selected, sizes=[1, 5], repeat=1)
+    assert [point['trees'] for point in curve] == [1, 5]
+    first_trees_distance = np.abs(tree_probas[:5].mean(axis=0)
+                                  - tree_probas.mean(axis=0)).sum(axis=1).mean() / 2
+    assert curve[1]['total_variation_distance'] <= first_trees_distance
+
+
+def test_load_memory_mapped__compact_forest__keeps_its_arrays_mapped(tmp_path, model):
+    dump(model, tmp_path.joinpath('forest.joblib'))
+    dump(compact_forest(model), tmp_path.joinpath('compact.joblib'))
+
+    compact_model = load_memory_mapped(tmp_path.joinpath('compact.joblib'))
+    forest = load_memory_mapped(tmp_path.joinpath('forest.joblib'))
+
+    assert isinstance(compact_model.threshold, np.memmap)
+    assert isinstance(compact_model.leaf_probas, np.memmap)
+    # copied by the trees when unpickled
+    assert not isinstance(forest.estimators_[0].tree_.__getstate__()['nodes'], np.memmap)
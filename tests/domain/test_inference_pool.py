@@ -0,0 +1,82 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from predicted_runway.domain.inference_pool import InferencePool
+from predicted_runway.domain.registry import get_model_file_hash
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    rng = np.random.default_rng(0)
+    model_input = pd.DataFrame({'wind_speed': rng.uniform(0, 30, 100),
+                                'wind_dir': rng.uniform(0, 360, 100)})
+    trained_model = RandomForestClassifier(n_estimators=5, random_state=0)\
+        .fit(model_input, np.where(model_input['wind_dir'] < 180, '18C', '36C'))
+
+    path = tmp_path.joinpath('EHAM.pkl')
+    joblib.dump(trained_model, path)
+
+    return path
+
+
+@pytest.fixture
+def inference_pool():
+    pool = InferencePool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_inference_pool__predict_proba__same_as_in_process(model_path, inference_pool):
+    rows = [[10.0, 90.0], [20.0, 270.0]]
+    trained_model = joblib.load(model_path)
+
+    probas = inference_pool.predict_proba(model_path, get_model_file_hash(model_path), rows)
+
+    assert np.array_equal(
+        probas,
+        trained_model.predict_proba(pd.DataFrame(rows, columns=['wind_speed', 'wind_dir']))
+    )
+
+
+def test_inference_pool__predict_proba__other_model__returns_none(model_path, inference_pool):
+    assert inference_pool.predict_proba(model_path, 'other_model', [[10.0, 90.0]]) is None
@@ -36,15 +36,22 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 __author__ = "EUROCONTROL (SWIM)"
 
 import datetime
+import json
 
+import numpy as np
 import pytest
 
 from predicted_runway.domain.models import Timestamp, Airport, Runway, RunwayPredictionInput, \
     WindInputSource, RunwayConfigPredictionInput, RunwayConfigProbability, RunwayPredictionOutput, \
-    RunwayProbability, RunwayConfigPredictionOutput
+    RunwayProbability, RunwayConfigPredictionOutput, ModelClasses, PredictionModelOutput, \
+    UnknownRunwayError, RUNWAY
 from tests.conftest import get_airport_by_icao
 
 
+def test_wind_input_source__choices__excludes_last_known():
+    assert WindInputSource.choices() == ['METAR', 'TAF', 'USER']
+
+
 @pytest.mark.parametrize('value, expected_datetime', [
     (int(datetime.datetime(2022, 5, 12, 14, 0, tzinfo=datetime.timezone.utc).timestamp()),
      datetime.datetime(2022, 5, 12, 14, 0, tzinfo=datetime.timezone.utc))
@@ -756,3 +763,134 @@ def test_runway_config_prediction_output__to_geojson__exclude_zero_probas(
     runway_config_prediction_output, expected_geojson
 ):
     assert runway_config_prediction_output.to_geojson(exclude_zero_probas=True) == expected_geojson
+
+
+@pytest.mark.parametrize('prediction_output', [
+    RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='25L', value=0.4),
+                RunwayProbability(runway_name='19', value=0.599),
+                RunwayProbability(runway_name='07R', value=0.001)],
+        destination=get_airport_by_icao('EBBR')
+    ),
+    RunwayConfigPredictionOutput(
+        probas=[RunwayConfigProbability(runway_config="('25L', '25R')", value=0.7),
+                RunwayConfigProbability(runway_config="('19',)", value=0.299),
+                RunwayConfigProbability(runway_config="('07R',)", value=0.001)],
+        destination=get_airport_by_icao('EBBR')
+    )
+])
+@pytest.mark.parametrize('exclude_zero_probas', [False, True])
+def test_prediction_output__render_geojson__same_as_to_geojson(prediction_output,
+                                                               exclude_zero_probas):
+    rendered = prediction_output.render_geojson(exclude_zero_probas=exclude_zero_probas)
+
+    assert json.loads(rendered) == prediction_output.to_geojson(
+        exclude_zero_probas=exclude_zero_probas
+    )
+
+
+def test_runway_prediction_output__render_geojson__numpy_probabilities():
+    prediction_output = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='25L', value=np.float64(0.25)),
+                RunwayProbability(runway_name='19', value=np.float32(0.75))],
+        destination=get_airport_by_icao('EBBR')
+    )
+
+    features = json.loads(prediction_output.render_geojson())['features']
+
+    assert [feature['properties']['probability'] for feature in features] == [0.75, 0.25]
+
+
+def test_model_classes__compile__unknown_runway__raises():
+    with pytest.raises(UnknownRunwayError):
+        ModelClasses.compile(['25L', '36C'], RUNWAY, get_airport_by_icao('EBBR'))
+
+
+def test_prediction_model_output__reads_as_a_mapping_of_the_classes():
+    model_classes = ModelClasses.compile(['25L', '19'], RUNWAY, get_airport_by_icao('EBBR'))
+
+    model_output = PredictionModelOutput(model_classes=model_classes,
+                                         probabilities=np.array([0.25, 0.75]))
+
+    assert model_output == {'25L': 0.25, '19': 0.75}
+    assert model_output['19'] == 0.75
+    assert list(model_output) == ['25L', '19']
+
+
+def test_runway_prediction_output__shares_the_compiled_classes():
+    model_classes = ModelClasses.compile(['25L', '19'], RUNWAY, get_airport_by_icao('EBBR'))
+    model_output = PredictionModelOutput(model_classes=model_classes,
+                                         probabilities=np.array([0.25, 0.75]))
+
+    prediction_output = RunwayPredictionOutput(model_output=model_output,
+                                               destination=get_airport_by_icao('EBBR'))
+
+    assert prediction_output.model_classes is model_classes
+    assert prediction_output.sorted_probas == [RunwayProbability(runway_name='19', value=0.75),
+                                               RunwayProbability(runway_name='25L', value=0.25)]
+    assert [feature['properties']['runway_name']
+            for feature in prediction_output.to_geojson()['features']] == ['19', '25L']
+
+
+@pytest.mark.parametrize('top_k, min_probability, expected_runway_names', [
+    (None, None, ['19', '25L', '1', '07R']),
+    (2, None, ['19', '25L']),
+    (10, None, ['19', '25L', '1', '07R']),
+    (None, 0.2, ['19', '25L', '1']),
+    (2, 0.3, ['19']),
+])
+def test_runway_prediction_output__top_k_and_min_probability(top_k, min_probability,
+                                                             expected_runway_names):
+    prediction_output = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='25L', value=0.25),
+                RunwayProbability(runway_name='1', value=0.25),
+                RunwayProbability(runway_name='19', value=0.49),
+                RunwayProbability(runway_name='07R', value=0.01)],
+        destination=get_airport_by_icao('EBBR')
+    )
+
+    geojson = prediction_output.to_geojson(top_k=top_k, min_probability=min_probability)
+    rendered = prediction_output.render_geojson(top_k=top_k, min_probability=min_probability)
+
+    assert [feature['properties']['runway_name'] for feature in geojson['features']] == \
+        expected_runway_names
+    assert json.loads(rendered) == geojson
+
+
+def test_runway_prediction_output__to_compact_and_to_ids():
+    model_classes = ModelClasses.compile(['25L', '19', '1'], RUNWAY, get_airport_by_icao('EBBR'))
+    model_output = PredictionModelOutput(model_classes=model_classes,
+                                         probabilities=np.array([0.25, 0.7, 0.05]))
+    prediction_output = RunwayPredictionOutput(model_output=model_output,
+                                               destination=get_airport_by_icao('EBBR'))
+
+    assert prediction_output.to_compact(top_k=2) == {
+        'runway_names': ['19', '25L'], 'probabilities': [0.7, 0.25]
+    }
+    assert prediction_output.to_ids(min_probability=0.1) == {
+        'table_id': model_classes.table_id, 'class_indexes': [1, 0], 'probabilities': [0.7, 0.25]
+    }
+
+
+def test_runway_config_prediction_output__to_compact():
+    prediction_output = RunwayConfigPredictionOutput(
+        probas=[RunwayConfigProbability(runway_config="('25L', '25R')", value=0.4),
+                RunwayConfigProbability(runway_config="('19', '25R')", value=0.6)],
+        destination=get_airport_by_icao('EBBR')
+    )
+
+    assert prediction_output.to_compact() == {
+        'runway_configs': [['19', '25R'], ['25L', '25R']], 'probabilities': [0.6, 0.4]
+    }
+
+
+def test_model_classes__table_id__depends_on_the_classes_and_their_order():
+    destination = get_airport_by_icao('EBBR')
+
+    table_id = ModelClasses.compile(['25L', '19'], RUNWAY, destination).table_id
+
+    assert ModelClasses.compile(['25L', '19'], RUNWAY, destination).table_id == table_id
+    assert ModelClasses.compile(['19', '25L'], RUNWAY, destination).table_id != table_id
+    assert ModelClasses.compile(['25L', '19'], RUNWAY, destination).to_dict() == {
+        'table_id': table_id, 'classes': ['25L', '19'], 'runway_names': [['25L'], ['19']]
+    }
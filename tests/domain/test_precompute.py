@@ -0,0 +1,174 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from predicted_runway.adapters.met import METSnapshot, WindSeries
+from predicted_runway.domain import precompute
+from predicted_runway.domain.models import RunwayConfigPredictionInput, RunwayPredictionInput, \
+    Timestamp, WindInputSource, RunwayConfigProbability
+from predicted_runway.domain.predictor import Predictor
+from tests.conftest import get_airport_by_icao
+
+# Sun, 24 Apr 2022 22:00:00 UTC
+NOW = 1650837600
+
+
+def _get_snapshot(direction: float = 180.) -> METSnapshot:
+    return METSnapshot(
+        airport_icao='EHAM',
+        refreshed_at=NOW,
+        wind_series=WindSeries(start=NOW,
+                               step=900,
+                               direction=np.array([direction, 200., np.nan]),
+                               speed=np.array([10., 12., np.nan]),
+                               source=np.array(['METAR', 'TAF', ''], dtype='<U5')),
+        taf_end_time=None
+    )
+
+
+@pytest.fixture
+def trained_model():
+    trained_model = mock.Mock()
+    trained_model.classes_ = ["('18C', '36C')", "('1', '19')"]
+    trained_model.feature_names_in_ = ['15min_day_interval', 'wind_speed', 'wind_dir']
+    trained_model.predict_proba = mock.Mock(side_effect=lambda rows: [[0.9, 0.1]] * len(rows))
+
+    return trained_model
+
+
+@pytest.fixture
+def mock_get_predictor(trained_model):
+    precompute.clear_prediction_cubes()
+
+    with mock.patch('predicted_runway.domain.predictor.get_predictor') as mock_get_predictor:
+        mock_get_predictor.return_value = Predictor(trained_model=trained_model, model_id='model')
+        yield mock_get_predictor
+
+    precompute.clear_prediction_cubes()
+
+
+def _get_runway_config_prediction_input(timestamp: int,
+                                        wind_direction: float,
+                                        wind_speed: float,
+                                        wind_input_source: WindInputSource):
+    return RunwayConfigPredictionInput(destination=get_airport_by_icao('EHAM'),
+                                       timestamp=Timestamp(timestamp),
+                                       wind_direction=wind_direction,
+                                       wind_speed=wind_speed,
+                                       wind_input_source=wind_input_source)
+
+
+def test_refresh_prediction_cube__runway_config__single_batched_inference(
+    mock_get_predictor, trained_model
+):
+    cube = precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG, _get_snapshot(), now=NOW)
+
+    # two quarters with wind
+    assert len(cube) == 2
+    trained_model.predict_proba.assert_called_once()
+
+    output, output_cube = precompute.get_runway_config_prediction_output(
+        _get_runway_config_prediction_input(NOW + 1000, 200., 12., WindInputSource.TAF)
+    )
+
+    assert output_cube is cube
+    assert output.probas == [RunwayConfigProbability(runway_config="('18C', '36C')", value=0.9),
+                             RunwayConfigProbability(runway_config="('1', '19')", value=0.1)]
+
+
+@pytest.mark.parametrize('prediction_input', [
+    _get_runway_config_prediction_input(NOW + 1000, 180., 12., WindInputSource.TAF),
+    _get_runway_config_prediction_input(NOW + 1000, 200., 12., WindInputSource.USER),
+    _get_runway_config_prediction_input(NOW + 3600, 200., 12., WindInputSource.TAF),
+])
+def test_get_runway_config_prediction_output__not_precomputed__returns_none(
+    mock_get_predictor, prediction_input
+):
+    precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG, _get_snapshot(), now=NOW)
+
+    assert precompute.get_runway_config_prediction_output(prediction_input) is None
+
+
+def test_get_runway_config_prediction_output__model_changed__returns_none(
+    mock_get_predictor, trained_model
+):
+    precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG, _get_snapshot(), now=NOW)
+    mock_get_predictor.return_value = Predictor(trained_model=trained_model, model_id='new_model')
+
+    assert precompute.get_runway_config_prediction_output(
+        _get_runway_config_prediction_input(NOW, 180., 10., WindInputSource.METAR)
+    ) is None
+
+
+def test_refresh_prediction_cube__same_met__keeps_the_cube(mock_get_predictor, trained_model):
+    cube = precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG, _get_snapshot(), now=NOW)
+
+    same_met_cube = precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG,
+                                                       _get_snapshot(), now=NOW + 300)
+    assert same_met_cube.computed_at == cube.computed_at
+    assert trained_model.predict_proba.call_count == 1
+
+    new_met_cube = precompute.refresh_prediction_cube(precompute.RUNWAY_CONFIG,
+                                                      _get_snapshot(direction=190.), now=NOW + 600)
+    assert new_met_cube.computed_at == NOW + 600
+    assert trained_model.predict_proba.call_count == 2
+
+
+def test_get_runway_prediction_output__origin_angle_is_binned(mock_get_predictor, trained_model):
+    trained_model.classes_ = ['18C', '36C']
+    trained_model.feature_names_in_ = ['hour', 'wind_speed', 'wind_dir', 'origin_angle']
+
+    cube = precompute.refresh_prediction_cube(precompute.RUNWAY, _get_snapshot(), now=NOW)
+
+    # two quarters with wind in the same hour (one per wind) times 36 origin angle bins
+    assert len(cube) == 2 * 36
+    trained_model.predict_proba.assert_called_once()
+
+    output, _ = precompute.get_runway_prediction_output(RunwayPredictionInput(
+        origin=get_airport_by_icao('EBBR'),
+        destination=get_airport_by_icao('EHAM'),
+        timestamp=Timestamp(NOW),
+        wind_direction=180.,
+        wind_speed=10.,
+        wind_input_source=WindInputSource.METAR
+    ))
+
+    assert [proba.runway_name for proba in output.probas] == ['18C', '36C']
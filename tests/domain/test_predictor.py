@@ -35,15 +35,20 @@ Details on EUROCONTROL: http://www.eurocontrol.int
 
 __author__ = "EUROCONTROL (SWIM)"
 
+import itertools
 from unittest import mock
 from unittest.mock import Mock
 
+import numpy as np
 import pytest
 from pandas import DataFrame
 
+from predicted_runway.cache import Cache, SharedMemoryCacheBackend
 from predicted_runway.domain.models import RunwayPredictionInput, Timestamp, WindInputSource, \
-    RunwayProbability, RunwayConfigProbability
-from predicted_runway.domain.predictor import Predictor, predict_runway, predict_runway_config
+    RunwayProbability, RunwayConfigProbability, RunwayConfigPredictionInput, ModelClasses, RUNWAY
+from predicted_runway.domain import predictor as predictor_module
+from predicted_runway.domain.predictor import Predictor, predict_runway, predict_runway_config, \
+    get_runway_prediction_output, get_runway_config_prediction_output
 from tests.conftest import get_airport_by_icao
 
 
@@ -111,11 +116,11 @@ def test_predictor__predict(
         ]
     )
 ])
-@mock.patch.object(Predictor, 'from_path')
-def test_predict_runway(mock_from_path, model_output, expected_result):
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_predict_runway(mock_get_predictor, model_output, expected_result):
     predictor = Mock()
     predictor.predict = Mock(return_value=model_output)
-    mock_from_path.return_value = predictor
+    mock_get_predictor.return_value = predictor
 
     assert predict_runway(prediction_input=mock.Mock()) == expected_result
 
@@ -132,10 +137,158 @@ def test_predict_runway(mock_from_path, model_output, expected_result):
         ]
     )
 ])
-@mock.patch.object(Predictor, 'from_path')
-def test_predict_runway_config(mock_from_path, model_output, expected_result):
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_predict_runway_config(mock_get_predictor, model_output, expected_result):
     predictor = Mock()
     predictor.predict = Mock(return_value=model_output)
-    mock_from_path.return_value = predictor
+    mock_get_predictor.return_value = predictor
 
     assert predict_runway_config(prediction_input=mock.Mock()) == expected_result
+
+
+@pytest.fixture
+def clear_prediction_cache():
+    predictor_module.clear_prediction_cache()
+    yield
+    predictor_module.clear_prediction_cache()
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_get_runway_prediction_output__same_model_input__hits_the_cache(
+    mock_get_predictor, clear_prediction_cache
+):
+    trained_model = mock.Mock()
+    trained_model.classes_ = ['18C', '36C']
+    trained_model.feature_names_in_ = ['hour', 'wind_speed', 'wind_dir']
+    trained_model.predict_proba = mock.Mock(return_value=[[0.9, 0.1]])
+    model_classes = ModelClasses.compile(['18C', '36C'], RUNWAY, get_airport_by_icao('EHAM'))
+    mock_get_predictor.return_value = Predictor(trained_model=trained_model, model_id='model',
+                                                model_classes=model_classes)
+
+    outputs = [
+        get_runway_prediction_output(RunwayPredictionInput(
+            origin=get_airport_by_icao(origin_icao),
+            destination=get_airport_by_icao('EHAM'),
+            timestamp=Timestamp(1650751200),
+            wind_input_source=WindInputSource.TAF,
+            wind_speed=15.0,
+            wind_direction=180.0
+        ))
+        for origin_icao in ['EBBR', 'EBBR']
+    ]
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0].probas == [RunwayProbability(runway_name='18C', value=0.9),
+                                 RunwayProbability(runway_name='36C', value=0.1)]
+    # rebuilt around the classes of the loaded model rather than copies of them
+    assert outputs[1].model_classes is model_classes
+    trained_model.predict_proba.assert_called_once()
+    assert predictor_module.get_prediction_cache_stats()['airports']['EHAM'] == \
+        {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_get_runway_prediction_output__same_quantised_input__predicts_on_the_quantised_values(
+    mock_get_predictor, clear_prediction_cache
+):
+    trained_model = mock.Mock()
+    trained_model.classes_ = ['18C', '36C']
+    trained_model.feature_names_in_ = ['hour', 'wind_speed', 'wind_dir']
+    trained_model.predict_proba = mock.Mock(return_value=[[0.9, 0.1]])
+    mock_get_predictor.return_value = Predictor(trained_model=trained_model, model_id='model')
+
+    for wind_speed in [15.004, 14.996]:
+        get_runway_prediction_output(RunwayPredictionInput(
+            origin=get_airport_by_icao('EBBR'),
+            destination=get_airport_by_icao('EHAM'),
+            timestamp=Timestamp(1650751200),
+            wind_input_source=WindInputSource.TAF,
+            wind_speed=wind_speed,
+            wind_direction=180.0
+        ))
+
+    trained_model.predict_proba.assert_called_once()
+    model_input, = trained_model.predict_proba.call_args.args
+    assert list(model_input['wind_speed']) == [15.0]
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_get_runway_prediction_output__fast_quality__cached_apart_from_full(
+    mock_get_predictor, clear_prediction_cache
+):
+    trained_model = mock.Mock()
+    trained_model.classes_ = ['18C', '36C']
+    trained_model.feature_names_in_ = ['hour', 'wind_speed', 'wind_dir']
+    trained_model.predict_proba = mock.Mock(return_value=[[0.9, 0.1]])
+    predictor = Predictor(trained_model=trained_model, model_id='model')
+    mock_get_predictor.return_value = predictor
+    prediction_input = RunwayPredictionInput(
+        origin=get_airport_by_icao('EBBR'),
+        destination=get_airport_by_icao('EHAM'),
+        timestamp=Timestamp(1650751200),
+        wind_input_source=WindInputSource.TAF,
+        wind_speed=15.0,
+        wind_direction=180.0
+    )
+
+    with mock.patch.object(Predictor, 'predict_values_fast',
+                           return_value={'18C': 0.8, '36C': 0.2}) as mock_predict_values_fast:
+        fast_output = get_runway_prediction_output(prediction_input, quality='fast')
+        get_runway_prediction_output(prediction_input, quality='fast')
+    full_output = get_runway_prediction_output(prediction_input)
+
+    mock_predict_values_fast.assert_called_once()
+    trained_model.predict_proba.assert_called_once()
+    assert fast_output.probas[0] == RunwayProbability(runway_name='18C', value=0.8)
+    assert full_output.probas[0] == RunwayProbability(runway_name='18C', value=0.9)
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_get_runway_config_prediction_output__shared_memory_cache__hits_for_many_classes(
+    mock_get_predictor, clear_prediction_cache, monkeypatch, tmp_path
+):
+    runway_names = [runway.name for runway in get_airport_by_icao('EHAM').runways]
+    runway_configs = [str(config) for size in (1, 2, 3)
+                      for config in itertools.combinations(runway_names, size)][:78]
+    trained_model = mock.Mock()
+    trained_model.classes_ = runway_configs
+    trained_model.feature_names_in_ = ['15min_day_interval', 'wind_speed', 'wind_dir']
+    trained_model.predict_proba = mock.Mock(return_value=[np.full(78, 1 / 78)])
+    mock_get_predictor.return_value = Predictor(trained_model=trained_model, model_id='model')
+    cache = Cache(namespace='prediction',
+                  backend=SharedMemoryCacheBackend(path=tmp_path.joinpath('cache'), slots=64,
+                                                   slot_size=16384),
+                  codec=predictor_module._ProbabilitiesCodec())
+    monkeypatch.setattr(predictor_module, '_prediction_cache', cache)
+    prediction_input = RunwayConfigPredictionInput(
+        destination=get_airport_by_icao('EHAM'),
+        timestamp=Timestamp(1650751200),
+        wind_input_source=WindInputSource.TAF,
+        wind_speed=15.0,
+        wind_direction=180.0
+    )
+
+    first = get_runway_config_prediction_output(prediction_input)
+    second = get_runway_config_prediction_output(prediction_input)
+
+    trained_model.predict_proba.assert_called_once()
+    assert cache.stats.hits == 1
+    assert list(second.probabilities) == list(first.probabilities)
+
+
+def test_probabilities_codec__round_trip():
+    codec = predictor_module._ProbabilitiesCodec()
+
+    model_id, probabilities = codec.loads(codec.dumps(('model', np.array([0.9, 0.1]))))
+
+    assert model_id == 'model'
+    assert list(probabilities) == [0.9, 0.1]
+
+
+def test_probabilities_codec__other_version__is_rejected():
+    codec = predictor_module._ProbabilitiesCodec()
+    data = bytearray(codec.dumps(('model', np.array([0.9, 0.1]))))
+    data[0] = codec.VERSION + 1
+
+    with pytest.raises(ValueError):
+        codec.loads(bytes(data))
@@ -0,0 +1,304 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from predicted_runway.domain.registry import ModelRegistry, ModelWatcher
+
+
+def test_model_registry__get__loads_once_and_reloads_on_file_change(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    loader = mock.Mock(side_effect=lambda p: p.read_bytes())
+    listener = mock.Mock()
+
+    registry = ModelRegistry(loader=loader)
+    registry.add_reload_listener(listener)
+
+    first = registry.get(path)
+    assert registry.get(path) is first
+    assert first.trained_model == b'model v1'
+
+    path.write_bytes(b'model v2!')
+    os.utime(path, ns=(first.version[0] + 10**9, first.version[0] + 10**9))
+
+    second = registry.get(path)
+
+    assert second.trained_model == b'model v2!'
+    assert second.model_id != first.model_id
+    assert loader.call_count == 2
+    listener.assert_called_once_with(path, first.model_id)
+
+
+def _touch(path, content: bytes, version: tuple[int, int]):
+    path.write_bytes(content)
+    os.utime(path, ns=(version[0] + 10**9, version[0] + 10**9))
+
+
+def test_model_registry__no_reload_on_get__reload_swaps_the_model(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    listener = mock.Mock()
+
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), reload_on_get=False)
+    registry.add_reload_listener(listener)
+
+    first = registry.get(path)
+    _touch(path, b'model v2!', first.version)
+
+    assert registry.get(path) is first
+
+    second = registry.reload(path)
+
+    assert registry.get(path) is second
+    assert second.trained_model == b'model v2!'
+    listener.assert_called_once_with(path, first.model_id)
+    assert registry.get_stats()['reloads'] == 1
+
+
+@pytest.mark.parametrize('content', [b'invalid', b''])
+def test_model_registry__reload__invalid_model__keeps_the_current_one(tmp_path, content):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+
+    def loader(p):
+        if not p.read_bytes():
+            raise EOFError()
+        return p.read_bytes()
+
+    def validator(_, trained_model):
+        if trained_model == b'invalid':
+            raise ValueError()
+
+    registry = ModelRegistry(loader=loader, validator=validator, reload_on_get=False)
+    first = registry.get(path)
+    _touch(path, content, first.version)
+
+    assert registry.reload(path) is None
+    assert registry.get(path) is first
+    assert registry.get_stats()['reload_failures'] == 1
+
+
+def test_model_registry__reload__failing_listener__swaps_and_notifies_the_others(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    listener = mock.Mock()
+
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), reload_on_get=False)
+    registry.add_reload_listener(mock.Mock(side_effect=ConnectionError("Redis is down")))
+    registry.add_reload_listener(listener)
+
+    first = registry.get(path)
+    _touch(path, b'model v2!', first.version)
+
+    second = registry.reload(path)
+
+    assert registry.get(path) is second
+    listener.assert_called_once_with(path, first.model_id)
+
+
+def _reject_invalid(_, trained_model):
+    if trained_model == b'invalid':
+        raise ValueError()
+
+
+def test_model_registry__get__invalid_model__raises(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'invalid')
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), validator=_reject_invalid)
+
+    with pytest.raises(ValueError):
+        registry.get(path)
+
+
+def test_model_registry__reload_on_get__invalid_model__keeps_the_current_one(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), validator=_reject_invalid)
+    first = registry.get(path)
+    _touch(path, b'invalid', first.version)
+
+    assert registry.get(path) is first
+    assert registry.get_stats()['reload_failures'] == 1
+
+
+def test_model_registry__get__loads_once_for_concurrent_callers_outside_of_the_lock(tmp_path):
+    slow_path = tmp_path.joinpath('EHAM.pkl')
+    slow_path.write_bytes(b'slow model')
+    path = tmp_path.joinpath('LFPO.pkl')
+    path.write_bytes(b'model')
+    loading = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def loader(p):
+        loads.append(p)
+        if p == slow_path:
+            loading.set()
+            release.wait(timeout=5)
+        return p.read_bytes()
+
+    registry = ModelRegistry(loader=loader)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(registry.get, slow_path) for _ in range(4)]
+        loading.wait(timeout=5)
+
+        # not blocked by the load in flight
+        assert registry.get(path).trained_model == b'model'
+
+        release.set()
+        assert {future.result().trained_model for future in futures} == {b'slow model'}
+
+    assert loads.count(slow_path) == 1
+
+
+def test_model_watcher__poll__reloads_once_the_file_is_stable(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), reload_on_get=False)
+    first = registry.get(path)
+    watcher = ModelWatcher(registry=registry, directories=[tmp_path], interval=60)
+
+    _touch(path, b'model v2!', first.version)
+    watcher.poll()
+
+    assert registry.get(path) is first
+
+    watcher.poll()
+
+    assert registry.get(path).trained_model == b'model v2!'
+
+
+def test_model_watcher__file_written__reloads_in_the_background(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model v1')
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), reload_on_get=False)
+    registry.get(path)
+
+    watcher = ModelWatcher(registry=registry, directories=[tmp_path], interval=0.05)
+    watcher.start()
+
+    # written next to the model and moved in, as deployments should do
+    tmp_path.joinpath('EHAM.pkl.tmp').write_bytes(b'model v2!')
+    os.replace(tmp_path.joinpath('EHAM.pkl.tmp'), path)
+
+    deadline = time.monotonic() + 5
+    while registry.get(path).trained_model != b'model v2!' and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    watcher.stop()
+    watcher.join(timeout=5)
+
+    assert registry.get(path).trained_model == b'model v2!'
+
+
+def test_model_registry__version_pointer_moved__reloads(tmp_path):
+    tmp_path.joinpath('v1.pkl').write_bytes(b'model v1')
+    tmp_path.joinpath('v2.pkl').write_bytes(b'model v2')
+    path = tmp_path.joinpath('current')
+    path.symlink_to('v1.pkl')
+
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), reload_on_get=False)
+    first = registry.get(path)
+
+    # moved atomically, as `ln -sfn` does
+    tmp_path.joinpath('current.tmp').symlink_to('v2.pkl')
+    os.replace(tmp_path.joinpath('current.tmp'), path)
+
+    assert registry.reload(path).trained_model == b'model v2'
+    assert registry.get(path).model_id != first.model_id
+
+
+def test_model_registry__memory_budget__evicts_the_least_valuable_unpinned_models(tmp_path):
+    paths = {}
+    for name in ('EHAM', 'LEMD', 'LFPO'):
+        paths[name] = tmp_path.joinpath(f'{name}.pkl')
+        paths[name].write_bytes(b'x' * 100)
+
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(),
+                             memory_budget=250,
+                             pinned_groups=1,
+                             group_key=lambda p: p.stem)
+
+    for _ in range(3):
+        registry.get(paths['EHAM'])
+    registry.get(paths['LEMD'])
+    registry.get(paths['LFPO'])
+
+    # EHAM is pinned as the busiest airport, LEMD is the least requested of the others
+    assert {model.path for model in registry.get_loaded_models()} == {paths['EHAM'], paths['LFPO']}
+
+    stats = registry.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['footprint_bytes'] == 200
+    assert stats['models'][str(paths['EHAM'])]['pinned'] is True
+    assert stats['models'][str(paths['LFPO'])]['footprint_bytes'] == 100
+
+
+def test_model_registry__evicted_model__is_loaded_again(tmp_path):
+    first_path = tmp_path.joinpath('EHAM.pkl')
+    second_path = tmp_path.joinpath('LEMD.pkl')
+    first_path.write_bytes(b'x' * 100)
+    second_path.write_bytes(b'x' * 100)
+    loader = mock.Mock(side_effect=lambda p: p.read_bytes())
+
+    registry = ModelRegistry(loader=loader, memory_budget=100)
+
+    registry.get(first_path)
+    registry.get(second_path)
+    registry.get(first_path)
+
+    assert loader.call_count == 3
+    assert [model.path for model in registry.get_loaded_models()] == [first_path]
+
+
+def test_model_registry__compiler__compiles_once_per_load(tmp_path):
+    path = tmp_path.joinpath('EHAM.pkl')
+    path.write_bytes(b'model')
+    compiler = mock.Mock(return_value='classes')
+
+    registry = ModelRegistry(loader=lambda p: p.read_bytes(), compiler=compiler)
+
+    assert registry.get(path).model_classes == 'classes'
+    assert registry.get(path).model_classes == 'classes'
+    compiler.assert_called_once_with(path, b'model')
@@ -0,0 +1,145 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import threading
+from unittest import mock
+
+import pytest
+
+from predicted_runway.domain.models import PredictionModelOutput
+from predicted_runway.domain.shadow import DivergenceStats, ShadowEvaluator, RUNWAY
+
+
+def test_divergence_stats__record():
+    stats = DivergenceStats()
+
+    stats.record(PredictionModelOutput({'18C': 0.9, '36C': 0.1}),
+                 PredictionModelOutput({'18C': 0.7, '36C': 0.3}))
+    stats.record(PredictionModelOutput({'18C': 0.6, '36C': 0.4}),
+                 PredictionModelOutput({'36C': 0.6, '09': 0.4}))
+
+    assert stats.to_dict() == {
+        "current_model_id": None,
+        "candidate_model_id": None,
+        "samples": 2,
+        "top_class_agreement": 0.5,
+        "mean_distance": pytest.approx((0.2 + 0.6) / 2),
+        "max_distance": pytest.approx(0.6)
+    }
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    versions_dir = tmp_path.joinpath('EHAM')
+    versions_dir.mkdir()
+    versions_dir.joinpath('v1.pkl').write_bytes(b'')
+    versions_dir.joinpath('v2.pkl').write_bytes(b'')
+    versions_dir.joinpath('current').symlink_to('v1.pkl')
+    versions_dir.joinpath('candidate').symlink_to('v2.pkl')
+
+    with mock.patch('predicted_runway.config.ARRIVALS_RUNWAY_MODELS_DIR', str(tmp_path)):
+        yield tmp_path
+
+
+CURRENT_OUTPUT = PredictionModelOutput({'18C': 0.9, '36C': 0.1})
+
+
+def _get_predictor(path):
+    predictor = mock.Mock()
+    predictor.model_id = path.name
+    predictor.predict_values_batch = mock.Mock(
+        return_value=[PredictionModelOutput({'18C': 0.3, '36C': 0.7})]
+    )
+
+    return predictor
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_shadow_evaluator__records_the_divergence_of_the_candidate(
+    mock_get_predictor, models_dir
+):
+    predictors = {}
+    mock_get_predictor.side_effect = \
+        lambda path: predictors.setdefault(path.name, _get_predictor(path))
+    evaluator = ShadowEvaluator(sample_rate=1, max_pending=10)
+    prediction_input = mock.Mock()
+    prediction_input.destination.icao = 'EHAM'
+
+    evaluator.submit(RUNWAY, prediction_input, CURRENT_OUTPUT)
+    evaluator._executor.shutdown(wait=True)
+
+    # the output served from the current model is reused, only the candidate predicts
+    predictors['current'].predict_values_batch.assert_not_called()
+    predictors['candidate'].predict_values_batch.assert_called_once()
+
+    stats = evaluator.get_stats()[RUNWAY]['EHAM']
+    assert stats['current_model_id'] == 'current'
+    assert stats['candidate_model_id'] == 'candidate'
+    assert stats['samples'] == 1
+    assert stats['top_class_agreement'] == 0.
+    assert stats['mean_distance'] == pytest.approx(0.6)
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_shadow_evaluator__busy__drops_samples_without_blocking(mock_get_predictor, models_dir):
+    release = threading.Event()
+    mock_get_predictor.side_effect = lambda path: release.wait(timeout=5) and _get_predictor(path)
+    evaluator = ShadowEvaluator(sample_rate=1, max_pending=1)
+    prediction_input = mock.Mock()
+    prediction_input.destination.icao = 'EHAM'
+
+    evaluator.submit(RUNWAY, prediction_input, CURRENT_OUTPUT)
+    evaluator.submit(RUNWAY, prediction_input, CURRENT_OUTPUT)
+    release.set()
+    evaluator._executor.shutdown(wait=True)
+
+    assert evaluator.get_stats()['dropped'] == 1
+    assert evaluator.get_stats()[RUNWAY]['EHAM']['samples'] == 1
+
+
+@mock.patch('predicted_runway.domain.predictor.get_predictor')
+def test_shadow_evaluator__no_candidate__does_nothing(mock_get_predictor, tmp_path):
+    evaluator = ShadowEvaluator(sample_rate=1, max_pending=10)
+    prediction_input = mock.Mock()
+    prediction_input.destination.icao = 'EHAM'
+
+    with mock.patch('predicted_runway.config.ARRIVALS_RUNWAY_MODELS_DIR', str(tmp_path)):
+        evaluator.submit(RUNWAY, prediction_input, CURRENT_OUTPUT)
+
+    evaluator._executor.shutdown(wait=True)
+
+    mock_get_predictor.assert_not_called()
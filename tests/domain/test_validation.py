@@ -0,0 +1,109 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from predicted_runway.config import get_runway_model_path, get_runway_config_model_path
+from predicted_runway.domain.models import RUNWAY_CONFIG
+from predicted_runway.domain.validation import validate_model, InvalidModelError, \
+    compile_model_classes
+from tests.conftest import get_airport_by_icao
+
+
+def _get_trained_model(features: list[str], classes: list[str]):
+    trained_model = mock.Mock()
+    trained_model.feature_names_in_ = features
+    trained_model.classes_ = classes
+
+    return trained_model
+
+
+@pytest.mark.parametrize('path, trained_model', [
+    (
+        get_runway_model_path('EHAM'),
+        _get_trained_model(['hour', 'wind_dir', 'origin_angle'], ['18C', '36C'])
+    ),
+    (
+        get_runway_config_model_path('EHAM'),
+        _get_trained_model(['15min_day_interval', 'wind_dir'], ["('18C', '36C')", "('18C',)"])
+    ),
+])
+def test_validate_model__valid_model(path, trained_model):
+    validate_model(path, trained_model)
+
+
+@pytest.mark.parametrize('path, trained_model', [
+    (
+        Path('/models/XXXX.pkl'),
+        _get_trained_model(['hour'], ['18C'])
+    ),
+    (
+        get_runway_model_path('EHAM'),
+        _get_trained_model(['hour', 'visibility'], ['18C'])
+    ),
+    (
+        get_runway_model_path('EHAM'),
+        _get_trained_model(['hour'], ['18C', '09'])
+    ),
+    (
+        get_runway_config_model_path('EHAM'),
+        _get_trained_model(['origin_angle'], ["('18C', '36C')"])
+    ),
+    (
+        get_runway_config_model_path('EHAM'),
+        _get_trained_model(['wind_dir'], ["('18C', '09')"])
+    ),
+])
+def test_validate_model__invalid_model__raises(path, trained_model):
+    with pytest.raises(InvalidModelError):
+        validate_model(path, trained_model)
+
+
+def test_compile_model_classes__runway_config_model__resolves_the_runways():
+    model_classes = compile_model_classes(
+        get_runway_config_model_path('EHAM'),
+        _get_trained_model(['wind_dir'], ["('18C', '36C')", "('18C',)"])
+    )
+
+    assert model_classes.kind == RUNWAY_CONFIG
+    assert model_classes.classes == ("('18C', '36C')", "('18C',)")
+    assert [[runway.name for runway in runways] for runways in model_classes.runways] == \
+        [['18C', '36C'], ['18C']]
+    assert model_classes.is_compiled_for(RUNWAY_CONFIG, get_airport_by_icao('EHAM'))
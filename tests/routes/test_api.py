@@ -42,9 +42,12 @@ import pytest
 from met_update_db import repo as met_repo
 
 from predicted_runway.domain.models import RunwayPredictionOutput, RunwayProbability, \
-    WindInputSource, RunwayConfigPredictionOutput, RunwayConfigProbability
+    WindInputSource, RunwayConfigPredictionOutput, RunwayConfigProbability, ModelClasses, RUNWAY
+from predicted_runway import serialization
+from predicted_runway.routes import negotiation
 from predicted_runway.routes.factory import RunwayPredictionInputFactory, \
     RunwayConfigPredictionInputFactory
+from predicted_runway.routes.schemas import RunwayPredictionOutputSchema
 from tests.conftest import get_airport_by_icao
 from tests.routes import API_BASE_PATH
 from tests.routes.utils import query_string_from_request_arguments
@@ -53,6 +56,7 @@ ARRIVALS_RUNWAY_PREDICTION_URL = API_BASE_PATH + '/arrivals/{destination_icao}/r
 ARRIVALS_RUNWAY_PREDICTION_INPUT_URL = API_BASE_PATH + '/arrivals/{destination_icao}/runway-prediction-input'
 ARRIVALS_RUNWAY_CONFIG_PREDICTION_URL = API_BASE_PATH + '/arrivals/{destination_icao}/runway-config-prediction'
 ARRIVALS_RUNWAY_CONFIG_PREDICTION_INPUT_URL = API_BASE_PATH + '/arrivals/{destination_icao}/runway-config-prediction-input'
+ARRIVALS_RUNWAY_PREDICTION_CLASSES_URL = API_BASE_PATH + '/arrivals/{destination_icao}/runway-prediction-classes'
 
 
 @pytest.mark.parametrize('invalid_destination_icao', [
@@ -324,6 +328,242 @@ def test_arrivals_runway_prediction__no_errors__returns_200_and_output(
     assert response_data == expected_result
 
 
+@pytest.mark.parametrize('request_args, expected_quality', [
+    ({"origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+      "wind_speed": 10.0}, 'full'),
+    ({"origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+      "wind_speed": 10.0, "quality": 'fast'}, 'fast'),
+])
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__quality__is_passed_to_the_predictor(
+    mock_get_runway_prediction_output, test_client, request_args, expected_quality
+):
+    mock_get_runway_prediction_output.return_value = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=1.)],
+        destination=get_airport_by_icao('EHAM')
+    )
+
+    query_string = query_string_from_request_arguments(request_args)
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    assert response.status_code == 200
+    assert mock_get_runway_prediction_output.call_args.kwargs['quality'] == expected_quality
+
+
+def test_arrivals_runway_prediction__invalid_quality__returns_400(test_client):
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "quality": 'best'
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    assert response.status_code == 400
+
+
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__top_k_and_min_probability__restrict_the_features(
+    mock_get_runway_prediction_output, test_client
+):
+    mock_get_runway_prediction_output.return_value = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=0.3),
+                RunwayProbability(runway_name='36C', value=0.6),
+                RunwayProbability(runway_name='6', value=0.1)],
+        destination=get_airport_by_icao('EHAM')
+    )
+
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+        "wind_speed": 10.0, "top_k": 2, "min_probability": 0.35
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    assert response.status_code == 200
+    features = json.loads(response.data)['prediction_output']['features']
+    assert [feature['properties']['runway_name'] for feature in features] == ['36C']
+
+
+@pytest.mark.parametrize('json_backend', ['orjson', 'json'])
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__same_bytes_as_jsonify_with_the_json_module(
+    mock_get_runway_prediction_output, test_client, monkeypatch, json_backend
+):
+    if json_backend == 'json':
+        monkeypatch.setattr(serialization, 'orjson', None)
+
+    prediction_output = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=1 / 3),
+                RunwayProbability(runway_name='36C', value=0.66664),
+                RunwayProbability(runway_name='6', value=2e-05)],
+        destination=get_airport_by_icao('EHAM')
+    )
+    mock_get_runway_prediction_output.return_value = prediction_output
+
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+        "wind_speed": 10.0
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    prediction_input = RunwayPredictionInputFactory.create(
+        origin_icao='EBBR', destination_icao='EHAM', timestamp=1650751200,
+        wind_direction=180.0, wind_speed=10.0
+    )
+    expected_dump = RunwayPredictionOutputSchema(prediction_input, prediction_output).dump()
+    # what jsonify responded with the json module
+    expected_body = json.dumps(expected_dump, separators=(',', ':'), sort_keys=True) + '\n'
+    assert response.status_code == 200
+    assert response.data == expected_body.encode()
+
+
+@pytest.mark.parametrize('output_format, expected_prediction_output', [
+    ('compact', {'runway_names': ['36C', '18C'], 'probabilities': [0.6, 0.4]}),
+    ('ids', {'table_id': mock.ANY, 'class_indexes': [1, 0], 'probabilities': [0.6, 0.4]}),
+])
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__format__returns_parallel_arrays(
+    mock_get_runway_prediction_output, test_client, output_format, expected_prediction_output
+):
+    mock_get_runway_prediction_output.return_value = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=0.4),
+                RunwayProbability(runway_name='36C', value=0.6)],
+        destination=get_airport_by_icao('EHAM')
+    )
+
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+        "wind_speed": 10.0, "format": output_format
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    assert response.status_code == 200
+    result = json.loads(response.data)
+    assert result['prediction_output'] == expected_prediction_output
+    assert result['prediction_input']['destination_icao'] == 'EHAM'
+
+
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__accept_msgpack__returns_the_dump_as_msgpack(
+    mock_get_runway_prediction_output, test_client
+):
+    msgpack = pytest.importorskip('msgpack')
+    mock_get_runway_prediction_output.return_value = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=0.4),
+                RunwayProbability(runway_name='36C', value=0.6)],
+        destination=get_airport_by_icao('EHAM')
+    )
+
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+        "wind_speed": 10.0, "format": 'compact'
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}", headers={'Accept': 'application/msgpack'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data)['prediction_output'] == {
+        'runway_names': ['36C', '18C'], 'probabilities': [0.6, 0.4]
+    }
+
+
+def _get_runway_prediction_response(test_client, headers: dict = None):
+    query_string = query_string_from_request_arguments({
+        "origin_icao": 'EBBR', "timestamp": '1650751200', "wind_direction": 180.0,
+        "wind_speed": 10.0
+    })
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    return test_client.get(f"{url}{query_string}", headers=headers)
+
+
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__orjson_not_installed__returns_the_same_body(
+    mock_get_runway_prediction_output, test_client, monkeypatch
+):
+    # a new output for each request, so that its GeoJSON is rendered again
+    mock_get_runway_prediction_output.side_effect = lambda *args, **kwargs: RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=0.4),
+                RunwayProbability(runway_name='36C', value=1 / 3)],
+        destination=get_airport_by_icao('EHAM')
+    )
+    response = _get_runway_prediction_response(test_client)
+
+    monkeypatch.setattr(serialization, 'orjson', None)
+
+    assert _get_runway_prediction_response(test_client).data == response.data
+
+
+@mock.patch('predicted_runway.domain.predictor.get_runway_prediction_output')
+def test_arrivals_runway_prediction__msgpack_not_installed__returns_json(
+    mock_get_runway_prediction_output, test_client, monkeypatch
+):
+    mock_get_runway_prediction_output.return_value = RunwayPredictionOutput(
+        probas=[RunwayProbability(runway_name='18C', value=0.4),
+                RunwayProbability(runway_name='36C', value=0.6)],
+        destination=get_airport_by_icao('EHAM')
+    )
+    monkeypatch.setattr(negotiation, 'msgpack', None)
+
+    response = _get_runway_prediction_response(test_client,
+                                               headers={'Accept': 'application/msgpack'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.data)['prediction_input']['destination_icao'] == 'EHAM'
+
+
+@mock.patch('predicted_runway.domain.predictor.get_runway_model_classes')
+def test_arrivals_runway_prediction_classes__returns_the_table_with_an_etag(
+    mock_get_runway_model_classes, test_client
+):
+    model_classes = ModelClasses.compile(['18C', '36C'], RUNWAY, get_airport_by_icao('EHAM'))
+    mock_get_runway_model_classes.return_value = model_classes
+    url = ARRIVALS_RUNWAY_PREDICTION_CLASSES_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(url)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == model_classes.to_dict()
+    assert response.headers['ETag'] == f'"{model_classes.table_id}"'
+
+    response = test_client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+    assert response.status_code == 304
+
+
+def test_arrivals_runway_prediction_classes__invalid_destination_icao__returns_404(test_client):
+    response = test_client.get(
+        ARRIVALS_RUNWAY_PREDICTION_CLASSES_URL.format(destination_icao='EBBR')
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('request_args', [
+    {"origin_icao": 'EBBR', "timestamp": '1650751200', "top_k": 0},
+    {"origin_icao": 'EBBR', "timestamp": '1650751200', "min_probability": 2},
+    {"origin_icao": 'EBBR', "timestamp": '1650751200', "format": 'xml'},
+])
+def test_arrivals_runway_prediction__invalid_output_options__returns_400(test_client,
+                                                                         request_args):
+    query_string = query_string_from_request_arguments(request_args)
+    url = ARRIVALS_RUNWAY_PREDICTION_URL.format(destination_icao='EHAM')
+
+    response = test_client.get(f"{url}{query_string}")
+
+    assert response.status_code == 400
+
+
 @pytest.mark.parametrize('destination_icao, request_args, wind_input, prediction_output, expected_result', [
     (
         'EHAM',
@@ -0,0 +1,95 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from predicted_runway.routes import negotiation
+from predicted_runway.routes.negotiation import JSON_MIMETYPE, MSGPACK_MIMETYPE
+
+ARRIVALS_RUNWAY_PREDICTION_STATS = '/api/0.1/arrivals/{destination_icao}/runway-prediction-stats'
+
+
+@pytest.fixture
+def msgpack():
+    return pytest.importorskip('msgpack')
+
+
+@pytest.mark.parametrize('accept, expected_mimetype', [
+    (None, JSON_MIMETYPE),
+    ('*/*', JSON_MIMETYPE),
+    ('text/html', JSON_MIMETYPE),
+    ('application/msgpack', MSGPACK_MIMETYPE),
+    ('application/json;q=0.5, application/msgpack', MSGPACK_MIMETYPE),
+    ('application/json, application/msgpack;q=0.5', JSON_MIMETYPE),
+])
+def test_get_response_mimetype(test_app, msgpack, accept, expected_mimetype):
+    headers = {'Accept': accept} if accept else {}
+
+    with test_app.test_request_context(headers=headers):
+        assert negotiation.get_response_mimetype() == expected_mimetype
+
+
+def test_get_response_mimetype__msgpack_not_installed__returns_json(test_app, monkeypatch):
+    monkeypatch.setattr(negotiation, 'msgpack', None)
+
+    with test_app.test_request_context(headers={'Accept': 'application/msgpack'}):
+        assert negotiation.get_response_mimetype() == JSON_MIMETYPE
+
+
+def test_packb__numpy_values(msgpack):
+    data = {'probabilities': np.array([0.25, 0.75]), 'count': np.int64(2)}
+
+    assert msgpack.unpackb(negotiation.packb(data)) == {'probabilities': [0.25, 0.75], 'count': 2}
+
+
+@mock.patch('predicted_runway.adapters.stats.get_arrivals_runway_airport_stats')
+def test_get_arrivals_runway_prediction_stats__accept_msgpack__returns_msgpack(
+    mock_get_arrivals_runway_airport_stats, test_client, msgpack
+):
+    expected_stats = {"stats": {"accuracy": 0.9}}
+    mock_get_arrivals_runway_airport_stats.return_value = expected_stats
+
+    response = test_client.get(ARRIVALS_RUNWAY_PREDICTION_STATS.format(destination_icao='EHAM'),
+                               headers={'Accept': 'application/msgpack'})
+
+    assert response.status_code == 200
+    assert response.mimetype == MSGPACK_MIMETYPE
+    assert response.headers['Vary'] == 'Accept'
+    assert msgpack.unpackb(response.data) == expected_stats
@@ -50,7 +50,9 @@ def openapi_path():
 @pytest.mark.parametrize('expected_paths', [
     [
         '/arrivals/{destination_icao}/runway-prediction',
-        '/arrivals/{destination_icao}/runway-config-prediction'
+        '/arrivals/{destination_icao}/runway-config-prediction',
+        '/arrivals/{destination_icao}/runway-prediction-classes',
+        '/arrivals/{destination_icao}/runway-config-prediction-classes'
     ]
 ])
 def test_get_openapi_spec(expected_paths, openapi_path):
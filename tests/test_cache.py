@@ -0,0 +1,202 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import time
+from fnmatch import fnmatch
+
+import pytest
+
+from predicted_runway.cache import TTLCache, Cache, InProcessCacheBackend, \
+    SharedMemoryCacheBackend, RedisCacheBackend
+
+
+class FakeTimer:
+
+    def __init__(self, now: float = 0.):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache__get_before_and_after_expiry():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, timer=timer)
+
+    cache.set('key', 'value', ttl=10)
+
+    assert cache.get('key') == 'value'
+
+    timer.now = 10
+
+    assert cache.get('key') is None
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.5
+
+
+def test_ttl_cache__non_positive_ttl__is_not_stored():
+    cache = TTLCache(maxsize=10)
+
+    cache.set('key', 'value', ttl=0)
+
+    assert cache.get('key') is None
+
+
+def test_ttl_cache__maxsize_exceeded__evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+
+    cache.set('a', 1, ttl=10)
+    cache.set('b', 2, ttl=10)
+    cache.get('a')
+    cache.set('c', 3, ttl=10)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+class FakeRedis:
+    """
+    Minimal in-memory stand-in of the redis-py client.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, bytes) else key.encode()
+
+    def get(self, key):
+        return self.data.get(self._key(key))
+
+    def set(self, key, value, px=None):
+        self.data[self._key(key)] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(self._key(key), None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch(key.decode(), match)]
+
+
+@pytest.fixture(params=['memory', 'shared_memory', 'redis'])
+def cache_backend(request, tmp_path):
+    if request.param == 'memory':
+        return InProcessCacheBackend(maxsize=100)
+    if request.param == 'shared_memory':
+        return SharedMemoryCacheBackend(path=tmp_path.joinpath('cache'), slots=64, slot_size=1024)
+
+    return RedisCacheBackend(client=FakeRedis())
+
+
+def test_cache__backends_behave_the_same(cache_backend, monkeypatch):
+    now = 1000.
+    monkeypatch.setattr(time, 'time', lambda: now)
+    cache = Cache(namespace='test', backend=cache_backend)
+
+    cache.set(('EHAM', 1), {'value': 1.5}, ttl=10)
+    cache.set(('EHAM', 2), 'expired', ttl=1)
+
+    now = 1005.
+
+    assert cache.get(('EHAM', 1)) == {'value': 1.5}
+    assert cache.get(('EHAM', 2)) is None
+    assert cache.get(('LFPO', 1)) is None
+    assert cache.stats.hits == 1
+
+    cache.delete(('EHAM', 1))
+
+    assert cache.get(('EHAM', 1)) is None
+
+
+def test_shared_memory_cache_backend__visible_to_other_instances(tmp_path):
+    path = tmp_path.joinpath('cache')
+    writer = Cache(namespace='test',
+                   backend=SharedMemoryCacheBackend(path=path, slots=64, slot_size=1024))
+    reader = Cache(namespace='test',
+                   backend=SharedMemoryCacheBackend(path=path, slots=64, slot_size=1024))
+
+    writer.set('key', 'value', ttl=10)
+    writer.set('too big', 'x' * 2048, ttl=10)
+
+    assert reader.get('key') == 'value'
+    assert reader.get('too big') is None
+
+
+def test_cache__invalidate(cache_backend):
+    cache = Cache(namespace='test', backend=cache_backend)
+    cache.set(('model-1', 1), 1, ttl=10)
+    cache.set(('model-2', 1), 2, ttl=10)
+
+    cache.invalidate(lambda key: key.startswith("('model-1',"))
+
+    assert cache.get(('model-2', 1)) == 2
+    assert cache.get(('model-1', 1)) is None
+
+
+def test_cache__in_process_backend__holds_values_without_copying():
+    cache = Cache(namespace='test', backend=InProcessCacheBackend(maxsize=100))
+    value = {'value': 1.5}
+    cache.set('key', value, ttl=10)
+
+    assert cache.get('key') is value
+
+
+def test_cache__undecodable_entry__is_a_miss():
+    client = FakeRedis()
+    cache = Cache(namespace='test', backend=RedisCacheBackend(client=client))
+    cache.set('key', 'value', ttl=10)
+    client.data = {key: b'\x80\x04garbage' for key in client.data}
+
+    assert cache.get('key') is None
+    assert cache.stats.misses == 1
+
+
+def test_cache__clear__only_clears_its_namespace(cache_backend):
+    cache = Cache(namespace='test', backend=cache_backend)
+    other_cache = Cache(namespace='other', backend=cache_backend)
+    cache.set('key', 1, ttl=10)
+    other_cache.set('key', 2, ttl=10)
+
+    cache.clear()
+
+    assert cache.get('key') is None
+    assert other_cache.get('key') == 2
@@ -0,0 +1,156 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import gzip
+from unittest import mock
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from predicted_runway import compression
+from predicted_runway.compression import GZIP, BROTLI, get_encoding, compress, \
+    compress_response
+
+BODY = b'{"features":[' + b','.join([b'{"type":"Feature","properties":{"probability":0.5}}'] * 20) \
+    + b']}'
+
+
+@pytest.fixture(autouse=True)
+def compressed_bodies():
+    compression.clear_compressed_bodies()
+    yield
+    compression.clear_compressed_bodies()
+
+
+@pytest.fixture
+def brotli():
+    return pytest.importorskip('brotli')
+
+
+@pytest.mark.parametrize('accept_encoding, expected_encoding', [
+    (None, None),
+    ('identity', None),
+    ('gzip', GZIP),
+    ('gzip, deflate', GZIP),
+    ('gzip, deflate, br', BROTLI),
+    ('br;q=0.5, gzip', GZIP),
+    ('br', BROTLI),
+])
+def test_get_encoding(brotli, accept_encoding, expected_encoding):
+    assert get_encoding(parse_accept_header(accept_encoding, Accept)) == expected_encoding
+
+
+def test_get_encoding__brotli_not_installed__gzip(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+
+    assert get_encoding(parse_accept_header('gzip, deflate, br', Accept)) == GZIP
+    assert get_encoding(parse_accept_header('br', Accept)) is None
+
+
+def test_compress__same_body__compressed_once():
+    with mock.patch('predicted_runway.compression._compress',
+                    wraps=compression._compress) as mock_compress:
+        first = compress(BODY, GZIP)
+        second = compress(BODY, GZIP)
+
+    assert first == second
+    assert gzip.decompress(first) == BODY
+    assert mock_compress.call_count == 1
+
+
+def test_compress__brotli(brotli):
+    assert brotli.decompress(compress(BODY, BROTLI)) == BODY
+
+
+def _get_response(test_app, body=BODY, **kwargs):
+    return test_app.response_class(body, **{'mimetype': 'application/json', **kwargs})
+
+
+def test_compress_response__gzip(test_app):
+    with test_app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = _get_response(test_app)
+        response.set_etag('table')
+
+        response = compress_response(response)
+
+    assert response.headers['Content-Encoding'] == GZIP
+    assert 'Accept-Encoding' in response.vary
+    assert response.content_length == len(response.get_data()) < len(BODY)
+    assert gzip.decompress(response.get_data()) == BODY
+    assert response.get_etag() == ('table', True)
+
+
+def test_compress_response__not_accepted__only_varies(test_app):
+    with test_app.test_request_context():
+        response = compress_response(_get_response(test_app))
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_data() == BODY
+
+
+@pytest.mark.parametrize('response_kwargs', [
+    {'body': BODY[:100]},
+    {'body': (chunk for chunk in [BODY])},
+    {'mimetype': 'image/png'},
+    {'status': 500},
+])
+def test_compress_response__not_compressible__untouched(test_app, response_kwargs):
+    with test_app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = compress_response(_get_response(test_app, **response_kwargs))
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.vary
+
+
+def test_compress_response__disabled__untouched(test_app, monkeypatch):
+    monkeypatch.setattr(compression.cfg, 'COMPRESSION_ENABLED', False)
+
+    with test_app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = compress_response(_get_response(test_app))
+
+    assert response.get_data() == BODY
+
+
+def test_app__compresses_the_responses(test_client):
+    response = test_client.get('/openapi.json', headers={'Accept-Encoding': 'gzip'})
+    uncompressed_response = test_client.get('/openapi.json')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == GZIP
+    assert gzip.decompress(response.data) == uncompressed_response.data
@@ -0,0 +1,59 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+from predicted_runway.config import get_model_path, get_candidate_model_path
+
+
+def test_get_model_path__single_file(tmp_path):
+    assert get_model_path(str(tmp_path), 'EHAM') == tmp_path.joinpath('EHAM.pkl')
+    assert get_candidate_model_path(str(tmp_path), 'EHAM') is None
+
+
+def test_get_model_path__versioned(tmp_path):
+    versions_dir = tmp_path.joinpath('EHAM')
+    versions_dir.mkdir()
+    versions_dir.joinpath('2022-05-01.pkl').write_bytes(b'model v1')
+    versions_dir.joinpath('2022-05-08.pkl').write_bytes(b'model v2')
+    versions_dir.joinpath('current').symlink_to('2022-05-01.pkl')
+
+    assert get_model_path(str(tmp_path), 'EHAM') == versions_dir.joinpath('current')
+    assert get_model_path(str(tmp_path), 'EHAM').read_bytes() == b'model v1'
+    assert get_candidate_model_path(str(tmp_path), 'EHAM') is None
+
+    versions_dir.joinpath('candidate').symlink_to('2022-05-08.pkl')
+
+    assert get_candidate_model_path(str(tmp_path), 'EHAM').read_bytes() == b'model v2'
@@ -0,0 +1,130 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import socket
+import tempfile
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from predicted_runway.adapters.inference import InferenceClient, InferenceServerError
+from predicted_runway.domain.predictor import Predictor
+from predicted_runway.domain.registry import get_model_file_hash
+from predicted_runway.inference_server import InferenceServer
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    rng = np.random.default_rng(0)
+    model_input = pd.DataFrame({'wind_speed': rng.uniform(0, 30, 100),
+                                'wind_dir': rng.uniform(0, 360, 100)})
+    trained_model = RandomForestClassifier(n_estimators=5, random_state=0)\
+        .fit(model_input, np.where(model_input['wind_dir'] < 180, '18C', '36C'))
+
+    path = tmp_path.joinpath('models', 'EHAM.pkl')
+    path.parent.mkdir()
+    joblib.dump(trained_model, path)
+
+    return path
+
+
+@pytest.fixture
+def client(model_path):
+    # unix socket paths are limited to about a hundred characters
+    with tempfile.TemporaryDirectory() as socket_dir:
+        socket_path = Path(socket_dir).joinpath('inference.sock')
+        server = InferenceServer(socket_path=socket_path, model_dirs=[model_path.parent])
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        client = InferenceClient(socket_path=socket_path, pool_size=2, timeout=5)
+
+        yield client
+
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_inference_client__describe(client, model_path):
+    remote_model = client.describe(model_path)
+
+    assert remote_model.model_id == get_model_file_hash(model_path)
+    assert list(remote_model.feature_names_in_) == ['wind_speed', 'wind_dir']
+    assert list(remote_model.classes_) == ['18C', '36C']
+
+
+def test_predictor__remote_model__predicts_as_the_local_model(client, model_path):
+    local_predictor = Predictor(trained_model=joblib.load(model_path))
+    remote_predictor = Predictor(trained_model=client.describe(model_path))
+    rows = [[10.0, 90.0], [20.0, 270.0], [5.0, 179.0]]
+
+    assert remote_predictor.predict_values_batch(rows) == local_predictor.predict_values_batch(rows)
+
+
+def test_inference_client__connections_are_reused(client, model_path):
+    remote_model = client.describe(model_path)
+
+    for _ in range(5):
+        remote_model.predict_proba(pd.DataFrame([[10.0, 90.0]]))
+
+    assert client._idle_connections.qsize() == 1
+
+
+def test_inference_client__model_outside_the_model_dirs__raises(client, tmp_path):
+    with pytest.raises(InferenceServerError):
+        client.describe(tmp_path.joinpath('other.pkl'))
+
+    # the connection is still usable after an error
+    assert client._idle_connections.qsize() == 1
+
+
+def test_inference_client__stale_pooled_connection__retries_on_a_new_connection(client, model_path):
+    stale, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    peer.close()
+    client._idle_connections.put(stale)
+
+    remote_model = client.describe(model_path)
+
+    assert remote_model.model_id == get_model_file_hash(model_path)
+    assert stale.fileno() == -1
+    assert client._idle_connections.qsize() == 1
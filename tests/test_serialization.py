@@ -0,0 +1,109 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import json
+
+import numpy as np
+import pytest
+from connexion.apps.flask_app import FlaskJSONEncoder
+
+from predicted_runway import serialization
+from predicted_runway.serialization import JSONEncoder, dumps, dumps_numbers
+
+
+@pytest.fixture(params=['orjson', 'json'], autouse=True)
+def json_backend(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(serialization, 'orjson', None)
+
+    return request.param
+
+
+@pytest.mark.parametrize('obj, sort_keys, expected_json', [
+    ({'b': [1, 2.5, None], 'a': True}, False, '{"b":[1,2.5,null],"a":true}'),
+    ({'b': [1, 2.5, None], 'a': True}, True, '{"a":true,"b":[1,2.5,null]}'),
+    ({'probas': np.array([0.25, 1 / 3])}, False, '{"probas":[0.25,0.3333333333333333]}'),
+    ({'probas': np.array([0.1, 0.2], dtype=np.float32)}, False, '{"probas":[0.1,0.2]}'),
+    ([np.float64(0.5), np.float32(0.1), np.int64(3)], False, '[0.5,0.1,3]'),
+    ([1e-05, 1e16, 0.0001], False, '[1e-05,1e+16,0.0001]'),
+    ({'name': 'Zürich', 1: '\x7f'}, False, '{"name":"Z\\u00fcrich","1":"\\u007f"}'),
+    ({'value': float('nan'), 'probas': np.array([np.nan, np.inf, -np.inf])}, False,
+     '{"value":NaN,"probas":[NaN,Infinity,-Infinity]}'),
+])
+def test_dumps(obj, sort_keys, expected_json):
+    assert dumps(obj, sort_keys=sort_keys) == expected_json
+
+
+@pytest.mark.parametrize('values, expected_numbers', [
+    (np.array([0.25, 1e-05, 1 / 3, 0.]), ['0.25', '1e-05', '0.3333333333333333', '0.0']),
+    (np.array([0.1], dtype=np.float32), ['0.1']),
+    (np.array([]), []),
+    (np.array([np.nan, np.inf, 0.5]), ['NaN', 'Infinity', '0.5']),
+])
+def test_dumps_numbers(values, expected_numbers):
+    assert dumps_numbers(values) == expected_numbers
+
+
+@pytest.mark.parametrize('obj', [
+    {'b': [1, 2.5, {'c': None, 'a': []}], 'a': {}, 'd': 'text'},
+    {'small': 5e-05, 'large': 1.5e+20, 'name': 'Zürich', 'escaped': '"\\/\n\t\x01\x7f'},
+    {'nan': float('nan'), 'infinities': [float('inf'), float('-inf')]},
+    [],
+])
+@pytest.mark.parametrize('kwargs', [
+    {'separators': (',', ':')},
+    {'separators': (',', ':'), 'sort_keys': True},
+    {'indent': 2},
+    {'indent': 2, 'sort_keys': True, 'ensure_ascii': False},
+    {'indent': 2, 'separators': (', ', ': ')},
+    {},
+])
+def test_json_encoder__same_output_as_the_json_module(obj, kwargs):
+    assert json.dumps(obj, cls=JSONEncoder, **kwargs) == \
+        json.dumps(obj, cls=FlaskJSONEncoder, **kwargs)
+
+
+def test_json_encoder__numpy_values():
+    obj = {'probas': np.array([0.25, 0.75]), 'count': np.int64(2)}
+
+    assert json.dumps(obj, cls=JSONEncoder, separators=(',', ':')) == \
+        '{"probas":[0.25,0.75],"count":2}'
+
+
+def test_json_encoder__unsupported_type__raises():
+    with pytest.raises(TypeError):
+        json.dumps({'value': object()}, cls=JSONEncoder, separators=(',', ':'))
@@ -0,0 +1,134 @@
+"""
+Copyright 2022 EUROCONTROL
+==========================================
+
+Redistribution and use in source and binary forms, with or without modification, are permitted
+provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions
+   and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice, this list of
+conditions
+   and the following disclaimer in the documentation and/or other materials provided with the
+   distribution.
+3. Neither the name of the copyright holder nor the names of its contributors may be used to
+endorse
+   or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+OF
+THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+==========================================
+
+Editorial note: this license is an instance of the BSD license template as provided by the Open
+Source Initiative: http://opensource.org/licenses/BSD-3-Clause
+
+Details on EUROCONTROL: http://www.eurocontrol.int
+"""
+
+__author__ = "EUROCONTROL (SWIM)"
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from predicted_runway.singleflight import SingleFlight
+
+
+def _slow_function(started: threading.Event, release: threading.Event, calls: list):
+    def function():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return 'result'
+
+    return function
+
+
+def test_single_flight__concurrent_calls__are_coalesced():
+    flights = SingleFlight()
+    started, release, calls = threading.Event(), threading.Event(), []
+    function = _slow_function(started, release, calls)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flights.do, 'key', function)
+        started.wait(timeout=5)
+        followers = [executor.submit(flights.do, 'key', function) for _ in range(4)]
+        while flights.stats.calls < 5:
+            time.sleep(0.001)
+        release.set()
+
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert flights.stats.to_dict() == {"calls": 5, "coalesced": 4}
+    assert flights.in_flight() == 0
+
+
+def test_single_flight__sequential_calls__are_not_coalesced():
+    flights = SingleFlight()
+
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2
+    assert flights.stats.coalesced == 0
+
+
+def test_single_flight__exception__is_raised_to_every_caller():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def function():
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError('error')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, 'key', function)
+        started.wait(timeout=5)
+        follower = executor.submit(flights.do, 'key', function)
+        while flights.stats.calls < 2:
+            time.sleep(0.001)
+        release.set()
+
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flights.in_flight() == 0
+
+
+def test_single_flight__do_async__coalesces_with_threads():
+    flights = SingleFlight()
+    started, release, calls = threading.Event(), threading.Event(), []
+    function = _slow_function(started, release, calls)
+
+    async def run():
+        leader = asyncio.create_task(flights.do_async('key', function))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        follower = asyncio.create_task(flights.do_async('key', function))
+        await asyncio.sleep(0)
+
+        thread_result = []
+        thread = threading.Thread(target=lambda: thread_result.append(flights.do('key', function)))
+        thread.start()
+        while flights.stats.calls < 3:
+            await asyncio.sleep(0.001)
+        release.set()
+        thread.join(timeout=5)
+
+        return [await leader, await follower] + thread_result
+
+    assert asyncio.run(run()) == ['result'] * 3
+    assert len(calls) == 1
+    assert flights.stats.coalesced == 2